@@ -1,315 +1,30 @@
 from pathlib import Path
-from threading import Thread
 import argparse
-import base64
-import json
-import wx
-
-from modules import config_schema, portal, logger
-from res import dlls
+import sys
+import time
 
+from modules import logger
 
-EVT_RESULT_ID = wx.NewIdRef()
-def EVT_RESULT(win, func):
-    win.Connect(-1, -1, EVT_RESULT_ID, func)
-
-class ResultEvent(wx.PyEvent):
-    def __init__(self, data):
-        wx.PyEvent.__init__(self)
-        self.SetEventType(EVT_RESULT_ID)
-        self.data = data
-
-class WorkerThread(Thread):
-    def __init__(self, window, config: dict, dll: Path):
-        Thread.__init__(self)
-        self._window = window
-        self.config = config
-        self.dll: Path = dll
-
-        self.start()
-
-    def run(self):
-        import_and_execute(self.config, self.dll)
-        wx.PostEvent(self._window, ResultEvent({"finished": True}))
-
-
-class DLLPickerWindow(wx.Frame):
-    def __init__(self, parent, dll_paths: dict[str, Path], callback, title="Choose DLL version"):
-        super().__init__(parent, title=title, size=(450,100))
-        self.SetMinSize((450,100))
-        self.dll_paths: dict[str, Path] = dll_paths
-        self.callback = callback
-
-        dll_choices = [dll for dll in self.dll_paths]
-
-        panel = wx.Panel(self)
-        self.versions_drpdwn = wx.Choice(panel, choices=dll_choices)
-        self.versions_drpdwn.SetSelection(0)
-        import_btn = wx.Button(panel, label="Import")
-        ok_btn = wx.Button(panel, label="Ok")
-
-        self.versions_drpdwn.SetMinSize((200,-1))
-
-        hbox = wx.BoxSizer(wx.HORIZONTAL)
-        hbox.Add(self.versions_drpdwn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
-        hbox.Add(import_btn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
-        hbox.Add(ok_btn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
-
-        panel.SetSizer(hbox)
-
-        ok_btn.Bind(wx.EVT_BUTTON, self.OnOk)
-        import_btn.Bind(wx.EVT_BUTTON, self.OnImport)
-
-        self.Show()
-
-    def OnOk(self, e):
-        if self.callback:
-            index = self.versions_drpdwn.GetCurrentSelection()
-            version = self.versions_drpdwn.GetString(self.versions_drpdwn.GetCurrentSelection() if index > 0 else 0)
-            self.callback(version)
-        self.Close()
-
-
-    def OnImport(self, e):
-        with wx.FileDialog(self, "Open path of Siemens.Engineering.dll", wildcard= "DLL (*.dll)|*.dll", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
-            if fileDialog.ShowModal() == wx.ID_CANCEL:
-                return
-            self.callback(fileDialog.GetPath())
-
-
-class MainWindow(wx.Frame):
-    def __init__(self, parent, title) -> None:
-        wx.Frame.__init__(self, parent, title=title, size=(800,600))
-        self.worker: WorkerThread | None = None
-        EVT_RESULT(self,self.OnResult)
-
-        self.config: dict = {}
-        self.dll: str = ""
-
-        self.CreateStatusBar()
-
-        # Menubars and menu items
-        menubar: wx.MenuBar = wx.MenuBar()
-        _filemenu = wx.Menu()
-        _open = _filemenu.Append(wx.ID_OPEN, "&Open", " Open project configuration.")
-        _close = _filemenu.Append(wx.ID_CLOSE, "&Close", " Close current configuration.")
-        _filemenu.AppendSeparator()
-        _exit = _filemenu.Append(wx.ID_EXIT, "&Exit", "Terminate this tool. (Does not close TIA Portal)")
-        _runmenu = wx.Menu()
-        _run = _runmenu.Append(wx.NewIdRef(), "&Run", " Run project.")
-        self.Bind(wx.EVT_MENU, self.OnOpen, _open)
-        self.Bind(wx.EVT_MENU, self.OnExit, _exit)
-        self.Bind(wx.EVT_MENU, self.OnClose, _close)
-        self.Bind(wx.EVT_MENU, self.OnRun, _run)
-        menubar.Append(_filemenu, "&File")
-        menubar.Append(_runmenu, "&Action")
-        self.SetMenuBar(menubar)
-
-
-        # notebook
-        notebook: wx.Notebook = wx.Notebook(self)
-        _tab_project = wx.Panel(notebook)
-        _vsizer = wx.BoxSizer(wx.VERTICAL)
-        _hsizer = wx.BoxSizer(wx.HORIZONTAL)
-        self.textctrl_config = wx.TextCtrl(_tab_project, size=(300, -1))
-        self.browse_btn: wx.Button = wx.Button(_tab_project, label="Browse")
-        self.select_dll_btn: wx.Button = wx.Button(_tab_project, label="Select DLL")
-        self.execute_btn: wx.Button = wx.Button(_tab_project, label="Execute")
-        _hsizer.Add(self.textctrl_config, proportion=1, flag=wx.ALL|wx.EXPAND, border=5)
-        _hsizer.Add(self.browse_btn, flag=wx.ALL, border=5)
-        _hsizer.Add(self.select_dll_btn, flag=wx.ALL, border=5)
-        _hsizer.Add(self.execute_btn, flag=wx.ALL, border=5)
-        _vsizer.Add(_hsizer, flag= wx.EXPAND|wx.LEFT|wx.RIGHT|wx.TOP, border=5)
-        self.logs: wx.TextCtrl = wx.TextCtrl(_tab_project, style=wx.TE_MULTILINE)
-        # _override_path: wx.CheckBox = wx.CheckBox(_tab_project, label="Override Config Project Path")
-        # _override_path.SetValue(True)
-        # _vsizer.Add(_override_path, flag=wx.ALL|wx.EXPAND, border=5)
-        _vsizer.Add(self.logs, proportion=1, flag=wx.ALL|wx.EXPAND, border=5)
-        _tab_project.SetSizer(_vsizer)
-        self.Bind(wx.EVT_BUTTON, self.OnOpen, self.browse_btn)
-        self.Bind(wx.EVT_BUTTON, self.OnRun, self.execute_btn)
-        self.Bind(wx.EVT_BUTTON, self.OnSelectDLL, self.select_dll_btn)
-        _tab_config = wx.SplitterWindow(notebook, style=wx.SP_LIVE_UPDATE)
-        _sty = wx.BORDER_SUNKEN
-        _p1 = wx.Window(_tab_config, style=_sty)
-        _p2 = wx.Window(_tab_config, style=_sty)
-        self.tree = wx.TreeCtrl(_p1, wx.NewIdRef(), wx.DefaultPosition, wx.DefaultSize, style=wx.TR_DEFAULT_STYLE | wx.TR_FULL_ROW_HIGHLIGHT)
-        self.root_item = self.tree.AddRoot("TIA Portal")
-        self.Bind(wx.EVT_TREE_SEL_CHANGED, self.OnSelectConfigTree, self.tree)
-        self.tab_config_value: wx.TextCtrl = wx.TextCtrl(_p2, style=wx.TE_WORDWRAP|wx.TE_NO_VSCROLL|wx.TE_READONLY)
-        _p1sizer: wx.BoxSizer = wx.BoxSizer(wx.VERTICAL)
-        _p1sizer.Add(self.tree, proportion=1, flag=wx.EXPAND|wx.ALL, border=1)
-        _p1.SetSizer(_p1sizer)
-        _p2sizer: wx.BoxSizer = wx.BoxSizer(wx.VERTICAL)
-        _p2sizer.Add(self.tab_config_value, proportion=1, flag=wx.EXPAND|wx.ALL, border=1)
-        _p2.SetSizer(_p2sizer)
-        _tab_config.SetMinimumPaneSize(100)
-        _tab_config.SplitVertically(_p1, _p2, 250)
-        _tab_config.SetSashPosition(0)
-        notebook.AddPage(_tab_project, "Project")
-        notebook.AddPage(_tab_config, "Config")
-
-        logger.setup(self.logs, 10)
-
-        self.SetMinSize((600,480))
-        self.Show(True)
-
-    def set_b64_dlls(self, dll: dict[str, Path]):
-        self.b64_dlls: dict[str, Path] = dll
-
-    def receive_callback(self, version):
-        if version in self.b64_dlls:
-            self.dll = self.b64_dlls[version].as_posix()
-        else:
-            self.dll = version
-
-    def OnOpen(self, e):
-        with wx.FileDialog(self, "Open TIA Portal project config", wildcard= "json (*.json)|*.json", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
-            if fileDialog.ShowModal() == wx.ID_CANCEL:
-                return
-            self.json_config = fileDialog.GetPath()
-            self.textctrl_config.Clear()
-            self.textctrl_config.write(self.json_config)
-
-        with open(self.json_config) as file:
-            config = json.load(file)
-            self.config = config_schema.validate_config(config)
-            self.config['directory'] = Path(self.textctrl_config.Value).parent
-            self.config['name'] = Path(self.textctrl_config.Value).stem
-            self.populate_config(self.config)
-
-    def OnSelectDLL(self, e):
-        dll_picker = DLLPickerWindow(self, dll_paths=self.b64_dlls, callback=self.receive_callback)
-
-
-    def OnClose(self, e):
-        self.config = {}
-        self.textctrl_config.Clear()
-        while self.tree.ItemHasChildren(self.root_item):
-            item = self.tree.GetFirstChild(self.root_item)[0]
-            self.tree.Delete(item)
-
-
-    def OnExit(self, e):
-        self.Close(True)
-        self.Destroy()
-
-    
-    def OnSelectConfigTree(self, e):
-        item = e.GetItem()
-        
-        value = self.tree.GetItemData(item)
-
-        if value is not None:
-            self.tab_config_value.SetValue(str(value))
-        else:
-            self.tab_config_value.SetValue("")
-
-
-    def OnRun(self, e):
-        dll = Path(self.dll) 
-        if not dll.exists() or not dll.is_file():
-            error_message = "Siemens.Engineering.dll path does not exist!"
-            dialog = wx.MessageDialog(self, error_message, "Error", wx.OK | wx.ICON_ERROR)
-            dialog.ShowModal()
-            dialog.Destroy()
-
-            return
-        self.set_button_active_status(False)
-
-
-        if not self.worker:
-            self.worker = WorkerThread(self, self.config, dll)
-
-
-    def OnResult(self, e):
-        if e.data.get('finished', False) == True:
-            self.worker = None
-        self.set_button_active_status()
-
-
-    def set_button_active_status(self, enable: bool = True):
-        self.execute_btn.Enable(enable)
-        self.browse_btn.Enable(enable)
-        self.select_dll_btn.Enable(enable)
-
-    def populate_config(self, config: dict) -> None:
-        def add_children(root, children):
-            for key, value in children.items():
-                child = self.tree.AppendItem(root, str(key))
-                if isinstance(value, dict):
-                    add_children(child, value)
-                elif isinstance(value, list):
-                    add_children_as_list(child, value)
-                else:
-                    self.tree.SetItemData(child, value)
-
-        def add_children_as_list(root, children):
-            for i,value in enumerate(children):
-                name = str(i)
-                if isinstance(value, dict):
-                    names = ['p_name', 'Name', 'name', 'address', 'path']
-                    for n in names:
-                        if value.get(n):
-                            name = str(value.get(n))
-                            break
-                child = self.tree.AppendItem(root, name)
-                if isinstance(value, dict):
-                    add_children(child, value)
-                elif isinstance(value, list):
-                    add_children_as_list(child, value)
-                else:
-                    self.tree.SetItemData(child, value)
-
-        add_children(self.root_item, config)
-
-        self.tree.Expand(self.root_item)
-
-
-def import_and_execute(config, dll: Path):
-    import clr
-    from System.IO import DirectoryInfo, FileInfo
-
-    clr.AddReference(dll.as_posix())
-    import Siemens.Engineering as SE
-
-    print("TIA Portal Automation Tool")
-    print()
-
-    portal.execute(SE, config,
-        {
-            "DirectoryInfo": DirectoryInfo,
-            "FileInfo": FileInfo,
-            "enable_ui": True,
-        }
-    )
-
-if __name__ == '__main__':
-    dll_paths: dict[str, Path] = {}
-    for key in dlls.b64_dlls:
-        if key == "Siemens.Engineering.Contract":
-            continue
-        if "Hmi" in key:
-            continue
-        data = base64.b64decode(dlls.b64_dlls[key])
-        hmi_data = base64.b64decode(dlls.b64_dlls[f"{key}.Hmi"])
-        dlls_dir = Path("./DLLs")
-        dlls_dir.mkdir(exist_ok=True)
-
-        save_path = Path(dlls_dir) / key
-        save_path.mkdir(exist_ok=True)
-        version_dll_path = save_path / f"Siemens.Engineering.dll"
-        with version_dll_path.open('wb') as version_dll_file:
-            version_dll_file.write(data)
-            logger.logging.debug(f"Written data of {key}")
-
-        version_hmi_dll_path = save_path / f"Siemens.Engineering.Hmi.dll"
-        with version_hmi_dll_path.open('wb') as version_hmi_dll_file:
-            version_hmi_dll_file.write(hmi_data)
-            logger.logging.debug(f"Written data of {key}")
-        dll_paths[key] = version_dll_path.absolute()
-    logger.logging.debug(f"DLL Paths: {dll_paths}")
+# Only what every run needs is imported here. wx (modules/gui.py), the
+# embedded DLLs (res/dlls.py), Openness and modules/portal.py are imported by
+# the paths using them, so "--config ... --no-ui" starts without any of them.
+
+
+def resolve_dll(dll: Path) -> Path:
+    # an embedded DLL version (e.g. V18) is extracted from res/dlls.bin, which
+    # is only opened when dll is not an existing file
+    if dll.is_file():
+        return dll
+
+    from modules import dll_cache
+    from res import dlls
 
+    if str(dll) in dll_cache.versions(dlls.archive):
+        return dll_cache.extract(dlls.archive, str(dll))
+    return dll
+
+
+if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="A simple tool for automating TIA Portal projects.")
     parser.add_argument("-c", "--config",
                         type=Path,
@@ -317,28 +32,235 @@ if __name__ == '__main__':
                         )
     parser.add_argument("--dll",
                         type=Path,
-                        help="Siemens.Engineering.dll path",
+                        help="Siemens.Engineering.dll path or an embedded DLL version (e.g. V18)",
                         default=r"C:/Program Files/Siemens/Automation/Portal V18/PublicAPI/V18/Siemens.Engineering.dll"
                         )
+    parser.add_argument("--project-dir",
+                        type=Path,
+                        help="Directory of the project built from --config (default: next to the config)"
+                        )
+    parser.add_argument("--project-name",
+                        type=str,
+                        help="Name of the project built from --config (default: name of the config)"
+                        )
+    parser.add_argument("--no-ui", "--headless",
+                        action="store_true",
+                        help="Run TIA Portal without its user interface"
+                        )
+    parser.add_argument("--fake-openness",
+                        action="store_true",
+                        help="Run against modules/fake_se.py instead of TIA Portal (dry runs, startup benchmarks)"
+                        )
+    parser.add_argument("--batch",
+                        type=Path,
+                        help="Build every config of a directory or a JSON manifest, one TIA Portal process per job"
+                        )
+    parser.add_argument("--workers",
+                        type=int,
+                        help="Number of concurrent batch jobs (default: by CPU cores and memory) or of XML parsers with --export-project (default: CPU cores)"
+                        )
+    parser.add_argument("--memory-per-worker",
+                        type=float,
+                        help="GB of memory a batch job needs, used for the default --workers (default: 6)"
+                        )
+    parser.add_argument("--job-timeout",
+                        type=float,
+                        help="Seconds after which a batch job is killed"
+                        )
+    parser.add_argument("--batch-logs",
+                        type=Path,
+                        default=Path("./batch-logs"),
+                        help="Directory of the per-job logs and summary.json"
+                        )
+    parser.add_argument("--daemon",
+                        action="store_true",
+                        help="Keep one TIA Portal session running and build the configs sent with --submit"
+                        )
+    parser.add_argument("--session-hours",
+                        type=float,
+                        help="Hours after which the daemon starts a new TIA Portal session (default: 24)"
+                        )
+    parser.add_argument("--submit",
+                        action="store_true",
+                        help="Build --config in the running daemon instead of starting TIA Portal"
+                        )
+    parser.add_argument("--stop-daemon",
+                        action="store_true",
+                        help="Stop the running daemon"
+                        )
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Do not read or write the on-disk caches"
+                        )
+    parser.add_argument("--cache-dir",
+                        type=Path,
+                        help="Directory of the on-disk caches"
+                        )
+    parser.add_argument("--incremental",
+                        action="store_true",
+                        help="Update an existing project from the manifest of its last run instead of rebuilding it"
+                        )
+    parser.add_argument("--hardware",
+                        choices=["objects", "aml"],
+                        default="objects",
+                        help="Create devices and modules one by one or import them in one AutomationML document (falls back to objects)"
+                        )
+    parser.add_argument("--compile",
+                        choices=["software", "block"],
+                        default="software",
+                        help="Compile new blocks from mastercopies together with their PlcSoftware or one by one"
+                        )
+    parser.add_argument("--trace",
+                        type=Path,
+                        help="Time every Openness call and write them as collapsed stacks (flamegraph) to this file"
+                        )
+    parser.add_argument("--prewarm-library",
+                        type=Path,
+                        help="Cache the interfaces of every mastercopy in this global library and exit"
+                        )
+    parser.add_argument("--export-project",
+                        type=Path,
+                        help="Export the blocks, tag tables and devices of this project (.ap18, ...) to a config and exit"
+                        )
+    parser.add_argument("--export-config",
+                        type=Path,
+                        help="Config written by --export-project (default: next to the project, as <project>.json)"
+                        )
+    parser.add_argument("--plc-type",
+                        type=str,
+                        default="OrderNumber:6ES7 510-1DJ01-0AB0/V2.0",
+                        help="PLC used to instantiate mastercopies with --prewarm-library"
+                        )
     parser.add_argument("--debug",
                         action="store_true",
                         help="Set log level to DEBUG"
                         )
+    parser.add_argument("--log-file",
+                        type=Path,
+                        help="Also write the log to this file as JSON lines"
+                        )
     args = parser.parse_args()
 
     json_config = args.config
-    dll = args.dll
-    debug = args.debug
+    dll = args.dll if args.fake_openness else resolve_dll(args.dll)
+    log_level = 10 if args.debug else 20
+    logger.setup(None, log_level, args.log_file)
+
+    options = {
+        "cache": not args.no_cache,
+        "cache_dir": args.cache_dir,
+        "incremental": args.incremental,
+        "trace": args.trace,
+        "hardware": args.hardware,
+        "compile": args.compile,
+        "enable_ui": not args.no_ui,
+    }
+
+    if args.prewarm_library:
+        from modules import portal
+        from modules.openness import load_openness
+
+        SE, DirectoryInfo, FileInfo = load_openness(dll, args.fake_openness)
+        portal.prewarm_library(SE, args.prewarm_library,
+            {
+                "DirectoryInfo": DirectoryInfo,
+                "FileInfo": FileInfo,
+                "plc_type": args.plc_type,
+                **options,
+            }
+        )
+
+    elif args.export_project:
+        import json
+
+        from modules import project_export
+        from modules.openness import load_openness
+
+        SE, DirectoryInfo, FileInfo = load_openness(dll, args.fake_openness)
+        config = project_export.export_project(SE, args.export_project,
+            {
+                "DirectoryInfo": DirectoryInfo,
+                "FileInfo": FileInfo,
+                "workers": args.workers,
+                **options,
+            }
+        )
+        export_config = args.export_config or args.export_project.with_suffix(".json")
+        with open(export_config, 'w', encoding='utf-8') as file:
+            json.dump(config, file, indent=4)
+
+        logger.logging.info(f"Written config to {export_config}")
+
+    elif args.daemon:
+        from modules import daemon
+
+        daemon.Daemon(dll, args.fake_openness, not args.no_ui, args.session_hours or daemon.SESSION_HOURS).serve()
+
+    elif args.stop_daemon:
+        from modules import daemon
+
+        try:
+            daemon.submit({"command": "stop"})
+        except ConnectionError as e:
+            logger.logging.error(e)
+            sys.exit(1)
+
+    elif args.batch:
+        from modules import batch
+
+        jobs = batch.collect_jobs(args.batch)
+        workers = args.workers or batch.default_workers(args.memory_per_worker or batch.MEMORY_PER_WORKER)
+
+        shared = ["--dll", str(dll), "--no-ui"]
+        if args.no_cache:
+            shared.append("--no-cache")
+        if args.cache_dir:
+            shared += ["--cache-dir", str(args.cache_dir)]
+        if args.incremental:
+            shared.append("--incremental")
+        if args.debug:
+            shared.append("--debug")
+        if args.fake_openness:
+            shared.append("--fake-openness")
+        shared += ["--hardware", args.hardware, "--compile", args.compile]
+
+        start = time.perf_counter()
+        results = batch.run_batch(jobs, lambda job: batch.main_command() + batch.job_arguments(job) + shared, args.batch_logs, workers, args.job_timeout)
+        wall = time.perf_counter() - start
+
+        print(batch.summary(results, wall))
+        batch.save_summary(args.batch_logs / "summary.json", results, wall)
+        if any(result.status != "ok" for result in results):
+            sys.exit(1)
+
+    elif json_config and args.submit:
+        from modules import daemon
+
+        try:
+            result = daemon.submit({
+                "command": "build",
+                "config": str(json_config.resolve()),
+                "directory": str(args.project_dir.resolve()) if args.project_dir else None,
+                "name": args.project_name,
+                "options": {**options, "cache_dir": str(args.cache_dir.resolve()) if args.cache_dir else None},
+            })
+        except ConnectionError as e:
+            logger.logging.error(e)
+            sys.exit(1)
+        if result['status'] != "ok":
+            sys.exit(1)
+
+    elif json_config:
+        from modules.openness import import_and_execute, load_config
+
+        validated_config = load_config(json_config, args.project_dir, args.project_name)
+        import_and_execute(validated_config, dll, options, args.fake_openness)
 
-    if json_config:
-        with open(json_config) as file:
-            config = json.load(file)
-            validated_config = config_schema.validate_config(config)
+    else:
+        from modules import dll_cache, gui
+        from res import dlls
 
-        import_and_execute(validated_config, dll)
+        dll_paths: dict[str, Path] = {version: dll_cache.dll_path(version) for version in dll_cache.versions(dlls.archive)}
+        logger.logging.debug("DLL Paths: %s", dll_paths)
 
-    else:
-        app = wx.App(False)
-        frame = MainWindow(None, title="TIA Portal Automation Tool")
-        frame.set_b64_dlls(dll_paths)
-        app.MainLoop()
+        gui.run(dll_paths, log_level, args.log_file)
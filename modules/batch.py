@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Callable
+import ctypes
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+# Builds many project configs at once. Every job runs in its own process
+# (main.py --config ...) so each one owns a TiaPortal instance, can be killed
+# on timeout and cannot take the other jobs down with it.
+
+MEMORY_PER_WORKER: float = 6.0 # GB, a TIA Portal instance with a mid sized project
+
+
+@dataclass
+class Job:
+    config: Path
+    directory: Path | None = None
+    name: str | None = None
+
+    @property
+    def title(self) -> str:
+        return self.name or self.config.stem
+
+
+@dataclass
+class JobResult:
+    job: str
+    config: str
+    status: str # "ok", "failed" or "timeout"
+    returncode: int | None
+    duration: float
+    log: str
+
+
+def collect_jobs(source: Path) -> list[Job]:
+    # A directory means every *.json config in it. A manifest is a JSON list
+    # of config paths or of {"config": ..., "directory": ..., "name": ...}
+    # objects, relative paths being relative to the manifest.
+    if source.is_dir():
+        return [Job(path) for path in sorted(source.glob("*.json"))]
+
+    with open(source, 'r', encoding='utf-8') as file:
+        entries = json.load(file)
+
+    jobs: list[Job] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"config": entry}
+        directory = entry.get('directory')
+        jobs.append(Job(
+            source.parent / entry['config'],
+            source.parent / directory if directory else None,
+            entry.get('name'),
+        ))
+    return jobs
+
+
+def total_memory() -> float | None:
+    # physical memory in GB
+    if os.name == 'nt':
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+        return status.ullTotalPhys / 1024 ** 3
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers(memory_per_worker: float = MEMORY_PER_WORKER) -> int:
+    workers = os.cpu_count() or 1
+    memory = total_memory()
+    if memory:
+        workers = min(workers, int(memory // memory_per_worker))
+    return max(1, workers)
+
+
+def main_command() -> list[str]:
+    # a frozen build is its own interpreter and main.py at once
+    if getattr(sys, 'frozen', False):
+        return [sys.executable]
+    return [sys.executable, str(Path(__file__).resolve().parent.parent / "main.py")]
+
+
+def job_arguments(job: Job) -> list[str]:
+    arguments = ["--config", str(job.config)]
+    if job.directory:
+        arguments += ["--project-dir", str(job.directory)]
+    if job.name:
+        arguments += ["--project-name", job.name]
+    return arguments
+
+
+def kill(process: subprocess.Popen) -> None:
+    # TIA Portal runs as a child of the job, take the whole tree down
+    if os.name == 'nt':
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        process.kill()
+    process.wait()
+
+
+def run_job(job: Job, command: list[str], log: Path, timeout: float | None) -> JobResult:
+    logging.info(f"Starting job {job.title}: {job.config}")
+
+    start = time.perf_counter()
+    with open(log, 'w', encoding='utf-8') as file:
+        process = subprocess.Popen(command, stdout=file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        try:
+            returncode: int | None = process.wait(timeout)
+            status = "ok" if returncode == 0 else "failed"
+        except subprocess.TimeoutExpired:
+            kill(process)
+            returncode = None
+            status = "timeout"
+            file.write(f"\nKilled after {timeout} s\n")
+    duration = time.perf_counter() - start
+
+    logging.info(f"Finished job {job.title}: {status} in {duration:.1f} s")
+
+    return JobResult(job.title, str(job.config), status, returncode, duration, str(log))
+
+
+def run_batch(jobs: list[Job], command: Callable[[Job], list[str]], log_dir: Path, workers: int, timeout: float | None = None) -> list[JobResult]:
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    logging.info(f"Running {len(jobs)} jobs on {workers} workers, logs in {log_dir}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job") as executor:
+        futures = [
+            executor.submit(run_job, job, command(job), log_dir / f"{i:03d}_{job.title}.log", timeout)
+            for i, job in enumerate(jobs)
+        ]
+        return [future.result() for future in futures]
+
+
+def summary(results: list[JobResult], wall: float) -> str:
+    lines = [f"{'job':<32} {'status':<8} {'duration':>10}  log"]
+    for result in results:
+        lines.append(f"{result.job:<32} {result.status:<8} {result.duration:>9.1f}s  {result.log}")
+    ok = sum(1 for result in results if result.status == "ok")
+    busy = sum(result.duration for result in results)
+    lines.append(f"{ok}/{len(results)} succeeded, {busy:.1f} s of job time in {wall:.1f} s wall time")
+    return "\n".join(lines)
+
+
+def save_summary(path: Path, results: list[JobResult], wall: float) -> None:
+    data: dict[str, Any] = {
+        "wall": wall,
+        "succeeded": sum(1 for result in results if result.status == "ok"),
+        "jobs": [asdict(result) for result in results],
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=4)
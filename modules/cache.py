@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from enum import Enum
+from pathlib import Path
+from threading import Lock
+from typing import Any
+import hashlib
+import json
+import logging
+import os
+
+
+def cache_directory() -> Path:
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home() / ".cache"
+    return Path(base) / "tia-portal-automation-tool"
+
+
+def normalize(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Path):
+        return value.as_posix()
+    if isinstance(value, Sequence):
+        # lists expanding templates (modules/templates.py)
+        return list(value)
+    return str(value)
+
+
+def stable_hash(*parts: Any) -> str:
+    data = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=normalize)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class XmlCache:
+    # Content addressed store of generated block XML. Entries are files named
+    # after their key; hits refresh the mtime so eviction can drop the least
+    # recently used files once the cache grows past max_bytes.
+    def __init__(self, directory: Path, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory: Path = directory
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._lock = Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size: int = sum(path.stat().st_size for path in self.directory.glob("*.xml"))
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.xml"
+
+    def get(self, key: str) -> str | None:
+        path = self.path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                xml = file.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+
+        return xml
+
+    def put(self, key: str, xml: str) -> None:
+        path = self.path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{id(xml)}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(xml)
+            size = tmp_path.stat().st_size
+            # another run may have written the same key, it is replaced
+            try:
+                size -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed writing XML cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            self._size += size
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.xml"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(entry[1] for entry in entries)
+        # trim to 90% so a full cache does not evict on every put
+        target = self.max_bytes * 9 // 10
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = self.hits / total * 100 if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({ratio:.1f}% hit rate), {self.evictions} evictions, {self._size / 1024 / 1024:.1f} MB"
+
+
+class InterfaceCache:
+    # Interface sections of library mastercopies, keyed by the library file
+    # (path, size and mtime) and the mastercopy name. Entries live in memory
+    # for repeat references within a run and as JSON files across runs.
+    VERSION: int = 2
+
+    def __init__(self, directory: Path) -> None:
+        self.directory: Path = directory
+        self.hits: int = 0
+        self.misses: int = 0
+        self._libraries: dict[str, str] = {}
+        self._memory: dict[str, list[dict[str, Any]]] = {}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def register_library(self, name: str, path: Path) -> None:
+        try:
+            stat = path.stat()
+        except OSError:
+            logging.debug("Not caching interfaces of %s, cannot stat %s", name, path)
+            return
+        self._libraries[name] = stable_hash(path.resolve().as_posix(), stat.st_size, stat.st_mtime_ns)
+
+    def key(self, library: str, mastercopy: str) -> str | None:
+        fingerprint = self._libraries.get(library)
+        if not fingerprint:
+            return None
+        return stable_hash("interface", self.VERSION, fingerprint, mastercopy)
+
+    def get(self, library: str, mastercopy: str) -> list[dict[str, Any]] | None:
+        key = self.key(library, mastercopy)
+        if not key:
+            return None
+
+        sections = self._memory.get(key)
+        if sections is None:
+            try:
+                with open(self.directory / f"{key}.json", 'r', encoding='utf-8') as file:
+                    sections = json.load(file)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            self._memory[key] = sections
+
+        self.hits += 1
+
+        return sections
+
+    def put(self, library: str, mastercopy: str, sections: list[dict[str, Any]]) -> None:
+        key = self.key(library, mastercopy)
+        if not key:
+            return
+
+        self._memory[key] = sections
+        path = self.directory / f"{key}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(sections, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed writing interface cache entry {path}: {e}")
+
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses"
+
+
+class LayoutCache:
+    # Positions of the device items carrying a service (NetworkInterface,
+    # SoftwareContainer) per device type. Learned from the first device of a
+    # type, kept for the others and saved as one JSON file across runs.
+    VERSION: int = 1
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path: Path | None = path
+        self.hits: int = 0
+        self.misses: int = 0
+        self._layouts: dict[str, dict[str, list[int]]] = {}
+        self._changed: bool = False
+
+        if path is None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            self._layouts = data.get('layouts', {})
+
+    def get(self, type_identifier: str, service: str) -> list[int] | None:
+        positions = self._layouts.get(type_identifier, {}).get(service)
+        if positions is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return positions
+
+    def put(self, type_identifier: str, service: str, positions: list[int]) -> None:
+        layout = self._layouts.setdefault(type_identifier, {})
+        if layout.get(service) != positions:
+            layout[service] = positions
+            self._changed = True
+
+    def save(self) -> None:
+        if self.path is None or not self._changed:
+            return
+
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({"version": self.VERSION, "layouts": self._layouts}, file, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Failed writing layout cache {self.path}: {e}")
+            return
+
+        self._changed = False
+
+    def stats(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses"
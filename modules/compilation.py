@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable
+import logging
+import time
+
+# Blocks created from mastercopies have to be compiled before their interface
+# can be exported. Compiling each one when it is created compiles their shared
+# dependencies over and over, so the scheduler collects them and compiles
+# them together once their interfaces are needed: the whole PlcSoftware once
+# ("software", falling back to every block when that fails) or every block on
+# its own ("block").
+
+MODES: tuple[str, ...] = ("software", "block")
+
+
+@dataclass
+class CompilerMessage:
+    path: str
+    state: str
+    description: str
+
+
+@dataclass
+class CompileResult:
+    target: str
+    state: str # Success, Information, Warning or Error
+    errors: int
+    warnings: int
+    duration: float
+    messages: list[CompilerMessage] = field(default_factory=list)
+
+
+def flatten_messages(messages: Any, flat: list[CompilerMessage]) -> list[CompilerMessage]:
+    for message in messages:
+        flat.append(CompilerMessage(str(message.Path), str(message.State), str(message.Description)))
+        flatten_messages(getattr(message, "Messages", ()), flat)
+    return flat
+
+
+class CompileScheduler:
+    def __init__(self, SE: Siemens.Engineering, mode: str = "software") -> None:
+        self.SE = SE
+        self.mode = mode
+        self.pending: list[tuple[Any, Any, Callable[[Any], None]]] = [] # (software, block, compiled)
+        self.results: list[CompileResult] = []
+
+    def defer(self, software_base: Siemens.Engineering.SW.PlcSoftware, block: Siemens.Engineering.SW.Blocks.PlcBlock, compiled: Callable[[Any], None]) -> None:
+        # compiled(block) runs once the block is compiled
+        self.pending.append((software_base, block, compiled))
+
+    def compile(self, target: Any) -> CompileResult:
+        start = time.perf_counter()
+        result = target.GetService[self.SE.Compiler.ICompilable]().Compile()
+        compile_result = CompileResult(
+            target.Name,
+            str(result.State),
+            int(result.ErrorCount),
+            int(result.WarningCount),
+            time.perf_counter() - start,
+            flatten_messages(result.Messages, []),
+        )
+        self.results.append(compile_result)
+
+        logging.info(f"Compiled {compile_result.target}: {compile_result.state}, {compile_result.errors} errors, {compile_result.warnings} warnings in {compile_result.duration:.2f} s")
+        for message in compile_result.messages:
+            if message.state in ("Error", "Warning"):
+                logging.warning(f"{message.path}: {message.description}")
+
+        return compile_result
+
+    def flush(self) -> None:
+        pending, self.pending = self.pending, []
+        while pending:
+            software_base = pending[0][0]
+            group = [entry for entry in pending if entry[0] is software_base]
+            pending = [entry for entry in pending if entry[0] is not software_base]
+
+            if self.mode == "software" and len(group) > 1:
+                if self.compile(software_base).state != "Error":
+                    for _, block, compiled in group:
+                        compiled(block)
+                    continue
+
+                logging.warning(f"Compiling {software_base.Name} failed, compiling its {len(group)} new blocks one by one")
+
+            for _, block, compiled in group:
+                self.compile(block)
+                compiled(block)
+
+    def summary(self) -> str:
+        errors = sum(result.errors for result in self.results)
+        warnings = sum(result.warnings for result in self.results)
+        return f"{len(self.results)} compilations, {errors} errors, {warnings} warnings, {sum(result.duration for result in self.results):.2f} s"
@@ -2,6 +2,8 @@ from enum import Enum
 from pathlib import Path
 from schema import Schema, And, Or, Use, Optional, SchemaError
 from dataclasses import dataclass
+from .schema_compiler import Invalid, compile_schema
+from .templates import KINDS, Templates
 
 class SourceType(Enum):
     LIBRARY = "LIBRARY"
@@ -18,6 +20,19 @@ class DatabaseType(Enum):
     MULTI       = "MULTI"
     LOCAL       = "LOCAL"
 
+# a use of a template in a list, see modules/templates.py
+schema_template_use = {
+    "template": str,
+    Optional("repeat", default=1): And(int, lambda n: n >= 0),
+    Optional("params", default={}): dict,
+}
+
+schema_template = {
+    "kind": Or(*KINDS),
+    Optional("params", default={}): dict,
+    "body": dict,
+}
+
 schema_wire = Schema({
     "name": str,
     "from": str,
@@ -139,7 +154,7 @@ schema_device_plc = {
         **schema_device,
         "p_deviceName": str, # NewPlcDevice
         Optional("slots_required", default=2): int,
-        Optional("Program blocks", default=[]): And(list, [Or(schema_program_block_ob,schema_program_block_fb,schema_program_block_fc, schema_globaldb)]),
+        Optional("Program blocks", default=[]): And(list, [Or(schema_template_use, schema_program_block_ob,schema_program_block_fb,schema_program_block_fc, schema_globaldb)]),
         Optional("PLC tags", default=[]): And(list, [schema_plc_tag_table]),
         Optional("Local modules", default=[]): And(list, [schema_module]),
     }
@@ -178,8 +193,9 @@ schema = Schema(
         # "name": str,
         # Optional("directory", default=Path.home()): And(str, Use(Path), lambda p: Path(p)),
         Optional("overwrite", default=False): bool,
-        Optional("devices", default=[]): And(list, [Or(schema_device_plc, schema_device_hmi, schema_device_ionode)]),
-        Optional("networks", default=[]): And(list, [schema_network]),
+        Optional("templates", default={}): {str: schema_template},
+        Optional("devices", default=[]): And(list, [Or(schema_template_use, schema_device_plc, schema_device_hmi, schema_device_ionode)]),
+        Optional("networks", default=[]): And(list, [Or(schema_template_use, schema_network)]),
         Optional("libraries", default=[]): And(list, [schema_library]),
 
         # },
@@ -187,6 +203,26 @@ schema = Schema(
     ignore_extra_keys=True  
 )
 
+compiled_schema = compile_schema(schema)
+
+# what the body of a template of each kind is validated against
+template_schemas = {
+    "device": Schema(Or(schema_device_plc, schema_device_hmi, schema_device_ionode)),
+    "network": Schema(schema_network),
+    "program_block": Schema(Or(schema_program_block_ob, schema_program_block_fb, schema_program_block_fc, schema_globaldb)),
+}
+
 def validate_config(data):
-    return schema.validate(data)
+    try:
+        config = compiled_schema(data)
+    except Invalid:
+        # rerun the schema library for its error message
+        config = schema.validate(data)
+
+    # lists using templates expand them when they are read
+    templates = Templates(config['templates'], template_schemas)
+    config['templates'] = templates
+    config['devices'] = templates.wrap(config['devices'], "device")
+    config['networks'] = templates.wrap(config['networks'], "network")
+    return config
 
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any, Callable
+import bisect
+import re
+
+from .templates import TemplateList, Templates, is_use
+
+# The config as seen by the Config tab of the GUI, without wx. A node is a
+# (container, key) pair referring into the config, its value is
+# container[key]; a key that is a range stands for a group of GROUP_SIZE
+# items of a long list. Nodes are created when their parent is expanded, so
+# opening a config does not depend on its size.
+
+GROUP_SIZE: int = 1000
+
+# keys naming the items of a list, in order of preference
+NAME_KEYS: tuple[str, ...] = ('p_name', 'Name', 'name', 'address', 'path')
+
+TOKEN = re.compile(r"[^\W_]+")
+
+
+def is_container(value: Any) -> bool:
+    # JSON types first, isinstance with the Sequence ABC is slow
+    if type(value) in (dict, list):
+        return True
+    if type(value) in (str, int, float, bool) or value is None:
+        return False
+    return isinstance(value, (dict, Templates)) or (isinstance(value, Sequence) and not isinstance(value, (str, bytes)))
+
+
+def contents(value: Any) -> Any:
+    # the templates of a config are shown as their definitions
+    if isinstance(value, Templates):
+        return value.definitions
+    return value
+
+
+def name_of(value: Any) -> str | None:
+    if isinstance(value, dict):
+        for name in NAME_KEYS:
+            if value.get(name):
+                return str(value[name])
+    return None
+
+
+def item_name(value: Any, key: Any) -> str:
+    return name_of(value) or str(key)
+
+
+def root(config: dict[str, Any]) -> tuple[Any, Any]:
+    return [config], 0
+
+
+def value(node: tuple[Any, Any]) -> Any:
+    container, key = node
+    return container[key]
+
+
+def has_children(node: tuple[Any, Any]) -> bool:
+    if isinstance(node[1], range):
+        return True
+    item = value(node)
+    return is_container(item) and len(contents(item)) > 0
+
+
+def children(node: tuple[Any, Any]) -> list[tuple[Any, Any]]:
+    container, key = node
+    if isinstance(key, range):
+        return [(container, i) for i in key]
+    item = contents(container[key])
+    if isinstance(item, dict):
+        return [(item, k) for k in item]
+    if len(item) > GROUP_SIZE:
+        return [(item, range(i, min(i + GROUP_SIZE, len(item)))) for i in range(0, len(item), GROUP_SIZE)]
+    return [(item, i) for i in range(len(item))]
+
+
+def label(node: tuple[Any, Any]) -> str:
+    container, key = node
+    if isinstance(key, range):
+        return f"[{key.start}..{key.stop - 1}]"
+    if isinstance(container, dict):
+        return str(key)
+    return item_name(container[key], key)
+
+
+class ConfigIndex:
+    # Every key of the config's dicts and every name of a list item (see
+    # NAME_KEYS), with the words they are made of, for prefix search. Built
+    # once when a config is loaded. Lists built from templates are indexed by
+    # their entries, a use under the name of its template at its first
+    # instance, so the instances stay unexpanded until they are read.
+    # Entries are numbered in the order of the tree and keep their parent's
+    # number and their key instead of their whole path.
+    def __init__(self, config: dict[str, Any], progress: Callable[[str, float | None], None] | None = None) -> None:
+        self.parents: list[int] = []
+        self.keys: list[Any] = []
+        orders: dict[str, list[int]] = {}
+        words: dict[str, list[str]] = {}
+
+        # depth first, pushed in reverse, so the entries are in the order of the tree
+        stack: list[tuple[Any, int, Any, str | None]] = [(config[key], -1, key, str(key)) for key in reversed(list(config))]
+        while stack:
+            item, parent, key, text = stack.pop()
+            order = len(self.keys)
+            self.parents.append(parent)
+            self.keys.append(key)
+            if text is not None:
+                terms = words.get(text)
+                if terms is None:
+                    lowered = text.lower()
+                    terms = words[text] = [lowered] + [token for token in TOKEN.findall(lowered) if token != lowered]
+                for term in terms:
+                    orders.setdefault(term, []).append(order)
+            if progress and order % 10000 == 0:
+                progress("Indexing", None)
+
+            item = contents(item)
+            if isinstance(item, dict):
+                for child_key in reversed(list(item)):
+                    stack.append((item[child_key], order, child_key, str(child_key)))
+            elif isinstance(item, TemplateList):
+                for position in reversed(range(len(item.entries))):
+                    entry = item.entries[position]
+                    if is_use(entry):
+                        if entry['repeat']:
+                            stack.append((None, order, item.starts[position], entry['template']))
+                    elif is_container(entry):
+                        stack.append((entry, order, item.starts[position], name_of(entry)))
+            elif is_container(item):
+                for i in reversed(range(len(item))):
+                    child = item[i]
+                    if is_container(child):
+                        stack.append((child, order, i, name_of(child)))
+
+        self.orders = orders
+        self.terms: list[str] = sorted(orders)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def path(self, order: int) -> tuple[Any, ...]:
+        path: list[Any] = []
+        while order >= 0:
+            path.append(self.keys[order])
+            order = self.parents[order]
+        return tuple(reversed(path))
+
+    def search(self, text: str, limit: int | None = None) -> list[tuple[Any, ...]]:
+        # paths whose key or name, or one of their words, starts with text, in
+        # the order of the tree
+        text = text.strip().lower()
+        if not text:
+            return []
+        found: set[int] = set()
+        for position in range(bisect.bisect_left(self.terms, text), len(self.terms)):
+            if not self.terms[position].startswith(text):
+                break
+            found.update(self.orders[self.terms[position]])
+        return [self.path(order) for order in sorted(found)[:limit]]
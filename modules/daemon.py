@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+import time
+
+from . import logger
+from .cache import cache_directory
+
+# Keeps the CLR, a TIA Portal session and its opened libraries alive between
+# builds. Clients connect through a named pipe (Windows) or a Unix socket,
+# send one job and receive its log records and result; jobs run one at a time
+# on the daemon's main thread. The address and the key of the connection are
+# written to daemon.json in the cache directory, readable by the user only.
+
+SESSION_HOURS: float = 24.0
+
+
+def info_path() -> Path:
+    return cache_directory() / "daemon.json"
+
+
+def default_address() -> str:
+    if os.name == 'nt':
+        return rf"\\.\pipe\tia-portal-automation-tool-{os.getpid()}"
+    return str(cache_directory() / "daemon.sock")
+
+
+def write_info(address: str, authkey: bytes) -> None:
+    path = info_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+        json.dump({"address": address, "authkey": authkey.hex(), "pid": os.getpid()}, file)
+
+
+def read_info() -> tuple[str, bytes] | None:
+    try:
+        with open(info_path(), 'r', encoding='utf-8') as file:
+            info = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return info['address'], bytes.fromhex(info['authkey'])
+
+
+class ConnectionHandler(logging.Handler):
+    # sends the records of a job to its client; a client that went away does
+    # not stop the job
+    def __init__(self, connection: Connection) -> None:
+        super().__init__()
+        self.connection = connection
+        self.setFormatter(logging.Formatter(logger.FORMAT))
+
+    def emit(self, record):
+        try:
+            self.connection.send(("log", record.levelno, self.format(record)))
+        except (OSError, EOFError, ValueError):
+            pass
+
+
+class Daemon:
+    def __init__(self, dll: Path, fake: bool = False, enable_ui: bool = False, session_hours: float = SESSION_HOURS) -> None:
+        from .openness import load_openness
+
+        self.SE, self.DirectoryInfo, self.FileInfo = load_openness(dll, fake)
+        self.enable_ui = enable_ui
+        self.session_age = session_hours * 3600
+        self.session = None
+        self.jobs = 0
+
+    def settings(self, options: dict[str, Any]) -> dict[str, Any]:
+        # tracing would wrap only the objects created during the job, not the
+        # session, so it is not offered here
+        if options.pop('trace', None):
+            logging.warning("Tracing is not available for jobs of the daemon, run them without --submit")
+        return {
+            "DirectoryInfo": self.DirectoryInfo,
+            "FileInfo": self.FileInfo,
+            **options,
+            "enable_ui": self.enable_ui,
+        }
+
+    def start_session(self):
+        from . import portal
+
+        if self.session and time.monotonic() - self.session.started > self.session_age:
+            logging.info(f"Renewing the TIA Portal session after {self.session_age / 3600:.1f} h")
+
+            self.close_session()
+        if not self.session:
+            start = time.perf_counter()
+            self.session = portal.start_session(self.SE, {"enable_ui": self.enable_ui})
+
+            logging.info(f"Started TIA Portal session in {time.perf_counter() - start:.1f} s")
+
+        return self.session
+
+    def close_session(self) -> None:
+        session, self.session = self.session, None
+        if session is None:
+            return
+        try:
+            session.TIA.Dispose()
+        except Exception as e:
+            logging.warning(f"Failed disposing TIA Portal: {e}")
+
+    def run_job(self, request: dict[str, Any]) -> dict[str, Any]:
+        from . import portal
+        from .openness import load_config
+
+        start = time.perf_counter()
+        session = None
+        try:
+            config = load_config(Path(request['config']), request.get('directory') and Path(request['directory']), request.get('name'))
+            options = request.get('options', {})
+            if options.get('cache_dir'):
+                options['cache_dir'] = Path(options['cache_dir'])
+
+            session = self.start_session()
+            compile_results = portal.execute(self.SE, config, self.settings(options), session)
+            portal.close_projects(session.TIA, save=True)
+        except Exception as e:
+            logging.exception(f"Job {request.get('config')} failed")
+
+            if session:
+                try:
+                    portal.close_projects(session.TIA)
+                except Exception:
+                    # the session is unusable, the next job starts a new one
+                    self.close_session()
+            return {"status": "failed", "error": str(e), "duration": time.perf_counter() - start}
+
+        return {"status": "ok", "duration": time.perf_counter() - start, "compile": [asdict(result) for result in compile_results]}
+
+    def handle(self, connection: Connection) -> bool:
+        # False when the daemon is asked to stop
+        request: dict[str, Any] = connection.recv()
+        if request.get('command') == "stop":
+            connection.send(("result", {"status": "ok"}))
+            return False
+
+        self.jobs += 1
+        handler = ConnectionHandler(connection)
+        root = logging.getLogger()
+        root.addHandler(handler)
+        try:
+            logging.info(f"Job {self.jobs}: {request.get('config')}")
+
+            result = self.run_job(request)
+
+            logging.info(f"Job {self.jobs} {result['status']} in {result['duration']:.1f} s")
+        finally:
+            root.removeHandler(handler)
+        connection.send(("result", result))
+        return True
+
+    def serve(self, address: str | None = None) -> None:
+        address = address or default_address()
+        authkey = os.urandom(32)
+        if os.name != 'nt':
+            Path(address).parent.mkdir(parents=True, exist_ok=True)
+            Path(address).unlink(missing_ok=True)
+
+        self.start_session()
+
+        with Listener(address, authkey=authkey) as listener:
+            write_info(address, authkey)
+
+            logging.info(f"Daemon listening on {address}")
+
+            try:
+                running = True
+                while running:
+                    try:
+                        connection = listener.accept()
+                    except Exception as e:
+                        logging.warning(f"Rejected a connection: {e}")
+
+                        continue
+                    with connection:
+                        try:
+                            running = self.handle(connection)
+                        except (OSError, EOFError) as e:
+                            logging.warning(f"Lost a client: {e}")
+            finally:
+                info_path().unlink(missing_ok=True)
+                self.close_session()
+
+        logging.info("Daemon stopped")
+
+
+def submit(request: dict[str, Any]) -> dict[str, Any]:
+    # sends one request to the running daemon and logs what it streams back
+    info = read_info()
+    if info is None:
+        raise ConnectionError(f"No daemon is running ({info_path()} is missing)")
+    address, authkey = info
+
+    with Client(address, authkey=authkey) as connection:
+        connection.send(request)
+        while True:
+            kind, *data = connection.recv()
+            if kind == "log":
+                print(data[1], flush=True)
+            elif kind == "result":
+                return data[0]
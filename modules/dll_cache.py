@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable
+import hashlib
+import json
+import logging
+import os
+
+from .resource_archive import ResourceArchive
+
+DLLS_DIR: Path = Path("./DLLs")
+MANIFEST: str = "manifest.json"
+SKIPPED_KEYS: list[str] = ["Siemens.Engineering.Contract"]
+
+
+def versions(archive: Iterable[str]) -> list[str]:
+    return [key for key in archive if key not in SKIPPED_KEYS and "Hmi" not in key]
+
+
+def dll_path(version: str, directory: Path = DLLS_DIR) -> Path:
+    return (directory / version / "Siemens.Engineering.dll").absolute()
+
+
+def load_manifest(directory: Path) -> dict[str, dict]:
+    path = directory / MANIFEST
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        logging.warning(f"Ignoring unreadable DLL manifest: {path}")
+        return {}
+
+
+def save_manifest(directory: Path, manifest: dict[str, dict]) -> None:
+    path = directory / MANIFEST
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=4)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_current(path: Path, entry: dict | None, source: str) -> bool:
+    if not entry or entry.get('source') != source:
+        return False
+    if not path.is_file():
+        return False
+    stat = path.stat()
+    if stat.st_size != entry.get('size'):
+        return False
+    if stat.st_mtime_ns == entry.get('mtime_ns'):
+        return True
+    if file_digest(path) != entry.get('sha256'):
+        return False
+    entry['mtime_ns'] = stat.st_mtime_ns
+
+    return True
+
+
+def write_chunks(chunks: Iterable[bytes], path: Path) -> dict:
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as file:
+        for chunk in chunks:
+            digest.update(chunk)
+            size += len(chunk)
+            file.write(chunk)
+    os.replace(tmp_path, path)
+
+    return {
+        "sha256": digest.hexdigest(),
+        "size": size,
+        "mtime_ns": path.stat().st_mtime_ns,
+    }
+
+
+def extract(archive: ResourceArchive, version: str, directory: Path = DLLS_DIR) -> Path:
+    if version not in archive:
+        raise KeyError(f"No embedded DLL for version {version}")
+
+    files: dict[str, str] = {
+        "Siemens.Engineering.dll": version,
+        "Siemens.Engineering.Hmi.dll": f"{version}.Hmi",
+    }
+
+    version_dir = directory / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(directory)
+    changed = False
+
+    for filename, key in files.items():
+        if key not in archive:
+            continue
+        source = archive.digest(key)
+        path = version_dir / filename
+        name = f"{version}/{filename}"
+        entry = manifest.get(name)
+        mtime_ns = entry.get('mtime_ns') if entry else None
+
+        if is_current(path, entry, source):
+            logging.debug("DLL cache hit: %s", path)
+            changed |= entry['mtime_ns'] != mtime_ns
+            continue
+
+        logging.debug("Extracting %s to %s", key, path)
+
+        manifest[name] = {"source": source, **write_chunks(archive.iter_chunks(key), path)}
+        changed = True
+
+    if changed:
+        save_manifest(directory, manifest)
+
+    return dll_path(version, directory)
@@ -0,0 +1,726 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Iterator
+import json
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+
+# Offline stand-in for the parts of Siemens.Engineering used by portal.execute.
+# Every Openness call goes through Recorder.call() which counts it and sleeps
+# for the configured latency, so runs can be measured without TIA Portal.
+
+INTERFACE_NS = "http://www.siemens.com/automation/Openness/SW/Interface/v5"
+
+# Matched in order against p_typeIdentifier to decide which hardware layout a
+# created device gets.
+DEVICE_KINDS: list[tuple[str, str]] = [
+    ("OrderNumber:6ES7 155", "ionode"),
+    ("OrderNumber:6AV", "hmi"),
+    ("OrderNumber:6ES7 5", "plc"),
+    ("OrderNumber:6ES7 2", "plc"),
+    ("OrderNumber:6ES7 1", "plc"),
+]
+
+
+class EngineeringNotSupportedException(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self, latency: float = 0.0, latencies: dict[str, float] | None = None, unsupported: set[str] | None = None) -> None:
+        self.latency: float = latency
+        self.latencies: dict[str, float] = latencies or {}
+        # APIs that fail like on a TIA Portal version without them
+        self.unsupported: set[str] = unsupported or set()
+        self.calls: Counter[str] = Counter()
+        self.durations: defaultdict[str, float] = defaultdict(float)
+        self.timeline: list[tuple[str, float, float]] = []
+
+    def call(self, api: str) -> None:
+        if api in self.unsupported:
+            raise EngineeringNotSupportedException(f"{api} is not supported")
+        start = time.perf_counter()
+        delay = self.latencies.get(api, self.latency)
+        if delay > 0:
+            time.sleep(delay)
+        end = time.perf_counter()
+        self.calls[api] += 1
+        self.durations[api] += end - start
+        self.timeline.append((api, start, end))
+
+    def reset(self) -> None:
+        self.calls.clear()
+        self.durations.clear()
+        self.timeline.clear()
+
+
+TiaPortalMode = Enum("TiaPortalMode", ["WithUserInterface", "WithoutUserInterface"])
+OpenMode = Enum("OpenMode", ["ReadOnly", "ReadWrite"])
+ImportOptions = Enum("ImportOptions", ["None", "Override"])
+CaxImportOptions = Enum("CaxImportOptions", ["MoveToParkingLot", "RetainTiaDevice", "OverwriteTiaDevice"])
+ExportOptions = Enum("ExportOptions", ["None", "WithDefaults", "WithReadOnly"])
+
+
+class DirectoryInfo:
+    def __init__(self, path: str) -> None:
+        self.FullName: str = str(Path(path).absolute())
+        self.Name: str = Path(path).name
+
+    @property
+    def Exists(self) -> bool:
+        return Path(self.FullName).is_dir()
+
+    def Delete(self, recursive: bool = False) -> None:
+        if recursive:
+            shutil.rmtree(self.FullName)
+        else:
+            Path(self.FullName).rmdir()
+
+    def __str__(self) -> str:
+        return self.FullName
+
+
+class FileInfo:
+    def __init__(self, path: str) -> None:
+        self.FullName: str = str(Path(path).absolute())
+        self.Name: str = Path(path).name
+
+    @property
+    def Exists(self) -> bool:
+        return Path(self.FullName).is_file()
+
+    def __str__(self) -> str:
+        return self.FullName
+
+
+class Composition:
+    def __init__(self, recorder: Recorder, items: list[Any] | None = None) -> None:
+        self._recorder = recorder
+        self._items: list[Any] = items if items is not None else []
+
+    def __getitem__(self, index: int) -> Any:
+        return self._items[index]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(list(self._items))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def Count(self) -> int:
+        return len(self._items)
+
+    def Find(self, name: str) -> Any:
+        self._recorder.call(f"{type(self).__name__}.Find")
+        for item in self._items:
+            if item.Name == name:
+                return item
+        return None
+
+
+class ServiceAccessor:
+    def __init__(self, owner: Any) -> None:
+        self._owner = owner
+
+    def __getitem__(self, service_type: type):
+        def get_service():
+            self._owner._recorder.call("GetService")
+            return self._owner._services.get(service_type)
+        return get_service
+
+
+class EngineeringObject:
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        self._recorder = recorder
+        self._services: dict[type, Any] = {}
+        self._attributes: dict[str, Any] = {"Name": name}
+        self.GetService = ServiceAccessor(self)
+
+    @property
+    def Name(self) -> str:
+        return self._attributes["Name"]
+
+    def GetAttribute(self, name: str) -> Any:
+        self._recorder.call(f"{type(self).__name__}.GetAttribute")
+        return self._attributes.get(name)
+
+    def SetAttribute(self, name: str, value: Any) -> None:
+        self._recorder.call(f"{type(self).__name__}.SetAttribute")
+        self._attributes[name] = value
+
+    def _remove(self) -> None:
+        parent: Composition | None = getattr(self, "_parent", None)
+        if parent is not None and self in parent._items:
+            parent._items.remove(self)
+
+
+def IEngineeringServiceProvider(obj: Any) -> Any:
+    return obj
+
+
+class Subnet(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        super().__init__(recorder, name)
+        self.NetType = "Ethernet"
+        self.TypeIdentifier = "System:Subnet.Ethernet"
+        self._nodes: list[Node] = []
+
+    def Delete(self) -> None:
+        self._recorder.call("Subnet.Delete")
+        for node in self._nodes:
+            node.ConnectedSubnet = None
+        self._remove()
+
+
+class SubnetComposition(Composition):
+    pass
+
+
+class IoSystem(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, number: int, subnet: Subnet | None) -> None:
+        super().__init__(recorder, name)
+        self.Number = number
+        self.Subnet = subnet
+
+
+class IoController(EngineeringObject):
+    def __init__(self, recorder: Recorder, node: Node) -> None:
+        super().__init__(recorder, "IO controller")
+        self._node = node
+        self.IoSystem: IoSystem | None = None
+
+    def CreateIoSystem(self, name: str) -> IoSystem:
+        self._recorder.call("IoController.CreateIoSystem")
+        self.IoSystem = IoSystem(self._recorder, name, 100, self._node.ConnectedSubnet)
+        return self.IoSystem
+
+
+class IoConnector(EngineeringObject):
+    def __init__(self, recorder: Recorder) -> None:
+        super().__init__(recorder, "IO device")
+        self.ConnectedToIoSystem: IoSystem | None = None
+
+    def ConnectToIoSystem(self, io_system: IoSystem) -> None:
+        self._recorder.call("IoConnector.ConnectToIoSystem")
+        self.ConnectedToIoSystem = io_system
+
+
+class Node(EngineeringObject):
+    def __init__(self, recorder: Recorder, subnets: SubnetComposition) -> None:
+        super().__init__(recorder, "E1")
+        self._attributes["Address"] = "192.168.0.1"
+        self._subnets = subnets
+        self.ConnectedSubnet: Subnet | None = None
+
+    def CreateAndConnectToSubnet(self, name: str) -> Subnet:
+        self._recorder.call("Node.CreateAndConnectToSubnet")
+        subnet = Subnet(self._recorder, name)
+        subnet._parent = self._subnets
+        self._subnets._items.append(subnet)
+        subnet._nodes.append(self)
+        self.ConnectedSubnet = subnet
+        return subnet
+
+    def ConnectToSubnet(self, subnet: Subnet) -> None:
+        self._recorder.call("Node.ConnectToSubnet")
+        subnet._nodes.append(self)
+        self.ConnectedSubnet = subnet
+
+
+class NetworkInterface:
+    def __init__(self, recorder: Recorder, controller: bool, subnets: SubnetComposition) -> None:
+        node = Node(recorder, subnets)
+        self.Nodes = Composition(recorder, [node])
+        self.IoControllers = Composition(recorder, [IoController(recorder, node)] if controller else [])
+        self.IoConnectors = Composition(recorder, [] if controller else [IoConnector(recorder)])
+
+
+class SoftwareContainer:
+    def __init__(self, software: Any) -> None:
+        self.Software = software
+
+
+class DeviceItem(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, type_identifier: str = "", position: int = 0) -> None:
+        super().__init__(recorder, name)
+        self.TypeIdentifier = type_identifier
+        self.PositionNumber = position
+        self.DeviceItems = DeviceItemComposition(recorder)
+
+    def CanPlugNew(self, type_identifier: str, name: str, position: int) -> bool:
+        self._recorder.call("HardwareObject.CanPlugNew")
+        return all(item.PositionNumber != position for item in self.DeviceItems)
+
+    def PlugNew(self, type_identifier: str, name: str, position: int) -> DeviceItem:
+        self._recorder.call("HardwareObject.PlugNew")
+        item = DeviceItem(self._recorder, name, type_identifier, position)
+        item._parent = self.DeviceItems
+        self.DeviceItems._items.append(item)
+        return item
+
+    def Delete(self) -> None:
+        self._recorder.call("DeviceItem.Delete")
+        self._remove()
+
+
+class DeviceItemComposition(Composition):
+    pass
+
+
+class Device(EngineeringObject):
+    def __init__(self, recorder: Recorder, type_identifier: str, name: str, device_name: str, subnets: SubnetComposition) -> None:
+        super().__init__(recorder, device_name or name)
+        self.TypeIdentifier = type_identifier
+
+        kind = "ionode"
+        for prefix, device_kind in DEVICE_KINDS:
+            if type_identifier.startswith(prefix):
+                kind = device_kind
+                break
+
+        rack = DeviceItem(recorder, "Rack_0", "", 0)
+        head = DeviceItem(recorder, name, type_identifier, 1 if kind == "ionode" else 0)
+        interface = DeviceItem(recorder, "PROFINET interface_1", "", 32768)
+        interface._services[NetworkInterface] = NetworkInterface(recorder, kind == "plc", subnets)
+        head.DeviceItems._items.append(interface)
+        if kind == "plc":
+            head._services[SoftwareContainer] = SoftwareContainer(PlcSoftware(recorder, name))
+        elif kind == "hmi":
+            head._services[SoftwareContainer] = SoftwareContainer(HmiTarget(recorder, name))
+        rack.DeviceItems._items.append(head)
+        self.DeviceItems = DeviceItemComposition(recorder, [rack, head])
+
+    def Delete(self) -> None:
+        self._recorder.call("Device.Delete")
+        self._remove()
+
+
+class DeviceComposition(Composition):
+    def __init__(self, recorder: Recorder, project: Project) -> None:
+        super().__init__(recorder)
+        self._project = project
+
+    def CreateWithItem(self, type_identifier: str, name: str, device_name: str) -> Device:
+        self._recorder.call("Devices.CreateWithItem")
+        device = Device(self._recorder, type_identifier, name, device_name, self._project.Subnets)
+        device._parent = self
+        self._items.append(device)
+        return device
+
+
+class PlcTag(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, data_type: str, address: str) -> None:
+        super().__init__(recorder, name)
+        self.DataTypeName = data_type
+        self.LogicalAddress = address
+
+    def Delete(self) -> None:
+        self._recorder.call("PlcTag.Delete")
+        self._remove()
+
+
+class PlcTagComposition(Composition):
+    def Create(self, name: str, data_type: str, address: str) -> PlcTag:
+        self._recorder.call("Tags.Create")
+        tag = PlcTag(self._recorder, name, data_type, address)
+        tag._parent = self
+        self._items.append(tag)
+        return tag
+
+
+class PlcTagTable(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        super().__init__(recorder, name)
+        self.Tags = PlcTagComposition(recorder)
+
+    def Export(self, path: FileInfo, options: Any) -> None:
+        self._recorder.call("PlcTagTable.Export")
+        root = ET.Element("Document")
+        table = ET.SubElement(root, "SW.Tags.PlcTagTable", attrib={'ID': "0"})
+        ET.SubElement(ET.SubElement(table, "AttributeList"), "Name").text = self.Name
+        tags = ET.SubElement(table, "ObjectList")
+        for tag in self.Tags:
+            attributes = ET.SubElement(ET.SubElement(tags, "SW.Tags.PlcTag", attrib={"CompositionName": "Tags"}), "AttributeList")
+            ET.SubElement(attributes, "DataTypeName").text = tag.DataTypeName
+            ET.SubElement(attributes, "LogicalAddress").text = tag.LogicalAddress
+            ET.SubElement(attributes, "Name").text = tag.Name
+        with open(path.FullName, 'w', encoding='utf-8') as file:
+            file.write('\ufeff<?xml version="1.0" encoding="utf-8"?>\n')
+            file.write(ET.tostring(root, encoding='unicode'))
+
+    def Delete(self) -> None:
+        self._recorder.call("PlcTagTable.Delete")
+        self._remove()
+
+
+class PlcTagTableComposition(Composition):
+    def Create(self, name: str) -> PlcTagTable:
+        self._recorder.call("TagTables.Create")
+        table = PlcTagTable(self._recorder, name)
+        table._parent = self
+        self._items.append(table)
+        return table
+
+    def Import(self, path: FileInfo, options: Any) -> list[PlcTagTable]:
+        self._recorder.call("TagTables.Import")
+        root = ET.parse(path.FullName).getroot()
+        table = PlcTagTable(self._recorder, root.findtext('./SW.Tags.PlcTagTable/AttributeList/Name'))
+        for tag in root.iterfind('./SW.Tags.PlcTagTable/ObjectList/SW.Tags.PlcTag/AttributeList'):
+            item = PlcTag(self._recorder, tag.findtext('Name'), tag.findtext('DataTypeName'), tag.findtext('LogicalAddress'))
+            item._parent = table.Tags
+            table.Tags._items.append(item)
+        table._parent = self
+        self._items = [item for item in self._items if item.Name != table.Name]
+        self._items.append(table)
+        return [table]
+
+
+class PlcTagTableSystemGroup:
+    def __init__(self, recorder: Recorder) -> None:
+        self.TagTables = PlcTagTableComposition(recorder)
+        self.Groups = Composition(recorder)
+
+
+class CompilerResult:
+    def __init__(self) -> None:
+        self.State = "Success"
+        self.ErrorCount = 0
+        self.WarningCount = 0
+        self.Messages: list[Any] = []
+
+
+class ICompilable:
+    def __init__(self, recorder: Recorder) -> None:
+        self._recorder = recorder
+
+    def Compile(self) -> CompilerResult:
+        self._recorder.call("ICompilable.Compile")
+        return CompilerResult()
+
+
+class PlcBlock(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, xml: str = "", sections: list[dict[str, Any]] | None = None) -> None:
+        super().__init__(recorder, name)
+        self._xml = xml
+        self._sections: list[dict[str, Any]] = sections or []
+        self._services[ICompilable] = ICompilable(recorder)
+
+    def Export(self, path: FileInfo, options: Any) -> None:
+        self._recorder.call("PlcBlock.Export")
+        with open(path.FullName, 'w', encoding='utf-8') as file:
+            file.write('\ufeff<?xml version="1.0" encoding="utf-8"?>\n')
+            file.write(self._xml or export_block_xml(self.Name, self._sections))
+
+    def Delete(self) -> None:
+        self._recorder.call("PlcBlock.Delete")
+        self._remove()
+
+
+class PlcBlockComposition(Composition):
+    def Import(self, path: FileInfo, options: Any) -> list[PlcBlock]:
+        self._recorder.call("Blocks.Import")
+        with open(path.FullName, 'r', encoding='utf-8') as file:
+            xml = file.read()
+        name = ET.fromstring(xml).findtext('.//AttributeList/Name') or Path(path.FullName).stem
+        block = PlcBlock(self._recorder, name, xml)
+        block._parent = self
+        self._items = [item for item in self._items if item.Name != name]
+        self._items.append(block)
+        return [block]
+
+    def CreateFrom(self, mastercopy: MasterCopy) -> PlcBlock:
+        self._recorder.call("Blocks.CreateFrom")
+        block = PlcBlock(self._recorder, mastercopy.Name, sections=mastercopy._sections)
+        block._parent = self
+        self._items.append(block)
+        return block
+
+    def CreateInstanceDB(self, name: str, is_auto_number: bool, number: int, instance_of_name: str) -> PlcBlock:
+        self._recorder.call("Blocks.CreateInstanceDB")
+        block = PlcBlock(self._recorder, name, instance_db_xml(name, number, instance_of_name))
+        block._parent = self
+        self._items.append(block)
+        return block
+
+
+class PlcBlockSystemGroup:
+    def __init__(self, recorder: Recorder) -> None:
+        self.Blocks = PlcBlockComposition(recorder)
+        self.Groups = Composition(recorder)
+
+
+class PlcSoftware(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        super().__init__(recorder, name)
+        self.TagTableGroup = PlcTagTableSystemGroup(recorder)
+        self.BlockGroup = PlcBlockSystemGroup(recorder)
+        self._services[ICompilable] = ICompilable(recorder)
+
+
+class HmiTag(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, data_type: str) -> None:
+        super().__init__(recorder, name)
+        self.DataTypeName = data_type
+
+
+class HmiTagTable(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        super().__init__(recorder, name)
+        self.Tags = Composition(recorder)
+
+    def Delete(self) -> None:
+        self._recorder.call("HmiTagTable.Delete")
+        self._remove()
+
+
+class HmiTagTableComposition(Composition):
+    def Import(self, path: FileInfo, options: Any) -> list[HmiTagTable]:
+        self._recorder.call("HmiTagTables.Import")
+        table = None
+        for _, element in ET.iterparse(path.FullName):
+            if element.tag == 'Hmi.Tag.Tag':
+                tag = HmiTag(self._recorder, element.findtext('AttributeList/Name'), element.findtext('LinkList/DataType/Name'))
+                tag._parent = table.Tags
+                table.Tags._items.append(tag)
+                element.clear()
+            elif element.tag == 'Name' and table is None:
+                table = HmiTagTable(self._recorder, element.text)
+        table._parent = self
+        self._items = [item for item in self._items if item.Name != table.Name]
+        self._items.append(table)
+        return [table]
+
+
+class HmiTagSystemFolder:
+    def __init__(self, recorder: Recorder) -> None:
+        self.TagTables = HmiTagTableComposition(recorder)
+
+
+class HmiTarget(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str) -> None:
+        super().__init__(recorder, name)
+        self.TagFolder = HmiTagSystemFolder(recorder)
+
+
+class MasterCopy(EngineeringObject):
+    def __init__(self, recorder: Recorder, name: str, sections: list[dict[str, Any]]) -> None:
+        super().__init__(recorder, name)
+        self._sections = sections
+
+
+class MasterCopyComposition(Composition):
+    def Find(self, name: str) -> MasterCopy | None:
+        self._recorder.call("MasterCopies.Find")
+        for item in self._items:
+            if item.Name == name:
+                return item
+        return None
+
+
+class MasterCopyFolder(EngineeringObject):
+    def __init__(self, recorder: Recorder, data: dict[str, Any]) -> None:
+        super().__init__(recorder, data.get('name', "Master copies"))
+        self.MasterCopies = MasterCopyComposition(recorder, [
+            MasterCopy(recorder, mastercopy['name'], mastercopy.get('sections', []))
+            for mastercopy in data.get('mastercopies', [])
+        ])
+        self.Folders = Composition(recorder, [MasterCopyFolder(recorder, folder) for folder in data.get('folders', [])])
+
+
+class GlobalLibrary(EngineeringObject):
+    def __init__(self, recorder: Recorder, path: FileInfo, mode: Any) -> None:
+        # Fake libraries are JSON files:
+        # {"name": ..., "mastercopies": [{"name": ..., "sections": [...]}], "folders": [...]}
+        data: dict[str, Any] = {}
+        if Path(path.FullName).is_file():
+            with open(path.FullName, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        super().__init__(recorder, data.get('name', Path(path.FullName).stem))
+        self.Path = path
+        self.Mode = mode
+        self.MasterCopyFolder = MasterCopyFolder(recorder, data)
+
+    def Close(self) -> None:
+        self._recorder.call("GlobalLibrary.Close")
+        self._remove()
+
+
+class GlobalLibraryComposition(Composition):
+    def Open(self, path: FileInfo, mode: Any) -> GlobalLibrary:
+        self._recorder.call("GlobalLibraries.Open")
+        library = GlobalLibrary(self._recorder, path, mode)
+        library._parent = self
+        self._items.append(library)
+        return library
+
+
+class CaxProvider:
+    # AutomationML import of the documents rendered by xml_builder.automationml
+    def __init__(self, recorder: Recorder, project: Project) -> None:
+        self._recorder = recorder
+        self._project = project
+
+    def Import(self, path: FileInfo, log: FileInfo, options: Any) -> bool:
+        self._recorder.call("CaxProvider.Import")
+        root = ET.parse(path.FullName).getroot()
+        for element in root.find('InstanceHierarchy'):
+            rack = element.find('InternalElement')
+            head, *modules = rack.findall('InternalElement')
+            type_identifier = head.findtext("Attribute[@Name='TypeIdentifier']/Value")
+            device = Device(self._recorder, type_identifier, head.get('Name'), element.get('Name'), self._project.Subnets)
+            for module in modules:
+                item = DeviceItem(self._recorder, module.get('Name'), module.findtext("Attribute[@Name='TypeIdentifier']/Value"), int(module.findtext("Attribute[@Name='PositionNumber']/Value")))
+                item._parent = device.DeviceItems[0].DeviceItems
+                device.DeviceItems[0].DeviceItems._items.append(item)
+            address = head.findtext(".//InternalElement/InternalElement/Attribute[@Name='NetworkAddress']/Value")
+            for item in device.DeviceItems[1].DeviceItems:
+                network_interface = item._services.get(NetworkInterface)
+                if network_interface:
+                    network_interface.Nodes[0]._attributes['Address'] = address
+            device._parent = self._project.Devices
+            self._project.Devices._items.append(device)
+        with open(log.FullName, 'w', encoding='utf-8') as file:
+            file.write("Import completed\n")
+        return True
+
+
+class Project(EngineeringObject):
+    def __init__(self, recorder: Recorder, path: Path, name: str, store: dict[str, Project]) -> None:
+        super().__init__(recorder, name)
+        self.Path = path
+        self.Subnets = SubnetComposition(recorder)
+        self.Devices = DeviceComposition(recorder, self)
+        self._store = store
+        self._services[CaxProvider] = CaxProvider(recorder, self)
+
+    def Save(self) -> None:
+        self._recorder.call("Project.Save")
+        self._store[str(project_file(self.Path, self.Name))] = self
+
+    def Close(self) -> None:
+        self._recorder.call("Project.Close")
+        self._remove()
+
+
+def project_file(path: Path, name: str) -> Path:
+    return path / f"{name}.ap18"
+
+
+class ProjectComposition(Composition):
+    # Saved projects only live in memory, in the store shared by every
+    # TiaPortal of one create() call; the project file on disk is a marker.
+    def __init__(self, recorder: Recorder, store: dict[str, Project]) -> None:
+        super().__init__(recorder)
+        self._store = store
+
+    def Create(self, directory: DirectoryInfo, name: str) -> Project:
+        self._recorder.call("Projects.Create")
+        path = Path(directory.FullName) / name
+        path.mkdir(parents=True)
+        project_file(path, name).touch()
+        project = Project(self._recorder, path, name, self._store)
+        project._parent = self
+        self._items.append(project)
+        return project
+
+    def Open(self, path: FileInfo) -> Project:
+        self._recorder.call("Projects.Open")
+        project = self._store.get(path.FullName)
+        if project is None or not path.Exists:
+            raise FileNotFoundError(f"No saved project at {path.FullName}")
+        project._parent = self
+        self._items.append(project)
+        return project
+
+
+class Process:
+    def __init__(self, mode: Any) -> None:
+        self.Id = os.getpid()
+        self.Mode = mode
+        self.AcquisitionTime = datetime.now()
+
+
+class TiaPortal:
+    def __init__(self, recorder: Recorder, mode: Any, store: dict[str, Project]) -> None:
+        recorder.call("TiaPortal")
+        self._recorder = recorder
+        self._process = Process(mode)
+        self.Projects = ProjectComposition(recorder, store)
+        self.GlobalLibraries = GlobalLibraryComposition(recorder)
+
+    def GetCurrentProcess(self) -> Process:
+        self._recorder.call("TiaPortal.GetCurrentProcess")
+        return self._process
+
+    def Dispose(self) -> None:
+        self._recorder.call("TiaPortal.Dispose")
+
+
+def export_block_xml(name: str, sections: list[dict[str, Any]]) -> str:
+    root = ET.Element("Document")
+    block = ET.SubElement(root, "SW.Blocks.FB", attrib={'ID': "0"})
+    attributes = ET.SubElement(block, "AttributeList")
+    interface = ET.SubElement(attributes, "Interface")
+    xml_sections = ET.SubElement(interface, "Sections", attrib={"xmlns": INTERFACE_NS})
+    for section in sections:
+        xml_section = ET.SubElement(xml_sections, "Section", attrib={"Name": section['name']})
+        for member in section['members']:
+            ET.SubElement(xml_section, "Member", attrib={"Name": member['Name'], "Datatype": member['Datatype']})
+    ET.SubElement(attributes, "Name").text = name
+    ET.SubElement(attributes, "ProgrammingLanguage").text = "LAD"
+    return ET.tostring(root, encoding='unicode')
+
+
+def instance_db_xml(name: str, number: int, instance_of_name: str) -> str:
+    root = ET.Element("Document")
+    attributes = ET.SubElement(ET.SubElement(root, "SW.Blocks.InstanceDB", attrib={'ID': "0"}), "AttributeList")
+    ET.SubElement(attributes, "InstanceOfName").text = instance_of_name
+    ET.SubElement(attributes, "Name").text = name
+    ET.SubElement(attributes, "Number").text = str(number)
+    ET.SubElement(attributes, "ProgrammingLanguage").text = "DB"
+    return ET.tostring(root, encoding='unicode')
+
+
+def create(latency: float = 0.0, latencies: dict[str, float] | None = None, unsupported: set[str] | None = None) -> SimpleNamespace:
+    recorder = Recorder(latency, latencies, unsupported)
+    projects: dict[str, Project] = {}
+
+    return SimpleNamespace(
+        recorder=recorder,
+        TiaPortal=lambda mode: TiaPortal(recorder, mode, projects),
+        TiaPortalMode=TiaPortalMode,
+        OpenMode=OpenMode,
+        ImportOptions=ImportOptions,
+        Cax=SimpleNamespace(CaxProvider=CaxProvider, CaxImportOptions=CaxImportOptions),
+        ExportOptions=ExportOptions,
+        IEngineeringServiceProvider=IEngineeringServiceProvider,
+        Library=SimpleNamespace(GlobalLibrary=GlobalLibrary),
+        Compiler=SimpleNamespace(ICompilable=ICompilable),
+        HW=SimpleNamespace(
+            Features=SimpleNamespace(
+                NetworkInterface=NetworkInterface,
+                SoftwareContainer=SoftwareContainer,
+            ),
+        ),
+        SW=SimpleNamespace(
+            PlcSoftware=PlcSoftware,
+            Tags=SimpleNamespace(PlcTagTable=PlcTagTable),
+        ),
+        Hmi=SimpleNamespace(HmiTarget=HmiTarget),
+    )
+
+
+def settings(enable_ui: bool = False) -> dict[str, Any]:
+    return {
+        "DirectoryInfo": DirectoryInfo,
+        "FileInfo": FileInfo,
+        "enable_ui": enable_ui,
+    }
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+from pathlib import Path
+from threading import Thread
+import logging
+import time
+import wx
+
+from . import config_tree, dll_cache, logger
+from .openness import import_and_execute, load_config
+from res import dlls
+
+# The wx user interface of main.py. Only imported when no --config, --batch
+# or --prewarm-library is given, so command line builds never load wx.
+
+SEARCH_LIMIT: int = 10000
+
+EVT_RESULT_ID = wx.NewIdRef()
+def EVT_RESULT(win, func):
+    win.Connect(-1, -1, EVT_RESULT_ID, func)
+
+class ResultEvent(wx.PyEvent):
+    def __init__(self, data):
+        wx.PyEvent.__init__(self)
+        self.SetEventType(EVT_RESULT_ID)
+        self.data = data
+
+EVT_LOAD_ID = wx.NewIdRef()
+def EVT_LOAD(win, func):
+    win.Connect(-1, -1, EVT_LOAD_ID, func)
+
+class LoadEvent(wx.PyEvent):
+    def __init__(self, data):
+        wx.PyEvent.__init__(self)
+        self.SetEventType(EVT_LOAD_ID)
+        self.data = data
+
+class LoaderThread(Thread):
+    # loads, validates and indexes a config off the GUI thread, posting its
+    # progress at most every 100 ms and the result at the end
+    def __init__(self, window, path: Path):
+        Thread.__init__(self, daemon=True)
+        self._window = window
+        self.path: Path = path
+        self.phase: str = ""
+        self.posted: float = 0.0
+
+        self.start()
+
+    def progress(self, phase: str, fraction: float | None):
+        now = time.monotonic()
+        if phase == self.phase and now - self.posted < 0.1:
+            return
+        self.phase, self.posted = phase, now
+        wx.PostEvent(self._window, LoadEvent({"progress": (phase, fraction)}))
+
+    def run(self):
+        try:
+            config = load_config(self.path, progress=self.progress)
+            index = config_tree.ConfigIndex(config, self.progress)
+        except Exception as e:
+            logging.error(f"Could not load {self.path}: {e}")
+
+            wx.PostEvent(self._window, LoadEvent({"error": str(e)}))
+            return
+        wx.PostEvent(self._window, LoadEvent({"config": config, "index": index}))
+
+class WorkerThread(Thread):
+    def __init__(self, window, config: dict, dll: Path):
+        Thread.__init__(self)
+        self._window = window
+        self.config = config
+        self.dll: Path = dll
+
+        self.start()
+
+    def run(self):
+        import_and_execute(self.config, self.dll)
+        wx.PostEvent(self._window, ResultEvent({"finished": True}))
+
+
+class DLLPickerWindow(wx.Frame):
+    def __init__(self, parent, dll_paths: dict[str, Path], callback, title="Choose DLL version"):
+        super().__init__(parent, title=title, size=(450,100))
+        self.SetMinSize((450,100))
+        self.dll_paths: dict[str, Path] = dll_paths
+        self.callback = callback
+
+        dll_choices = [dll for dll in self.dll_paths]
+
+        panel = wx.Panel(self)
+        self.versions_drpdwn = wx.Choice(panel, choices=dll_choices)
+        self.versions_drpdwn.SetSelection(0)
+        import_btn = wx.Button(panel, label="Import")
+        ok_btn = wx.Button(panel, label="Ok")
+
+        self.versions_drpdwn.SetMinSize((200,-1))
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        hbox.Add(self.versions_drpdwn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
+        hbox.Add(import_btn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
+        hbox.Add(ok_btn, proportion=0, flag=wx.ALL|wx.ALIGN_CENTER_VERTICAL, border=10)
+
+        panel.SetSizer(hbox)
+
+        ok_btn.Bind(wx.EVT_BUTTON, self.OnOk)
+        import_btn.Bind(wx.EVT_BUTTON, self.OnImport)
+
+        self.Show()
+
+    def OnOk(self, e):
+        if self.callback:
+            index = self.versions_drpdwn.GetCurrentSelection()
+            version = self.versions_drpdwn.GetString(self.versions_drpdwn.GetCurrentSelection() if index > 0 else 0)
+            self.callback(version)
+        self.Close()
+
+
+    def OnImport(self, e):
+        with wx.FileDialog(self, "Open path of Siemens.Engineering.dll", wildcard= "DLL (*.dll)|*.dll", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            self.callback(fileDialog.GetPath())
+
+
+class MainWindow(wx.Frame):
+    def __init__(self, parent, title, log_level: int = 20, log_file: Path | None = None) -> None:
+        wx.Frame.__init__(self, parent, title=title, size=(800,600))
+        self.worker: WorkerThread | None = None
+        self.loader: LoaderThread | None = None
+        EVT_RESULT(self,self.OnResult)
+        EVT_LOAD(self,self.OnLoad)
+
+        self.config: dict = {}
+        self.index: config_tree.ConfigIndex | None = None
+        self.matches: list[tuple] = []
+        self.match: int = 0
+        self.search_text: str = ""
+        self.dll: str = ""
+
+        self.CreateStatusBar()
+
+        # Menubars and menu items
+        menubar: wx.MenuBar = wx.MenuBar()
+        _filemenu = wx.Menu()
+        _open = _filemenu.Append(wx.ID_OPEN, "&Open", " Open project configuration.")
+        _close = _filemenu.Append(wx.ID_CLOSE, "&Close", " Close current configuration.")
+        _filemenu.AppendSeparator()
+        _exit = _filemenu.Append(wx.ID_EXIT, "&Exit", "Terminate this tool. (Does not close TIA Portal)")
+        _runmenu = wx.Menu()
+        _run = _runmenu.Append(wx.NewIdRef(), "&Run", " Run project.")
+        self.Bind(wx.EVT_MENU, self.OnOpen, _open)
+        self.Bind(wx.EVT_MENU, self.OnExit, _exit)
+        self.Bind(wx.EVT_MENU, self.OnClose, _close)
+        self.Bind(wx.EVT_MENU, self.OnRun, _run)
+        menubar.Append(_filemenu, "&File")
+        menubar.Append(_runmenu, "&Action")
+        self.SetMenuBar(menubar)
+
+
+        # notebook
+        notebook: wx.Notebook = wx.Notebook(self)
+        _tab_project = wx.Panel(notebook)
+        _vsizer = wx.BoxSizer(wx.VERTICAL)
+        _hsizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.textctrl_config = wx.TextCtrl(_tab_project, size=(300, -1))
+        self.browse_btn: wx.Button = wx.Button(_tab_project, label="Browse")
+        self.select_dll_btn: wx.Button = wx.Button(_tab_project, label="Select DLL")
+        self.execute_btn: wx.Button = wx.Button(_tab_project, label="Execute")
+        _hsizer.Add(self.textctrl_config, proportion=1, flag=wx.ALL|wx.EXPAND, border=5)
+        _hsizer.Add(self.browse_btn, flag=wx.ALL, border=5)
+        _hsizer.Add(self.select_dll_btn, flag=wx.ALL, border=5)
+        _hsizer.Add(self.execute_btn, flag=wx.ALL, border=5)
+        _vsizer.Add(_hsizer, flag= wx.EXPAND|wx.LEFT|wx.RIGHT|wx.TOP, border=5)
+        self.gauge: wx.Gauge = wx.Gauge(_tab_project, range=100)
+        _vsizer.Add(self.gauge, flag=wx.EXPAND|wx.LEFT|wx.RIGHT, border=10)
+        # keeps the gauge moving while parsing and validating
+        self.pulse_timer: wx.Timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda e: self.gauge.Pulse(), self.pulse_timer)
+        self.logs: wx.TextCtrl = wx.TextCtrl(_tab_project, style=wx.TE_MULTILINE)
+        # _override_path: wx.CheckBox = wx.CheckBox(_tab_project, label="Override Config Project Path")
+        # _override_path.SetValue(True)
+        # _vsizer.Add(_override_path, flag=wx.ALL|wx.EXPAND, border=5)
+        _vsizer.Add(self.logs, proportion=1, flag=wx.ALL|wx.EXPAND, border=5)
+        _tab_project.SetSizer(_vsizer)
+        self.Bind(wx.EVT_BUTTON, self.OnOpen, self.browse_btn)
+        self.Bind(wx.EVT_BUTTON, self.OnRun, self.execute_btn)
+        self.Bind(wx.EVT_BUTTON, self.OnSelectDLL, self.select_dll_btn)
+        _tab_config = wx.SplitterWindow(notebook, style=wx.SP_LIVE_UPDATE)
+        _sty = wx.BORDER_SUNKEN
+        _p1 = wx.Window(_tab_config, style=_sty)
+        _p2 = wx.Window(_tab_config, style=_sty)
+        self.tree = wx.TreeCtrl(_p1, wx.NewIdRef(), wx.DefaultPosition, wx.DefaultSize, style=wx.TR_DEFAULT_STYLE | wx.TR_FULL_ROW_HIGHLIGHT)
+        self.root_item = self.tree.AddRoot("TIA Portal")
+        self.Bind(wx.EVT_TREE_SEL_CHANGED, self.OnSelectConfigTree, self.tree)
+        self.Bind(wx.EVT_TREE_ITEM_EXPANDING, self.OnExpandConfigTree, self.tree)
+        self.search: wx.SearchCtrl = wx.SearchCtrl(_p1, style=wx.TE_PROCESS_ENTER)
+        self.search.SetDescriptiveText("Search keys and names")
+        self.Bind(wx.EVT_TEXT_ENTER, self.OnSearch, self.search)
+        self.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.OnSearch, self.search)
+        self.tab_config_value: wx.TextCtrl = wx.TextCtrl(_p2, style=wx.TE_WORDWRAP|wx.TE_NO_VSCROLL|wx.TE_READONLY)
+        _p1sizer: wx.BoxSizer = wx.BoxSizer(wx.VERTICAL)
+        _p1sizer.Add(self.search, flag=wx.EXPAND|wx.ALL, border=1)
+        _p1sizer.Add(self.tree, proportion=1, flag=wx.EXPAND|wx.ALL, border=1)
+        _p1.SetSizer(_p1sizer)
+        _p2sizer: wx.BoxSizer = wx.BoxSizer(wx.VERTICAL)
+        _p2sizer.Add(self.tab_config_value, proportion=1, flag=wx.EXPAND|wx.ALL, border=1)
+        _p2.SetSizer(_p2sizer)
+        _tab_config.SetMinimumPaneSize(100)
+        _tab_config.SplitVertically(_p1, _p2, 250)
+        _tab_config.SetSashPosition(0)
+        notebook.AddPage(_tab_project, "Project")
+        notebook.AddPage(_tab_config, "Config")
+
+        logger.setup(self.logs, log_level, log_file)
+
+        self.SetMinSize((600,480))
+        self.Show(True)
+
+    def set_b64_dlls(self, dll: dict[str, Path]):
+        self.b64_dlls: dict[str, Path] = dll
+
+    def receive_callback(self, version):
+        if version in self.b64_dlls:
+            self.dll = dll_cache.extract(dlls.archive, version).as_posix()
+        else:
+            self.dll = version
+
+    def OnOpen(self, e):
+        if self.loader:
+            return
+        with wx.FileDialog(self, "Open TIA Portal project config", wildcard= "json (*.json)|*.json", style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            self.json_config = fileDialog.GetPath()
+            self.textctrl_config.Clear()
+            self.textctrl_config.write(self.json_config)
+
+        self.set_button_active_status(False)
+        self.loader = LoaderThread(self, Path(self.json_config))
+
+    def OnLoad(self, e):
+        if 'progress' in e.data:
+            phase, fraction = e.data['progress']
+            self.SetStatusText(f"{phase} {Path(self.json_config).name}...")
+            if fraction is None:
+                if not self.pulse_timer.IsRunning():
+                    self.pulse_timer.Start(100)
+            else:
+                self.pulse_timer.Stop()
+                self.gauge.SetValue(int(fraction * 100))
+            return
+
+        self.loader = None
+        self.pulse_timer.Stop()
+        self.gauge.SetValue(0)
+        self.set_button_active_status()
+        if 'error' in e.data:
+            self.SetStatusText("")
+            dialog = wx.MessageDialog(self, e.data['error'], "Invalid config", wx.OK | wx.ICON_ERROR)
+            dialog.ShowModal()
+            dialog.Destroy()
+
+            return
+
+        self.config = e.data['config']
+        self.index = e.data['index']
+        self.populate_config(self.config)
+        self.SetStatusText(f"Loaded {Path(self.json_config).name} ({len(self.index)} keys and names)")
+
+    def OnSelectDLL(self, e):
+        dll_picker = DLLPickerWindow(self, dll_paths=self.b64_dlls, callback=self.receive_callback)
+
+
+    def OnClose(self, e):
+        if self.loader:
+            return
+        self.config = {}
+        self.index = None
+        self.matches = []
+        self.search_text = ""
+        self.textctrl_config.Clear()
+        self.tree.DeleteChildren(self.root_item)
+        self.tree.SetItemData(self.root_item, None)
+        self.tree.SetItemHasChildren(self.root_item, False)
+
+
+    def OnExit(self, e):
+        self.Close(True)
+        self.Destroy()
+
+    
+    def OnSelectConfigTree(self, e):
+        node = self.tree.GetItemData(e.GetItem())
+
+        if node is not None and not isinstance(node[1], range) and not config_tree.is_container(config_tree.value(node)):
+            self.tab_config_value.SetValue(str(config_tree.value(node)))
+        else:
+            self.tab_config_value.SetValue("")
+
+
+    def OnExpandConfigTree(self, e):
+        self.populate(e.GetItem())
+
+
+    def OnSearch(self, e):
+        if self.index is None:
+            return
+        text = self.search.GetValue()
+        if text != self.search_text:
+            # Enter again goes to the next match
+            self.search_text = text
+            self.matches = self.index.search(text, SEARCH_LIMIT)
+            self.match = 0
+        elif self.matches:
+            self.match = (self.match + 1) % len(self.matches)
+
+        if not self.matches:
+            self.SetStatusText(f"No key or name starts with '{text}'")
+            return
+        self.reveal(self.matches[self.match])
+        limited = "+" if len(self.matches) == SEARCH_LIMIT else ""
+        self.SetStatusText(f"Match {self.match + 1} of {len(self.matches)}{limited} for '{text}'")
+
+
+    def OnRun(self, e):
+        if self.loader:
+            return
+        dll = Path(self.dll) 
+        if not dll.exists() or not dll.is_file():
+            error_message = "Siemens.Engineering.dll path does not exist!"
+            dialog = wx.MessageDialog(self, error_message, "Error", wx.OK | wx.ICON_ERROR)
+            dialog.ShowModal()
+            dialog.Destroy()
+
+            return
+        self.set_button_active_status(False)
+
+
+        if not self.worker:
+            self.worker = WorkerThread(self, self.config, dll)
+
+
+    def OnResult(self, e):
+        if e.data.get('finished', False) == True:
+            self.worker = None
+        self.set_button_active_status()
+
+
+    def set_button_active_status(self, enable: bool = True):
+        self.execute_btn.Enable(enable)
+        self.browse_btn.Enable(enable)
+        self.select_dll_btn.Enable(enable)
+
+    def populate_config(self, config: dict) -> None:
+        # only the top level, the rest is added as items are expanded
+        self.tree.DeleteChildren(self.root_item)
+        self.tree.SetItemData(self.root_item, config_tree.root(config))
+        self.tree.SetItemHasChildren(self.root_item, True)
+        self.populate(self.root_item)
+
+        self.tree.Expand(self.root_item)
+
+    def populate(self, item) -> None:
+        node = self.tree.GetItemData(item)
+        if node is None or self.tree.GetChildrenCount(item, False) > 0:
+            return
+        for child_node in config_tree.children(node):
+            child = self.tree.AppendItem(item, config_tree.label(child_node), data=child_node)
+            self.tree.SetItemHasChildren(child, config_tree.has_children(child_node))
+
+    def find_child(self, item, key):
+        # the child of item at key, looking into the group holding key
+        self.populate(item)
+        child, cookie = self.tree.GetFirstChild(item)
+        while child.IsOk():
+            child_key = self.tree.GetItemData(child)[1]
+            if isinstance(child_key, range):
+                if isinstance(key, int) and key in child_key:
+                    return self.find_child(child, key)
+            elif child_key == key:
+                return child
+            child, cookie = self.tree.GetNextChild(item, cookie)
+        return None
+
+    def reveal(self, path: tuple) -> None:
+        item = self.root_item
+        for key in path:
+            item = self.find_child(item, key)
+            if item is None:
+                return
+        self.tree.EnsureVisible(item)
+        self.tree.SelectItem(item)
+
+
+def run(dll_paths: dict[str, Path], log_level: int = 20, log_file: Path | None = None) -> None:
+    app = wx.App(False)
+    frame = MainWindow(None, title="TIA Portal Automation Tool", log_level=log_level, log_file=log_file)
+    frame.set_b64_dlls(dll_paths)
+    app.MainLoop()
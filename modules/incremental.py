@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+
+from .cache import normalize, stable_hash
+
+# Manifest of the config last applied to a project, stored next to the project
+# directory as "<name>.manifest.json". A later run in incremental mode diffs
+# the new config against it and only touches what changed.
+
+MANIFEST_VERSION: int = 1
+
+HARDWARE_KEYS: tuple[str, ...] = ('p_typeIdentifier', 'p_deviceName', 'slots_required')
+MODULE_KEYS: tuple[str, ...] = ('Local modules', 'Modules')
+
+
+def manifest_path(config: dict[str, Any]) -> Path:
+    return config['directory'] / f"{config['name']}.manifest.json"
+
+
+def library_fingerprints(config: dict[str, Any]) -> list[list[Any]]:
+    fingerprints = []
+    for library_data in config.get('libraries', []):
+        path = Path(library_data.get('path'))
+        try:
+            stat = path.stat()
+            fingerprints.append([path.as_posix(), stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            fingerprints.append([path.as_posix(), None, None])
+    return fingerprints
+
+
+def snapshot(config: dict[str, Any]) -> dict[str, Any]:
+    # plain JSON data, so a fresh config compares equal to a loaded manifest
+    data = {
+        "devices": config.get('devices', []),
+        "networks": config.get('networks', []),
+        "libraries": library_fingerprints(config),
+    }
+    return json.loads(json.dumps(data, default=normalize))
+
+
+def load_manifest(path: Path) -> dict[str, Any] | None:
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        logging.info(f"No usable manifest at {path}: {e}")
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        logging.info(f"Ignoring manifest {path} of version {manifest.get('version')}")
+        return None
+
+    return manifest.get('config')
+
+
+def save_manifest(path: Path, data: dict[str, Any]) -> None:
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({"version": MANIFEST_VERSION, "config": data}, file, indent=1)
+    os.replace(tmp_path, path)
+
+
+def owned_blocks(plc_block: dict[str, Any]) -> set[str]:
+    # every block name an entry of "Program blocks" creates in the PLC
+    names = {plc_block['name']}
+    db = plc_block.get('db') or {}
+    if db.get('type') in ('SINGLE', 'GLOBAL') and db.get('name'):
+        names.add(db['name'])
+    for networks in plc_block.get('network_sources', []):
+        for instance in networks:
+            if instance:
+                names |= owned_blocks(instance)
+    return names
+
+
+def keyed(items: list[dict[str, Any]], key: str) -> dict[Any, dict[str, Any]]:
+    return {item[key]: item for item in items}
+
+
+@dataclass
+class TagTableDiff:
+    name: str
+    added: list[dict[str, Any]] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    changed: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class DeviceDiff:
+    data: dict[str, Any]
+    address_changed: bool = False
+    modules_added: list[dict[str, Any]] = field(default_factory=list)
+    modules_removed: list[dict[str, Any]] = field(default_factory=list)
+    tables_added: list[dict[str, Any]] = field(default_factory=list)
+    tables_removed: list[str] = field(default_factory=list)
+    tables_changed: list[TagTableDiff] = field(default_factory=list)
+    blocks: list[int] = field(default_factory=list) # indices into "Program blocks" to import
+    blocks_removed: list[str] = field(default_factory=list)
+    hmi_tables: list[dict[str, Any]] = field(default_factory=list) # added or changed, imported whole
+    hmi_tables_removed: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return any((self.address_changed, self.modules_added, self.modules_removed, self.tables_added,
+                    self.tables_removed, self.tables_changed, self.blocks, self.blocks_removed,
+                    self.hmi_tables, self.hmi_tables_removed))
+
+
+@dataclass
+class ConfigDiff:
+    added: list[int] = field(default_factory=list) # indices into config['devices']
+    removed: list[dict[str, Any]] = field(default_factory=list) # manifest data
+    replaced: dict[int, dict[str, Any]] = field(default_factory=dict) # index -> manifest data
+    changed: dict[int, DeviceDiff] = field(default_factory=dict)
+    networks_changed: bool = False
+    subnets: set[str] = field(default_factory=set) # subnet names to delete before networks are recreated
+
+    def summary(self) -> str:
+        return (f"{len(self.added)} added, {len(self.removed)} removed, {len(self.replaced)} replaced, "
+                f"{len(self.changed)} changed devices, networks {'changed' if self.networks_changed else 'unchanged'}")
+
+
+def diff_tag_tables(device_diff: DeviceDiff, old: list[dict[str, Any]], new: list[dict[str, Any]]) -> None:
+    old_tables = keyed(old, 'Name')
+    new_tables = keyed(new, 'Name')
+    device_diff.tables_removed = [name for name in old_tables if name not in new_tables]
+    for name, table in new_tables.items():
+        if name not in old_tables:
+            device_diff.tables_added.append(table)
+            continue
+        if old_tables[name] == table:
+            continue
+        old_tags = keyed(old_tables[name].get('Tags', []), 'Name')
+        new_tags = keyed(table.get('Tags', []), 'Name')
+        device_diff.tables_changed.append(TagTableDiff(
+            name,
+            added=[tag for tag_name, tag in new_tags.items() if tag_name not in old_tags],
+            removed=[tag_name for tag_name in old_tags if tag_name not in new_tags],
+            changed=[tag for tag_name, tag in new_tags.items() if tag_name in old_tags and old_tags[tag_name] != tag],
+        ))
+
+
+def diff_device(old: dict[str, Any], new: dict[str, Any], libraries_changed: bool) -> DeviceDiff:
+    device_diff = DeviceDiff(new)
+    device_diff.address_changed = old.get('network_address') != new.get('network_address')
+
+    for key in MODULE_KEYS:
+        old_modules = keyed(old.get(key, []), 'PositionNumber')
+        new_modules = keyed(new.get(key, []), 'PositionNumber')
+        for position, module in old_modules.items():
+            if new_modules.get(position) != module:
+                device_diff.modules_removed.append(module)
+        for position, module in new_modules.items():
+            if old_modules.get(position) != module:
+                device_diff.modules_added.append(module)
+
+    diff_tag_tables(device_diff, old.get('PLC tags', []), new.get('PLC tags', []))
+
+    old_hmi_tables = keyed(old.get('HMI tags', []), 'Name')
+    new_hmi_tables = keyed(new.get('HMI tags', []), 'Name')
+    device_diff.hmi_tables = [table for name, table in new_hmi_tables.items() if old_hmi_tables.get(name) != table]
+    device_diff.hmi_tables_removed = [name for name in old_hmi_tables if name not in new_hmi_tables]
+
+    old_blocks = {block['name']: stable_hash(block) for block in old.get('Program blocks', [])}
+    kept: set[str] = set()
+    for i, block in enumerate(new.get('Program blocks', [])):
+        kept |= owned_blocks(block)
+        if libraries_changed or old_blocks.get(block['name']) != stable_hash(block):
+            device_diff.blocks.append(i)
+    removed: set[str] = set()
+    for block in old.get('Program blocks', []):
+        removed |= owned_blocks(block)
+    device_diff.blocks_removed = sorted(removed - kept)
+
+    return device_diff
+
+
+def diff(old: dict[str, Any], new: dict[str, Any]) -> ConfigDiff:
+    config_diff = ConfigDiff()
+    libraries_changed = old.get('libraries') != new.get('libraries')
+
+    old_devices = keyed(old.get('devices', []), 'p_name')
+    new_names = {device['p_name'] for device in new.get('devices', [])}
+    config_diff.removed = [device for name, device in old_devices.items() if name not in new_names]
+
+    readdressed = False
+    for i, device in enumerate(new.get('devices', [])):
+        previous = old_devices.get(device['p_name'])
+        if previous is None:
+            config_diff.added.append(i)
+        elif any(previous.get(key) != device.get(key) for key in HARDWARE_KEYS):
+            config_diff.replaced[i] = previous
+        else:
+            device_diff = diff_device(previous, device, libraries_changed)
+            if device_diff:
+                config_diff.changed[i] = device_diff
+                readdressed = readdressed or device_diff.address_changed
+
+    config_diff.networks_changed = bool(
+        old.get('networks') != new.get('networks')
+        or readdressed
+        or config_diff.added
+        or config_diff.removed
+        or config_diff.replaced
+    )
+    if config_diff.networks_changed:
+        config_diff.subnets = {network['subnet_name'] for network in old.get('networks', []) + new.get('networks', [])}
+
+    return config_diff
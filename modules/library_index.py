@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Any, Iterator
+import logging
+
+
+def iter_mastercopies(folder: Siemens.Engineering.Library.MasterCopies.MasterCopyFolder, path: str = "") -> Iterator[tuple[str, Any]]:
+    for mastercopy in folder.MasterCopies:
+        yield f"{path}{mastercopy.Name}", mastercopy
+    for subfolder in folder.Folders:
+        yield from iter_mastercopies(subfolder, f"{path}{subfolder.Name}/")
+
+
+class LibraryIndex:
+    # Mastercopies of every library opened from the config, walked once through
+    # all subfolders. Each mastercopy can be looked up by its name or by its
+    # folder path ("Folder/Subfolder/Name"). Libraries that were not indexed
+    # fall back to a live MasterCopies.Find on their root folder.
+    def __init__(self, TIA: Siemens.Engineering.TiaPortal) -> None:
+        self.TIA = TIA
+        self.libraries: dict[str, dict[str, Any]] = {}
+        self.lookups: int = 0
+        self.live_queries: int = 0
+
+    def add(self, library: Siemens.Engineering.Library.GlobalLibrary) -> None:
+        entries: dict[str, Any] = {}
+        count = 0
+        for path, mastercopy in iter_mastercopies(library.MasterCopyFolder):
+            count += 1
+            entries[path] = mastercopy
+            if mastercopy.Name in entries and entries[mastercopy.Name] is not mastercopy:
+                logging.warning(f"Mastercopy {mastercopy.Name} exists more than once in Library {library.Name}, using the first one found")
+                continue
+            entries[mastercopy.Name] = mastercopy
+        self.libraries[library.Name] = entries
+
+        logging.info(f"Indexed {count} mastercopies in Library {library.Name}")
+
+    def find(self, library_name: str, name: str) -> Siemens.Engineering.Library.MasterCopies.MasterCopy | None:
+        entries = self.libraries.get(library_name)
+        if entries is not None:
+            self.lookups += 1
+            return entries.get(name)
+
+        for library in self.TIA.GlobalLibraries:
+            logging.debug("Checking Library: %s", library_name)
+
+            if library.Name != library_name: continue
+            self.live_queries += 1
+            mastercopy = library.MasterCopyFolder.MasterCopies.Find(name)
+            if mastercopy:
+                return mastercopy
+
+        return None
+
+    def stats(self) -> str:
+        return f"{self.lookups} index lookups, {self.live_queries} live Openness queries"
@@ -1,20 +1,113 @@
+from __future__ import annotations
+
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from threading import Event, Thread
+import atexit
+import copy
+import json
 import logging
+import queue
+
+# Records are put on a queue by whichever thread logs them (SimpleQueue, no
+# handler lock is held by the caller) and written by one listener thread to
+# the console, the GUI and the optional JSON lines file.
 
 FORMAT: str = '%(asctime)s [%(levelname)s] - %(message)s'
 
+GUI_MAX_LINES: int = 5000
+GUI_INTERVAL: float = 0.1 # seconds between two GUI updates
+
+_listener: QueueListener | None = None
+
+
 class GUIHandler(logging.Handler):
-    def __init__(self, textbox):
+    # Collects formatted lines and hands them to the GUI thread in batches
+    # through wx.CallAfter. Both the pending lines and the text control are
+    # bounded to max_lines, older lines are dropped.
+    def __init__(self, textbox, max_lines: int = GUI_MAX_LINES, interval: float = GUI_INTERVAL):
         super().__init__()
         self.textbox = textbox
+        self.max_lines = max_lines
+        self.interval = interval
+        self._pending: deque[str] = deque(maxlen=max_lines)
+        self._lines: deque[str] = deque(maxlen=max_lines)
+        self._shown = 0
+        self._scheduled = Event()
+        self._stopped = Event()
+        self._timer = Thread(target=self._run, name="log-gui", daemon=True)
+        self._timer.start()
 
     def emit(self, record):
         try:
-            message = self.format(record)
-            self.textbox.write(f"{message}\n")
+            self._pending.append(self.format(record))
         except Exception:
             self.handleError(record)
 
-def setup(textbox=None, LEVEL: int=20):
+    def _run(self):
+        import wx
+
+        while not self._stopped.wait(self.interval):
+            if not wx.GetApp():
+                break
+            if self._pending and not self._scheduled.is_set():
+                self._scheduled.set()
+                wx.CallAfter(self.drain)
+
+    def drain(self):
+        # runs on the GUI thread
+        self._scheduled.clear()
+        lines: list[str] = []
+        while self._pending:
+            lines.append(self._pending.popleft())
+        if not lines or not self.textbox:
+            return
+
+        self._lines.extend(lines)
+        self._shown += len(lines)
+        if self._shown > self.max_lines + self.max_lines // 4:
+            self.textbox.ChangeValue("\n".join(self._lines) + "\n")
+            self._shown = len(self._lines)
+        else:
+            self.textbox.AppendText("\n".join(lines) + "\n")
+
+    def close(self):
+        self._stopped.set()
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class QueueSink(QueueHandler):
+    # Merges the arguments into the message before the record crosses threads,
+    # like QueueHandler.prepare, but keeps the traceback apart from the
+    # message so the JSON sink can store it in its own field.
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_text = logging.Formatter().formatException(record.exc_info) if record.exc_info else record.exc_text
+        record.exc_info = None
+        return record
+
+
+def level_of(LEVEL: int) -> int:
     debug = logging.NOTSET
     if LEVEL >= 10:
         debug = logging.DEBUG
@@ -26,6 +119,15 @@ def setup(textbox=None, LEVEL: int=20):
         debug = logging.ERROR
     if LEVEL >= 50:
         debug = logging.CRITICAL
+    return debug
+
+
+def setup(textbox=None, LEVEL: int=20, json_path: Path | None = None):
+    global _listener
+
+    debug = level_of(LEVEL)
+
+    shutdown()
 
     logger = logging.getLogger()
     logger.setLevel(debug)
@@ -33,13 +135,39 @@ def setup(textbox=None, LEVEL: int=20):
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
 
+    handlers: list[logging.Handler] = []
+
     stdio_handler = logging.StreamHandler()
-    stdio_handler.setLevel(debug)
     stdio_handler.setFormatter(logging.Formatter(FORMAT))
-    logger.addHandler(stdio_handler)
+    handlers.append(stdio_handler)
 
     if textbox:
         gui_handler = GUIHandler(textbox)
-        gui_handler.setLevel(debug)
         gui_handler.setFormatter(logging.Formatter(FORMAT))
-        logger.addHandler(gui_handler)
+        handlers.append(gui_handler)
+
+    if json_path:
+        json_handler = logging.FileHandler(json_path, encoding='utf-8')
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(QueueSink(records))
+
+    _listener = QueueListener(records, *handlers)
+    _listener.start()
+
+
+def shutdown():
+    # writes out every queued record and closes the handlers
+    global _listener
+
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable
+import json
+import logging
+import time
+
+# Loading Siemens.Engineering through pythonnet and importing portal are the
+# slow parts of starting a build, so both happen here when a build starts and
+# not when main.py is imported.
+
+READ_CHUNK: int = 1 << 20
+
+
+def load_openness(dll: Path, fake: bool = False):
+    if fake:
+        from . import fake_se
+
+        return fake_se.create(), fake_se.DirectoryInfo, fake_se.FileInfo
+
+    import clr
+    from System.IO import DirectoryInfo, FileInfo
+
+    clr.AddReference(dll.as_posix())
+    import Siemens.Engineering as SE
+
+    return SE, DirectoryInfo, FileInfo
+
+
+def read_file(path: Path, progress: Callable[[str, float | None], None]) -> bytes:
+    # reads path in chunks, reporting the fraction read so far
+    size = max(path.stat().st_size, 1)
+    chunks: list[bytes] = []
+    read = 0
+    with open(path, 'rb') as file:
+        while chunk := file.read(READ_CHUNK):
+            chunks.append(chunk)
+            read += len(chunk)
+            progress("Reading", read / size)
+    return b"".join(chunks)
+
+
+def load_config(path: Path, directory: Path | None = None, name: str | None = None, progress: Callable[[str, float | None], None] | None = None) -> dict[str, Any]:
+    # progress is called with a phase and the fraction done, None when the
+    # phase cannot tell (parsing and validating)
+    from . import config_schema
+
+    if progress is None:
+        with open(path) as file:
+            data = json.load(file)
+    else:
+        text = read_file(path, progress)
+        progress("Parsing", None)
+        data = json.loads(text)
+        progress("Validating", None)
+    config = config_schema.validate_config(data)
+    config['directory'] = directory or path.parent
+    config['name'] = name or path.stem
+    return config
+
+
+def report_fake(SE) -> None:
+    # wall clock time of the first call, read by scripts/benchmark_startup.py
+    timeline = SE.recorder.timeline
+    if not timeline:
+        return
+    first = time.time() - (time.perf_counter() - timeline[0][1])
+    logging.info(f"Fake Openness: {sum(SE.recorder.calls.values())} calls, first at {first:.6f}")
+
+
+def import_and_execute(config: dict[str, Any], dll: Path, options: dict | None = None, fake: bool = False):
+    SE, DirectoryInfo, FileInfo = load_openness(dll, fake)
+
+    from . import portal
+
+    print("TIA Portal Automation Tool")
+    print()
+
+    try:
+        portal.execute(SE, config,
+            {
+                "DirectoryInfo": DirectoryInfo,
+                "FileInfo": FileInfo,
+                "enable_ui": True,
+                **(options or {}),
+            }
+        )
+    finally:
+        if fake:
+            report_fake(SE)
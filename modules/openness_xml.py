@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+import xml.etree.ElementTree as ET
+
+# Readers of XML exported by Openness. Exports of large blocks run into
+# hundreds of MB, so they are parsed incrementally: every element is dropped
+# as soon as it ends, keeping memory bounded by the nesting depth, and
+# parsing stops once the wanted part of the document has been read.
+
+SKIPPED_SECTIONS: tuple[str, ...] = ("Constant",)
+
+# AttributeList entries of an exported block -> keys of read_block()
+BLOCK_ATTRIBUTES: dict[str, str] = {
+    "Name": "name",
+    "Number": "number",
+    "ProgrammingLanguage": "programming_language",
+    "InstanceOfName": "instance_of",
+}
+
+
+def read_interface_sections(path: Path, skipped: tuple[str, ...] = SKIPPED_SECTIONS) -> list[dict[str, Any]] | None:
+    # The sections of the first block interface in the file, one entry per
+    # section: {"name": "Input", "members": [{"Name": ..., "Datatype": ...}]}.
+    # Only direct members with a name and a data type are read, sections
+    # without any are left out. None when the interface has no sections.
+    stack: list[ET.Element] = []
+    sections: list[dict[str, Any]] | None = None
+    section: dict[str, Any] | None = None
+    sections_depth = 0
+    found = 0
+
+    with open(path, 'rb') as file:
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                tag = element.tag
+                if sections is None:
+                    if tag.endswith("}Sections") and "/SW/Interface/" in tag:
+                        sections = []
+                        sections_depth = len(stack)
+                    continue
+
+                depth = len(stack) - sections_depth
+                if depth == 1 and tag.endswith("}Section"):
+                    found += 1
+                    section_name = element.get('Name')
+                    section = None if section_name in skipped else {"name": section_name, "members": []}
+                elif depth == 2 and section is not None and tag.endswith("}Member"):
+                    member_name = element.get('Name')
+                    datatype = element.get('Datatype')
+                    if member_name and datatype:
+                        section['members'].append({"Name": member_name, "Datatype": datatype})
+                continue
+
+            stack.pop()
+            if sections is not None:
+                depth = len(stack) + 1 - sections_depth
+                if depth == 0:
+                    break
+                if depth == 1 and section is not None:
+                    if section['members']:
+                        sections.append(section)
+                    section = None
+            if stack:
+                stack[-1].remove(element)
+
+    if not found:
+        return None
+    return sections
+
+
+def local_name(tag: str) -> str:
+    return tag[tag.rfind('}') + 1:]
+
+
+def read_block(path: Path) -> dict[str, Any] | None:
+    # The attributes of the block exported to path and the calls of its
+    # graphical networks, one list per network:
+    #   {"type": "FB", "name": ..., "number": ..., "programming_language": ...,
+    #    "instance_of": ..., "networks": [[{"name": ..., "type": ...,
+    #    "scope": ..., "component": ..., "parameters": [(name, section, type)]}]]}
+    # Networks in text languages (SCL, STL) have no calls here. None when
+    # the file holds no block.
+    stack: list[ET.Element] = []
+    block: dict[str, Any] | None = None
+    call: dict[str, Any] | None = None
+
+    with open(path, 'rb') as file:
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                tag = local_name(element.tag)
+                if len(stack) == 2 and tag.startswith("SW.Blocks."):
+                    block = {"type": tag[len("SW.Blocks."):], "name": None, "number": None, "programming_language": None, "instance_of": None, "networks": []}
+                elif block is None:
+                    continue
+                elif tag == "SW.Blocks.CompileUnit":
+                    block['networks'].append([])
+                elif tag == "CallInfo" and block['networks']:
+                    call = {"name": element.get('Name'), "type": element.get('BlockType'), "scope": None, "component": None, "parameters": []}
+                    block['networks'][-1].append(call)
+                elif call is not None and tag == "Instance":
+                    call['scope'] = element.get('Scope')
+                elif call is not None and tag == "Component" and local_name(stack[-2].tag) == "Instance":
+                    call['component'] = element.get('Name')
+                elif call is not None and tag == "Parameter" and local_name(stack[-2].tag) == "CallInfo":
+                    call['parameters'].append((element.get('Name'), element.get('Section'), element.get('Type', "")))
+                continue
+
+            if block is not None and len(stack) == 4 and local_name(stack[-2].tag) == "AttributeList":
+                key = BLOCK_ATTRIBUTES.get(local_name(element.tag))
+                if key:
+                    block[key] = (element.text or "").strip()
+            elif call is not None and local_name(element.tag) == "CallInfo":
+                call = None
+            stack.pop()
+            if stack:
+                stack[-1].remove(element)
+
+    return block
+
+
+def read_tag_table(path: Path) -> dict[str, Any] | None:
+    # {"Name": ..., "Tags": [{"Name": ..., "DataTypeName": ..., "LogicalAddress": ...}]}
+    # of the PLC tag table exported to path, None when the file holds none
+    stack: list[ET.Element] = []
+    table: dict[str, Any] | None = None
+    tag: dict[str, str] | None = None
+
+    with open(path, 'rb') as file:
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                name = local_name(element.tag)
+                if len(stack) == 2 and name == "SW.Tags.PlcTagTable":
+                    table = {"Name": "", "Tags": []}
+                elif table is not None and name == "SW.Tags.PlcTag":
+                    tag = {"Name": "", "DataTypeName": "", "LogicalAddress": ""}
+                    table['Tags'].append(tag)
+                continue
+
+            if table is not None and len(stack) >= 3 and local_name(stack[-2].tag) == "AttributeList":
+                name = local_name(element.tag)
+                owner = local_name(stack[-3].tag)
+                if owner == "SW.Tags.PlcTag" and name in tag:
+                    tag[name] = (element.text or "").strip()
+                elif owner == "SW.Tags.PlcTagTable" and name == "Name":
+                    table['Name'] = (element.text or "").strip()
+            stack.pop()
+            if stack:
+                stack[-1].remove(element)
+
+    return table
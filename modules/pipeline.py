@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+
+from .cache import XmlCache
+
+
+class XmlPipeline:
+    # Generates block XML on a worker pool into one scratch directory per run
+    # while the Openness thread imports the files that are already done.
+    def __init__(self, workers: int | None = None, cache: XmlCache | None = None) -> None:
+        self.cache: XmlCache | None = cache
+        self.directory: Path = Path(tempfile.mkdtemp(prefix="tia-portal-automation-"))
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1), thread_name_prefix="xml")
+        self._counter = itertools.count()
+        self._submitted: dict[str, Future[Path | None]] = {}
+
+        logging.debug("Scratch directory: %s", self.directory)
+
+    def path(self, suffix: str = ".xml") -> Path:
+        return self.directory / f"{next(self._counter):06d}{suffix}"
+
+    def submit(self, build: Callable[[], str | Iterable[str] | None], key: str | None = None, suffix: str = ".xml") -> Future[Path | None]:
+        # identical builds (same key) share one file for the whole run,
+        # builds returning chunks are streamed to the file
+        if key is not None and key in self._submitted:
+            return self._submitted[key]
+
+        path = self.path(suffix)
+
+        def generate() -> Path | None:
+            xml = build()
+            if not xml:
+                return None
+
+            with open(path, 'w', encoding='utf-8') as file:
+                if isinstance(xml, str):
+                    file.write(xml)
+                else:
+                    file.writelines(xml)
+
+            logging.debug("Written XML data to: %s", path)
+
+            return path
+
+        future = self.executor.submit(generate)
+        if key is not None:
+            self._submitted[key] = future
+
+        return future
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        logging.debug("Removed scratch directory: %s", self.directory)
+
+    def __enter__(self) -> XmlPipeline:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,27 +1,378 @@
 from __future__ import annotations
 
-from . import logger
+from . import incremental, xml_builder
+from .compilation import CompileScheduler, CompileResult
+from .cache import InterfaceCache, LayoutCache, XmlCache, cache_directory, stable_hash
 from .xml_builder import OB, FB, GlobalDB
 from .config_schema import PlcType, DatabaseType
+from .library_index import LibraryIndex, iter_mastercopies
+from .openness_xml import read_interface_sections
+from .pipeline import XmlPipeline
+from .templates import Templates
+from .tracer import Tracer
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 from typing import Any
+import copy
 import logging
-import tempfile
-import uuid
-import xml.etree.ElementTree as ET
+import time
 
 from modules import config_schema
 
-logger.setup(None, 10)
 log = logging.getLogger(__name__)
 
-def execute(SE: Siemens.Engineering, config: dict[Any, Any], settings: dict[str, Any]):
-    logging.debug(f"config data: {config}")
-    logging.debug(f"settings: {settings}")
+TAG_IMPORT_MIN_CHANGES: int = 16
+
+@dataclass
+class LibraryBlock:
+    plc_block: dict[str, Any]
+    sections: list[dict[str, Any]] | None = None
+
+
+@dataclass
+class ImportBlock:
+    plc_block: dict[str, Any]
+    xml: Future[Path | None] | None = None
+    wires: list[LibraryBlock] | None = None # FB waiting on library interfaces
+    instance_db: bool = True
+    reused: bool = False # already imported, only its instance DB is created
+
+
+@dataclass
+class Session:
+    # A TIA Portal kept running across builds (daemon mode) with the global
+    # libraries opened in it, by path, and the index of their mastercopies.
+    TIA: Siemens.Engineering.TiaPortal
+    library_index: LibraryIndex
+    libraries: dict[str, tuple[Siemens.Engineering.Library.GlobalLibrary, bool, int | None]] = field(default_factory=dict) # path -> (library, read_only, mtime)
+    started: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class BlockPlan:
+    steps: list[ImportBlock | LibraryBlock] = field(default_factory=list)
+    definitions: dict[str, tuple[str, LibraryBlock | None]] = field(default_factory=dict)
+    conflicts: list[str] = field(default_factory=list)
+
+
+def build_block_xml(plc_block: dict[str, Any]) -> str | None:
+    match plc_block.get('type'):
+        case PlcType.OB:
+            xml_obj = OB(
+                plc_block.get('name'),
+                plc_block.get('number'),
+                plc_block.get('db', {})
+            )
+            return xml_obj.build(
+                programming_language=plc_block.get('programming_language'),
+                network_sources=plc_block.get('network_sources', []),
+            )
+        case PlcType.FB:
+            xml_obj = FB(
+                plc_block.get('name'),
+                plc_block.get('number'),
+                plc_block.get('db', {})
+            )
+            return xml_obj.build(
+                programming_language=plc_block.get('programming_language'),
+                network_sources=plc_block.get('network_sources', [])
+            )
+        case DatabaseType.GLOBAL:
+            xml_obj = GlobalDB(
+                plc_block.get('type', DatabaseType.GLOBAL).value,
+                plc_block.get('name'),
+                plc_block.get('number')
+            )
+            return xml_obj.build(plc_block.get('programming_language'))
+
+    return None
+
+
+def submit_block_xml(pipeline: XmlPipeline, plc_block: dict[str, Any]) -> Future[Path | None]:
+    # blocks are copied so later wiring of parent blocks cannot race with the
+    # worker building this one
+    return pipeline.submit(partial(generate_block_xml, pipeline.cache, copy.deepcopy(plc_block)), key=stable_hash(plc_block))
+
+
+def generate_block_xml(cache: XmlCache | None, plc_block: dict[str, Any]) -> str | None:
+    if not cache:
+        return build_block_xml(plc_block)
+
+    key = stable_hash("block", xml_builder.VERSION, plc_block)
+    xml = cache.get(key)
+    if xml is None:
+        xml = build_block_xml(plc_block)
+        if xml:
+            cache.put(key, xml)
+
+    return xml
+
+
+def wire_sections(plc_block: dict[str, Any], wires: list[list[dict[str, Any]]]):
+    for i, nws in enumerate(plc_block.get('network_sources', [])):
+        if i >= len(wires):
+            break
+        for j, network in enumerate(nws):
+            if not network.get('db', {}).get('sections'):
+                plc_block['network_sources'][i][j]['db']['sections'] = wires[i]
+
+
+def block_definition(plc_block: dict[str, Any]) -> str:
+    # The instance DB belongs to the call, not to the block, except for the
+    # sections of a multi-instance which end up in the FB's interface.
+    definition = {key: value for key, value in plc_block.items() if key != 'db'}
+    db = plc_block.get('db') or {}
+    if db.get('type') == DatabaseType.MULTI:
+        definition['sections'] = db.get('sections')
+
+    return stable_hash(definition)
+
+
+def plan_program_block(plc_block: dict[str, Any], pipeline: XmlPipeline, plan: BlockPlan) -> LibraryBlock | None:
+    name = plc_block.get('name')
+    definition = block_definition(plc_block)
+    known = plan.definitions.get(name)
+    if known and known[0] == definition:
+        logging.debug("Reusing PLC Block %s", name)
+
+        if not plc_block.get('source'):
+            plan.steps.append(ImportBlock(plc_block, reused=True))
+
+        return known[1]
+
+    if known:
+        logging.warning(f"PLC Block {name} is defined more than once with different contents, the last definition imported wins")
+
+        plan.conflicts.append(name)
+
+    plan.definitions[name] = (definition, None)
+
+    wires: list[LibraryBlock] = []
+    for networks in plc_block.get('network_sources', []):
+        for instance in networks:
+            data = plan_program_block(instance, pipeline, plan)
+            if not data: continue
+            wires.append(data)
+
+    if not plc_block.get('source'):
+        step = ImportBlock(plc_block)
+        if plc_block.get('type') == PlcType.FB and wires:
+            step.wires = wires
+        else:
+            step.xml = submit_block_xml(pipeline, plc_block)
+        plan.steps.append(step)
+
+        return None
+
+    block_source = plc_block.get('source')
+
+    logging.debug("Source: %s", block_source)
+
+    is_valid_library_source = config_schema.schema_source_library.is_valid(block_source)
+
+    logging.info(f"Checking if PLC Block source is a library: {is_valid_library_source}")
+
+    if is_valid_library_source:
+        step = LibraryBlock(plc_block)
+        plan.steps.append(step)
+        plan.definitions[name] = (definition, step)
+
+        return step
+
+    is_valid_plc_source = config_schema.schema_source_plc.is_valid(block_source)
+
+    logging.info(f"Checking if PLC Block source is a plc: {is_valid_plc_source}")
+
+    if is_valid_plc_source:
+        # TODO:implement this when needed
+        return None
+
+    return None
+
+
+def plan_program_blocks(program_blocks: list[dict[str, Any]], pipeline: XmlPipeline) -> BlockPlan:
+    plan = BlockPlan()
+    for plc_block in program_blocks:
+        plc_block['network_sources'] = [blck for blck in plc_block.get('network_sources', []) if blck]
+        plan_program_block(plc_block, pipeline, plan)
+        db = plc_block.get('db')
+        if db.get('type') == DatabaseType.GLOBAL:
+            definition = block_definition(db)
+            known = plan.definitions.get(db['name'])
+            if known and known[0] == definition:
+                continue
+            if known:
+                plan.conflicts.append(db['name'])
+            plan.definitions[db['name']] = (definition, None)
+            plan.steps.append(ImportBlock(db, submit_block_xml(pipeline, db), instance_db=False))
+
+    reused = sum(1 for step in plan.steps if isinstance(step, ImportBlock) and step.reused)
+    logging.info(f"Planned {len(plan.definitions)} unique PLC Blocks ({reused} repeated references reused)")
+    if plan.conflicts:
+        logging.warning(f"Conflicting PLC Block definitions: {', '.join(sorted(set(plan.conflicts)))}")
+
+    return plan
+
+
+def export_interface(SE: Siemens.Engineering, block: Siemens.Engineering.SW.Blocks.PlcBlock, pipeline: XmlPipeline, FileInfo) -> list[dict[str, Any]] | None:
+    path = pipeline.path()
+    block.Export(FileInfo(path.absolute().as_posix()), getattr(SE.ExportOptions, "None"))
+    return read_interface_sections(path)
+
+
+def create_from_library(SE: Siemens.Engineering, library_index: LibraryIndex, software_base: Siemens.Engineering.SW.PlcSoftware, step: LibraryBlock, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, compiler: CompileScheduler):
+    # step.sections is set right away from the interface cache or once the
+    # compiler has compiled the new block
+    plc_block = step.plc_block
+    block_source = plc_block.get('source')
+    library_name = block_source.get('library')
+    mastercopy = library_index.find(library_name, block_source.get('name'))
+    if not mastercopy:
+        return
+
+    new_block = software_base.BlockGroup.Blocks.CreateFrom(mastercopy)
+    new_block.SetAttribute("Name", plc_block.get('name'))
+
+    logging.info(f"New PLC Block {new_block.Name} from Library {library_name} added to {software_base.Name}")
+
+    step.sections = interface_cache.get(library_name, mastercopy.Name) if interface_cache else None
+    if step.sections is not None:
+        logging.debug("Using cached interface of %s from Library %s", mastercopy.Name, library_name)
+
+        return
+
+    def compiled(block):
+        step.sections = export_interface(SE, block, pipeline, FileInfo)
+        if step.sections is not None and interface_cache:
+            interface_cache.put(library_name, mastercopy.Name, step.sections)
+
+    compiler.defer(software_base, new_block, compiled)
+
+
+def import_program_blocks(SE: Siemens.Engineering, library_index: LibraryIndex, software_base: Siemens.Engineering.SW.PlcSoftware, plan: BlockPlan, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, compiler: CompileScheduler | None = None):
+    # blocks from mastercopies do not depend on the imported ones, they are
+    # all created first and compiled together before their interfaces are
+    # wired into the blocks calling them
+    compiler = compiler or CompileScheduler(SE)
+    for step in plan.steps:
+        if isinstance(step, LibraryBlock):
+            create_from_library(SE, library_index, software_base, step, pipeline, FileInfo, interface_cache, compiler)
+    compiler.flush()
+
+    imported: set[str] = set()
+    instance_dbs: set[str] = set()
+    for step in plan.steps:
+        plc_block = step.plc_block
+
+        if isinstance(step, LibraryBlock):
+            continue
+
+        if step.wires is not None:
+            wire_sections(plc_block, [wire.sections for wire in step.wires if wire.sections])
+            step.xml = submit_block_xml(pipeline, plc_block)
+
+        if not step.reused:
+            path = step.xml.result()
+            if not path:
+                continue
+
+            software_base.BlockGroup.Blocks.Import(FileInfo(path.as_posix()), SE.ImportOptions.Override)
+            imported.add(plc_block.get('name'))
+
+            if not step.instance_db:
+                logging.info(f"New GlobalDB: {plc_block.get('name')} added to {software_base.Name}")
+
+                continue
+
+            logging.info(f"New PLC Block: {plc_block.get('name')} added to {software_base.Name}")
+
+        elif plc_block.get('name') not in imported:
+            continue
+
+        db = plc_block.get('db')
+        if db.get('type') == DatabaseType.SINGLE and db['name'] not in instance_dbs:
+            instance_dbs.add(db['name'])
+
+            logging.info(f"Creating InstanceDB '{db.get('name')}' for PlcSoftware {software_base.Name}...")
+
+            software_base.BlockGroup.Blocks.CreateInstanceDB(db['name'], True, db.get('number', 1), db['instanceOfName'])
+
+            logging.info(f"New Single InstanceDB: {db.get('name')} added to {software_base.Name}")
 
+
+def find_software(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device, software_type: type, type_identifier: str | None = None, layouts: LayoutCache | None = None) -> Siemens.Engineering.HW.Software | None:
+    # the PlcSoftware or HmiTarget of a device
+    for software_container in find_services(SE, device.DeviceItems, SE.HW.Features.SoftwareContainer, type_identifier, layouts if type_identifier else None):
+        if isinstance(software_container.Software, software_type):
+            return software_container.Software
+
+    return None
+
+
+def prewarm_library(SE: Siemens.Engineering, library_path: Path, settings: dict[str, Any]):
     DirectoryInfo = settings['DirectoryInfo']
     FileInfo = settings['FileInfo']
 
+    interface_cache = InterfaceCache(Path(settings.get('cache_dir') or cache_directory()) / "interfaces")
+
+    TIA = SE.TiaPortal(SE.TiaPortalMode.WithoutUserInterface)
+
+    logging.info(f"Opening GlobalLibrary: {library_path}")
+
+    library: Siemens.Engineering.Library.GlobalLibrary = TIA.GlobalLibraries.Open(FileInfo(library_path.as_posix()), SE.OpenMode.ReadOnly)
+    interface_cache.register_library(library.Name, library_path)
+
+    # mastercopies can only be compiled and exported once they are blocks of
+    # a PLC, so they are instantiated in a throwaway project
+    with XmlPipeline(1) as pipeline:
+        project: Siemens.Engineering.Project = TIA.Projects.Create(DirectoryInfo(pipeline.directory.as_posix()), "prewarm")
+        device: Siemens.Engineering.HW.Device = project.Devices.CreateWithItem(settings.get('plc_type', "OrderNumber:6ES7 510-1DJ01-0AB0/V2.0"), "PLC_1", "PrewarmPlc")
+        software_base = find_software(SE, device, SE.SW.PlcSoftware)
+        if not software_base:
+            raise ValueError(f"No PlcSoftware found for {settings.get('plc_type')}")
+
+        compiler = CompileScheduler(SE, settings.get('compile', "software"))
+        cached: list[str] = []
+
+        def compiled(mastercopy, block):
+            try:
+                db_sections = export_interface(SE, block, pipeline, FileInfo)
+            except Exception as e:
+                logging.info(f"Skipping {mastercopy.Name}: {e}")
+
+                return
+            if db_sections is None:
+                return
+            interface_cache.put(library.Name, mastercopy.Name, db_sections)
+            cached.append(mastercopy.Name)
+
+            logging.info(f"Cached interface of {mastercopy.Name}")
+
+        for _, mastercopy in iter_mastercopies(library.MasterCopyFolder):
+            if interface_cache.get(library.Name, mastercopy.Name) is not None:
+                logging.info(f"Already cached: {mastercopy.Name}")
+
+                continue
+
+            try:
+                new_block = software_base.BlockGroup.Blocks.CreateFrom(mastercopy)
+            except Exception as e:
+                logging.info(f"Skipping {mastercopy.Name}: {e}")
+
+                continue
+            compiler.defer(software_base, new_block, partial(compiled, mastercopy))
+
+        compiler.flush()
+        count = len(cached)
+
+        project.Close()
+
+    logging.info(f"Cached {count} mastercopy interfaces from {library.Name}")
+
+
+def start_portal(SE: Siemens.Engineering, settings: dict[str, Any]) -> Siemens.Engineering.TiaPortal:
     if settings['enable_ui']:
         TIA = SE.TiaPortal(SE.TiaPortalMode.WithUserInterface)
     else:
@@ -31,10 +382,62 @@ def execute(SE: Siemens.Engineering, config: dict[Any, Any], settings: dict[str,
 
     logging.info(f"Started TIA Portal Openness ({current_process.Id}) {current_process.Mode} at {current_process.AcquisitionTime}")
 
+    return TIA
+
+
+def start_session(SE: Siemens.Engineering, settings: dict[str, Any]) -> Session:
+    TIA = start_portal(SE, settings)
+    return Session(TIA, LibraryIndex(TIA))
+
+
+def close_projects(TIA: Siemens.Engineering.TiaPortal, save: bool = False):
+    # leaves the session ready for the next build
+    for project in list(TIA.Projects):
+        if save:
+            project.Save()
+        project.Close()
+
+        logging.info(f"Closed project {project.Name}")
 
 
+def open_library(SE: Siemens.Engineering, TIA: Siemens.Engineering.TiaPortal, library_data: dict[str, Any], FileInfo, session: Session | None) -> tuple[Siemens.Engineering.Library.GlobalLibrary, bool]:
+    # the library and whether it was opened now, as opposed to reused from
+    # the session; a library changed on disk since is opened again
+    path: Path = library_data.get('path')
+    read_only = bool(library_data.get('read_only'))
+    try:
+        mtime: int | None = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
 
+    opened = session.libraries.get(path.as_posix()) if session else None
+    if opened:
+        if opened[1:] == (read_only, mtime):
+            logging.info(f"Reusing GlobalLibrary: {opened[0].Name}")
 
+            return opened[0], False
+
+        opened[0].Close()
+
+    library_path: FileInfo = FileInfo(path.as_posix())
+
+    logging.info(f"Opening GlobalLibrary: {library_path} (ReadOnly: {library_data.get('read_only')})")
+
+    library: Siemens.Engineering.Library.GlobalLibrary = SE.Library.GlobalLibrary
+    if library_data.get('read_only'):
+        library = TIA.GlobalLibraries.Open(library_path, SE.OpenMode.ReadOnly) # Read access to the library. Data can be read from the library.
+    else:
+        library = TIA.GlobalLibraries.Open(library_path, SE.OpenMode.ReadWrite) # Read access to the library. Data can be read from the library.
+
+    logging.info(f"Successfully opened GlobalLibrary: {library.Name}")
+
+    if session:
+        session.libraries[path.as_posix()] = (library, read_only, mtime)
+
+    return library, True
+
+
+def create_project(TIA: Siemens.Engineering.TiaPortal, config: dict[Any, Any], DirectoryInfo) -> Siemens.Engineering.Project:
     logging.info(f"Creating project {config['name']} at \"{config['directory']}\"...")
 
     existing_project_path: DirectoryInfo = DirectoryInfo(config['directory'].joinpath(config['name']).as_posix())
@@ -62,326 +465,593 @@ def execute(SE: Siemens.Engineering, config: dict[Any, Any], settings: dict[str,
 
     project_path: DirectoryInfo = DirectoryInfo(config['directory'].as_posix())
 
-    logging.debug(f"Project Path: {project_path}")
+    logging.debug("Project Path: %s", project_path)
 
     project_composition: Siemens.Engineering.ProjectComposition = TIA.Projects
     project: Siemens.Engineering.Project = project_composition.Create(project_path, config['name'])
 
     logging.info(f"Created project {config['name']} at {config['directory']}")
 
+    return project
 
 
-    for library_data in config.get('libraries', []):
+def plug_modules(hw_object: Siemens.Engineering.HW.HardwareObject, device_data: dict[str, Any], modules: list[dict[str, Any]]):
+    for module in modules:
+        logging.info(f"Plugging {module['TypeIdentifier']} on [{module['PositionNumber'] + device_data['slots_required']}]...")
 
-        library_path: FileInfo = FileInfo(library_data.get('path').as_posix())
+        if hw_object.CanPlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required']):
+            hw_object.PlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required'])
 
-        logging.info(f"Opening GlobalLibrary: {library_path} (ReadOnly: {library_data.get('read_only')})")
+            logging.info(f"{module['TypeIdentifier']} PLUGGED on [{module['PositionNumber'] + device_data['slots_required']}]")
 
-        library: Siemens.Engineering.Library.GlobalLibrary = SE.Library.GlobalLibrary
-        if library_data.get('read_only'):
-            library = TIA.GlobalLibraries.Open(library_path, SE.OpenMode.ReadOnly) # Read access to the library. Data can be read from the library.
-        else:
-            library = TIA.GlobalLibraries.Open(library_path, SE.OpenMode.ReadWrite) # Read access to the library. Data can be read from the library.
+            continue
+
+        logging.info(f"{module['TypeIdentifier']} Not PLUGGED on {module['PositionNumber'] + device_data['slots_required']}")
+
+
+def find_services(SE: Siemens.Engineering, device_items: Siemens.Engineering.HW.DeviceItemComposition, service_type: type, type_identifier: str, layouts: LayoutCache | None) -> list[Any]:
+    # services of one type among device_items, probing only the positions
+    # where the same device type had them before
+    service_name = service_type.__name__
+    positions = layouts.get(type_identifier, service_name) if layouts else None
+    if positions is not None:
+        services = [SE.IEngineeringServiceProvider(device_items[i]).GetService[service_type]() for i in positions if i < device_items.Count]
+        if len(services) == len(positions) and all(services):
+            return services
 
-        logging.info(f"Successfully opened GlobalLibrary: {library.Name}")
+        logging.debug("Cached %s positions of %s do not match, probing every DeviceItem", service_name, type_identifier)
 
+    # the names are read over COM, only when they are logged
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    services = []
+    positions = []
+    for i, device_item in enumerate(device_items):
+        if debug:
+            logging.debug("Accessing a %s at DeviceItem %s", service_name, device_item.Name)
 
-    devices: list[Siemens.Engineering.HW.Device] = []
+        service = SE.IEngineeringServiceProvider(device_item).GetService[service_type]()
+        if not service: continue
+
+        if debug:
+            logging.debug("Found %s for DeviceItem %s", service_name, device_item.Name)
+
+        services.append(service)
+        positions.append(i)
+
+    if layouts:
+        layouts.put(type_identifier, service_name, positions)
+
+    return services
+
+
+def configure_network_interfaces(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device, device_data: dict[str, Any], set_address: bool = True, layouts: LayoutCache | None = None) -> list[Siemens.Engineering.HW.Features.NetworkInterface]:
     interfaces: list[Siemens.Engineering.HW.Features.NetworkInterface] = []
-    for device_data in config['devices']:
-        device_composition: Siemens.Engineering.HW.DeviceComposition = project.Devices
-        device: Siemens.Engineering.HW.Device = device_composition.CreateWithItem(device_data['p_typeIdentifier'],
-                                                                                  device_data['p_name'],
-                                                                                  device_data.get('p_deviceName', '')
-                                                                                  )
+    logging.debug("Accessing a DeviceItem Index 1 at Device %s", device.Name)
 
-        logging.info(f"Created device: ({device_data.get('p_deviceName', '')}, {device_data['p_typeIdentifier']}) on {device.Name}")
+    device_items: Siemens.Engineering.HW.DeviceItemComposition = device.DeviceItems[1].DeviceItems
+    for network_service in find_services(SE, device_items, SE.HW.Features.NetworkInterface, device_data['p_typeIdentifier'], layouts):
+        if isinstance(network_service, SE.HW.Features.NetworkInterface):
+            node: Siemens.Engineeering.HW.Node = network_service.Nodes[0]
+            if set_address:
+                node.SetAttribute("Address", device_data['network_address'])
 
-        devices.append(device)
-        hw_object: Siemens.Engineering.HW.HardwareObject = device.DeviceItems[0]
-        for module in device_data.get('Local modules', []):
-            logging.info(f"Plugging {module['TypeIdentifier']} on [{module['PositionNumber'] + device_data['slots_required']}]...")
+                logging.info(f"Added a network address: {device_data['network_address']}")
 
-            if hw_object.CanPlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required']):
-                hw_object.PlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required'])
+            interfaces.append(network_service)
 
-                logging.info(f"{module['TypeIdentifier']} PLUGGED on [{module['PositionNumber'] + device_data['slots_required']}]")
+    return interfaces
 
-                continue
 
-            logging.info(f"{module['TypeIdentifier']} Not PLUGGED on {module['PositionNumber'] + device_data['slots_required']}")
+def import_tag_table(SE: Siemens.Engineering, software_base: Siemens.Engineering.SW.PlcSoftware, tag_table_data: dict[str, Any], pipeline: XmlPipeline, FileInfo) -> Siemens.Engineering.SW.Tags.PlcTagTable | None:
+    # the whole table in one Openness call, None when the import failed
+    path = pipeline.submit(partial(xml_builder.PlcTagTable(tag_table_data['Name']).build, tag_table_data['Tags'])).result()
+    try:
+        tag_table: Siemens.Engineering.SW.Tags.PlcTagTable = software_base.TagTableGroup.TagTables.Import(FileInfo(path.as_posix()), SE.ImportOptions.Override)[0]
+    except Exception as e:
+        logging.warning(f"Could not import Tag Table {tag_table_data['Name']} ({software_base.Name} Software), creating its tags one by one: {e}")
+        return None
 
-        for module in device_data.get('Modules', []):
-            logging.info(f"Plugging {module['TypeIdentifier']} on [{module['PositionNumber'] + device_data['slots_required']}]...")
+    logging.info(f"Imported Tag Table: {tag_table_data['Name']} with {len(tag_table_data['Tags'])} Tags ({software_base.Name} Software)")
 
-            if hw_object.CanPlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required']):
-                hw_object.PlugNew(module['TypeIdentifier'], module['Name'], module['PositionNumber'] + device_data['slots_required'])
+    return tag_table
 
-                logging.info(f"{module['TypeIdentifier']} PLUGGED on [{module['PositionNumber'] + device_data['slots_required']}]")
 
-                continue
+def create_tags(tag_table: Siemens.Engineering.SW.Tags.PlcTagTable, tags: list[dict[str, Any]]):
+    table_name = tag_table.Name
+    for tag_data in tags:
+        tag_table.Tags.Create(tag_data['Name'], tag_data['DataTypeName'], tag_data['LogicalAddress'])
 
-            logging.info(f"{module['TypeIdentifier']} Not PLUGGED on {module['PositionNumber'] + device_data['slots_required']}")
+        logging.debug("Created Tag: %s (%s Table@0x%s Address)", tag_data['Name'], table_name, tag_data['LogicalAddress'])
 
-        logging.debug(f"Accessing a DeviceItem Index {1} at Device {device.Name}")
+    logging.info(f"Created {len(tags)} Tags ({table_name} Table)")
 
-        device_items: Siemens.Engineering.HW.DeviceItem = device.DeviceItems[1].DeviceItems
-        for device_item in device_items:
-            logging.debug(f"Accessing a NetworkInterface at DeviceItem {device_item.Name}")
 
-            network_service: Siemens.Engineering.HW.Features.NetworkInterface = SE.IEngineeringServiceProvider(device_item).GetService[SE.HW.Features.NetworkInterface]()
-            if not network_service:
+def create_tag_table(SE: Siemens.Engineering, software_base: Siemens.Engineering.SW.PlcSoftware, tag_table_data: dict[str, Any], pipeline: XmlPipeline, FileInfo):
+    logging.info(f"Creating Tag Table: {tag_table_data['Name']} ({software_base.Name} Software)")
 
-                logging.debug(f"No NetworkInterface found for DeviceItem {device_item.Name}")
+    if tag_table_data['Tags'] and import_tag_table(SE, software_base, tag_table_data, pipeline, FileInfo):
+        return
 
-            logging.debug(f"Found NetworkInterface for DeviceItem {device_item.Name}")
+    tag_tables = software_base.TagTableGroup.TagTables
+    tag_table: Siemens.Engineering.SW.Tags.PlcTagTable = tag_tables.Find(tag_table_data['Name']) if tag_table_data['Tags'] else None
+    if tag_table:
+        # left over from a failed import
+        tag_table.Delete()
+    tag_table = tag_tables.Create(tag_table_data['Name'])
 
-            if type(network_service) is SE.HW.Features.NetworkInterface:
-                node: Siemens.Engineeering.HW.Node = network_service.Nodes[0]
-                node.SetAttribute("Address", device_data['network_address'])
+    logging.info(f"Created Tag Table: {tag_table_data['Name']} ({software_base.Name} Software)")
+    logging.debug("PLC Tag Table: %s", tag_table.Name)
 
-                logging.info(f"Added a network address: {device_data['network_address']}")
+    if not isinstance(tag_table, SE.SW.Tags.PlcTagTable):
+        return
 
-                interfaces.append(network_service)
+    create_tags(tag_table, tag_table_data['Tags'])
 
-        for device_item in device.DeviceItems:
 
-            logging.debug(f"Accessing a PlcSoftware from DeviceItem {device_item.Name}")
+def import_hmi_tag_table(SE: Siemens.Engineering, hmi_target: Siemens.Engineering.Hmi.HmiTarget, tag_table_data: dict[str, Any], pipeline: XmlPipeline, FileInfo):
+    logging.info(f"Importing HMI Tag Table: {tag_table_data['Name']} ({hmi_target.Name})")
 
-            software_container: Siemens.Engineering.HW.Features.SoftwareContainer = SE.IEngineeringServiceProvider(device_item).GetService[SE.HW.Features.SoftwareContainer]()
-            if not software_container:
+    start = time.perf_counter()
+    path = pipeline.submit(partial(xml_builder.hmi_tag_table, tag_table_data['Name'], tag_table_data['Tags'])).result()
+    generated = time.perf_counter()
+    hmi_target.TagFolder.TagTables.Import(FileInfo(path.as_posix()), SE.ImportOptions.Override)
+    imported = time.perf_counter()
 
-                logging.debug(f"No PlcSoftware found for DeviceItem {device_item.Name}")
+    logging.info(f"Imported HMI Tag Table: {tag_table_data['Name']} with {len(tag_table_data['Tags'])} Tags ({hmi_target.Name}) in {imported - start:.3f} s (XML {generated - start:.3f} s, import {imported - generated:.3f} s)")
 
-            logging.debug(f"Found PlcSoftware for DeviceItem {device_item.Name}")
 
-            if not software_container: continue
-            software_base: Siemens.Engineering.HW.Software = software_container.Software
-            if not isinstance(software_base, SE.SW.PlcSoftware): continue
+def configure_software(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device, device_data: dict[str, Any], library_index: LibraryIndex, plan: BlockPlan, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, layouts: LayoutCache | None = None, compiler: CompileScheduler | None = None):
+    for software_container in find_services(SE, device.DeviceItems, SE.HW.Features.SoftwareContainer, device_data['p_typeIdentifier'], layouts):
+        software_base: Siemens.Engineering.HW.Software = software_container.Software
+        if isinstance(software_base, SE.Hmi.HmiTarget):
+            for tag_table_data in device_data.get('HMI tags', []):
+                import_hmi_tag_table(SE, software_base, tag_table_data, pipeline, FileInfo)
+            continue
+        if not isinstance(software_base, SE.SW.PlcSoftware): continue
+
+        for tag_table_data in device_data.get('PLC tags', []):
+            create_tag_table(SE, software_base, tag_table_data, pipeline, FileInfo)
+
+        logging.info(f"Adding Program blocks for {software_base.Name}")
+
+        import_program_blocks(SE, library_index, software_base, plan, pipeline, FileInfo, interface_cache, compiler)
+
+
+def create_device(SE: Siemens.Engineering, project: Siemens.Engineering.Project, device_data: dict[str, Any], library_index: LibraryIndex, plan: BlockPlan, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, layouts: LayoutCache | None = None, compiler: CompileScheduler | None = None) -> tuple[Siemens.Engineering.HW.Device, list[Siemens.Engineering.HW.Features.NetworkInterface]]:
+    device_composition: Siemens.Engineering.HW.DeviceComposition = project.Devices
+    device: Siemens.Engineering.HW.Device = device_composition.CreateWithItem(device_data['p_typeIdentifier'],
+                                                                              device_data['p_name'],
+                                                                              device_data.get('p_deviceName', '')
+                                                                              )
+
+    logging.info(f"Created device: ({device_data.get('p_deviceName', '')}, {device_data['p_typeIdentifier']}) on {device.Name}")
+
+    hw_object: Siemens.Engineering.HW.HardwareObject = device.DeviceItems[0]
+    plug_modules(hw_object, device_data, device_data.get('Local modules', []))
+    plug_modules(hw_object, device_data, device_data.get('Modules', []))
+
+    interfaces = configure_network_interfaces(SE, device, device_data, layouts=layouts)
+    configure_software(SE, device, device_data, library_index, plan, pipeline, FileInfo, interface_cache, layouts, compiler)
+
+    return device, interfaces
+
+
+def import_hardware(SE: Siemens.Engineering, project: Siemens.Engineering.Project, devices: list[dict[str, Any]], pipeline: XmlPipeline, FileInfo) -> bool:
+    # Every device with its modules and address in one AutomationML import.
+    # False when the import is not available or failed, the devices are then
+    # created one by one.
+    start = time.perf_counter()
+    path = pipeline.submit(partial(xml_builder.automationml, project.Name, devices), suffix=".aml").result()
+    log_path = path.with_suffix(".log")
+
+    cax_provider: Siemens.Engineering.Cax.CaxProvider = project.GetService[SE.Cax.CaxProvider]()
+    if not cax_provider:
+        logging.warning("No CAx import available, creating devices one by one")
+        return False
+
+    try:
+        imported = cax_provider.Import(FileInfo(path.as_posix()), FileInfo(log_path.as_posix()), SE.Cax.CaxImportOptions.MoveToParkingLot)
+    except Exception as e:
+        logging.warning(f"AutomationML import failed: {e}")
+        imported = False
+
+    if not imported:
+        if log_path.exists():
+            logging.warning(f"AutomationML import log:\n{log_path.read_text(encoding='utf-8', errors='replace')}")
+        logging.warning("Creating devices one by one")
+
+        # nothing half imported may stay behind
+        for device_data in devices:
+            device = find_device(project, device_data)
+            if device:
+                device.Delete()
+
+        return False
+
+    logging.info(f"Imported {len(devices)} devices from AutomationML in {time.perf_counter() - start:.3f} s")
+
+    return True
+
+
+def create_networks(networks: list[dict[str, Any]], interfaces: dict[str, list[Siemens.Engineering.HW.Features.NetworkInterface]]):
+    # Entries sharing a subnet_name share one subnet, entries sharing also the
+    # io_controller share one IO system. Interfaces are looked up by the
+    # address they were given when their device was created and known by
+    # (address, position) in interfaces, pythonnet wrappers of the same COM
+    # object are not identical. Each node is connected to one subnet and each
+    # interface to one IO system, entries naming them again are skipped.
+    groups: dict[tuple[str, str], dict[tuple[str, int], Siemens.Engineering.HW.Features.NetworkInterface]] = {}
+    for network in networks:
+        address = network.get('address')
+        found = interfaces.get(address, [])
+        if not found:
+            logging.warning(f"No NetworkInterface with address {address} for subnet {network.get('subnet_name')}")
+
+        members = groups.setdefault((network.get('subnet_name'), network.get('io_controller')), {})
+        for i, itf in enumerate(found):
+            members.setdefault((address, i), itf)
+
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    subnets: dict[str, Siemens.Engineering.HW.Subnet] = {}
+    connected: dict[tuple[str, int], str] = {}
+    assigned: dict[tuple[str, int], str] = {}
+    for (subnet_name, io_controller), members in groups.items():
+        # the IO controller has to exist before IO devices can connect to it
+        controllers = [(key, itf) for key, itf in members.items() if itf.IoControllers.Count > 0]
+        controller_keys = {key for key, _ in controllers}
+        devices = [(key, itf) for key, itf in members.items() if key not in controller_keys]
+
+        io_system: Siemens.Engineering.HW.IoSystem = None
+        for key, itf in controllers + devices:
+            if key in connected:
+                if connected[key] != subnet_name:
+                    logging.warning(f"NetworkInterface {key[0]} is already connected to {connected[key]}, not connecting it to {subnet_name}")
 
-            for tag_table_data in device_data.get('PLC tags', []):
-                logging.info(f"Creating Tag Table: {tag_table_data['Name']} ({software_base.Name} Software)")
+                    continue
+            elif subnet_name not in subnets:
+                logging.info(f"Creating {subnet_name} subnet")
+
+                subnet = subnets[subnet_name] = itf.Nodes[0].CreateAndConnectToSubnet(subnet_name)
+                connected[key] = subnet_name
+
+                if debug:
+                    logging.debug("""Subnet: %s
+                NetType: %s
+                TypeIdentifier: %s""", subnet.Name, subnet.NetType, subnet.TypeIdentifier)
+            else:
+                subnet = subnets[subnet_name]
+                itf.Nodes[0].ConnectToSubnet(subnet)
+                connected[key] = subnet_name
+
+                if debug:
+                    logging.debug("Subnet %s connected to NetworkInterface Subnets", subnet.Name)
+
+            if key in assigned:
+                if assigned[key] != io_controller:
+                    logging.warning(f"NetworkInterface {key[0]} is already assigned to IO system {assigned[key]}, not assigning it to {io_controller}")
+                continue
 
-                tag_table: Siemens.Engineering.SW.Tags.PlcTagTable = software_base.TagTableGroup.TagTables.Create(tag_table_data['Name'])
+            if io_system is None and itf.IoControllers.Count > 0:
+                io_system = itf.IoControllers[0].CreateIoSystem(io_controller)
+                assigned[key] = io_controller
 
-                logging.info(f"Created Tag Table: {tag_table_data['Name']} ({software_base.Name} Software)")
-                logging.debug(f"PLC Tag Table: {tag_table.Name}")
+                logging.info(f"Successfully created ({subnet_name} subnet, {io_controller} IO Controller)")
+                if debug:
+                    logging.debug("""IO System: %s
+                Number: %s
+                Subnet: %s""", io_system.Name, io_system.Number, io_system.Subnet.Name)
+
+                continue
+
+            if itf.IoConnectors.Count > 0:
+                if io_system is None:
+                    logging.warning(f"No IO controller on {subnet_name} for {io_controller}, IO device left unassigned")
 
-                if not isinstance(tag_table, SE.SW.Tags.PlcTagTable):
                     continue
 
-                for tag_data in tag_table_data['Tags']:
-                    logging.info(f"Creating Tag: {tag_data['Name']} ({tag_table.Name} Table@0x{tag_data['LogicalAddress']} Address)")
+                itf.IoConnectors[0].ConnectToIoSystem(io_system)
+                assigned[key] = io_controller
 
-                    tag_table.Tags.Create(tag_data['Name'], tag_data['DataTypeName'], tag_data['LogicalAddress'])
+                logging.info(f"IoSystem {io_system.Name} connected to NetworkInterface IoConnectors")
 
-                    logging.info(f"Created Tag: {tag_data['Name']} ({tag_table.Name} Table@0x{tag_data['LogicalAddress']} Address)")
+        logging.info(f"Connected {len(members)} NetworkInterfaces to {subnet_name} ({io_controller})")
 
-            for tag_table_data in device_data.get('HMI tags', []):
-                pass # to be implemented
-
-            logging.info(f"Adding Program blocks for {software_base.Name}")
-            logging.debug(f"Program blocks data: {device_data.get('Program blocks', {})}")
-
-            def create_instance(plc_block):
-                wires = []
-                for networks in plc_block.get('network_sources', []):
-                    for instance in networks:
-                        data = create_instance(instance)
-                        if not data: continue
-                        wires.append(data)
-
-                if not plc_block.get('source'):
-                    xml = None
-                    match plc_block.get('type'):
-                        case PlcType.OB:
-                            xml_obj = OB(
-                                plc_block.get('name'),
-                                plc_block.get('number'),
-                                plc_block.get('db', {})
-                            )
-                            xml = xml_obj.build(
-                                programming_language=plc_block.get('programming_language'),
-                                network_sources=plc_block.get('network_sources', []),
-                            )
-                        case PlcType.FB:
-                            xml_obj = FB(
-                                plc_block.get('name'),
-                                plc_block.get('number'),
-                                plc_block.get('db', {})
-                            )
-                            for i, nws in enumerate(plc_block.get('network_sources', [])):
-                                for j, network in enumerate(nws):
-                                    if not network.get('db', {}).get('sections'):
-                                        plc_block['network_sources'][i][j]['db']['sections'] = wires[i]
-
-                            xml = xml_obj.build(
-                                programming_language=plc_block.get('programming_language'),
-                                network_sources=plc_block.get('network_sources', [])
-                            )
-                        case DatabaseType.GLOBAL:
-                            xml_obj = GlobalDB(
-                                plc_block.get('type', DatabaseType.GLOBAL).value,
-                                plc_block.get('name'),
-                                plc_block.get('number')
-                            )
-                            xml = xml_obj.build(plc_block.get('programming_language'))
-
-                    if not xml:
-                        return
-
-                    logging.debug(f"XML data: {xml}")
-
-                    filename = uuid.uuid4().hex
-                    path = Path(tempfile.gettempdir()).joinpath(filename)
-
-                    with open(path, 'w') as file:
-                        file.write(xml)
-
-                        logging.info(f"Written XML data to: {path}")
-
-                    software_base.BlockGroup.Blocks.Import(FileInfo(path.as_posix()), SE.ImportOptions.Override)
-                    
-                    logging.info(f"New PLC Block: {plc_block.get('name')} added to {software_base.Name}")
-
-
-                    db = plc_block.get('db')
-                    if db.get('type') == DatabaseType.SINGLE:
-                        logging.info(f"Creating InstanceDB '{db.get('name')}' for PlcSoftware {software_base.Name}...")
-
-                        software_base.BlockGroup.Blocks.CreateInstanceDB(db['name'], True, db.get('number', 1), db['instanceOfName'])
-
-                    logging.info(f"New Single InstanceDB: {plc_block.get('name')} added to {software_base.Name}")
-
-                    return
-
-                block_source = plc_block.get('source')
-
-                logging.debug(f"Source: {block_source}")
-
-                is_valid_library_source = config_schema.schema_source_library.is_valid(block_source)
-
-                logging.info(f"Checking if PLC Block source is a library: {is_valid_library_source}")
-
-                if is_valid_library_source:
-                    for library in TIA.GlobalLibraries:
-                        db_sections: list[dict[str, Any]] = []
-
-                        logging.debug(f"Checking Library: {block_source.get('library')}")
-
-                        if library.Name != block_source.get('library'): continue
-                        mastercopy = library.MasterCopyFolder.MasterCopies.Find(block_source.get('name'))
-                        if not mastercopy: continue
-                        new_block = software_base.BlockGroup.Blocks.CreateFrom(mastercopy)
-                        new_block.SetAttribute("Name", plc_block.get('name'))
-
-                        logging.info(f"New PLC Block {new_block.Name} from Library {library.Name} added to {software_base.Name}")
-
-                        singleCompile = new_block.GetService[SE.Compiler.ICompilable]();
-                        singleCompile.Compile()
-                        filename = uuid.uuid4().hex
-                        path = f"{Path(tempfile.gettempdir()).absolute().as_posix()}/{filename}.xml"
-                        new_block.Export(FileInfo(path), getattr(SE.ExportOptions, "None")   )
-
-                        with open(path, 'r', encoding='utf-8') as file:
-                            xml = ET.fromstring(file.read().replace('\ufeff<?xml version="1.0" encoding="utf-8"?>\n', ''))
-                            namespace = {'ns': 'http://www.siemens.com/automation/Openness/SW/Interface/v5'}
-
-                            sections = xml.find('.//ns:Sections', namespace)
-                            if not sections:
-                                break
-                            for section in sections:
-                                if section.get('Name') in ['Constant']:
-                                    continue
-                                section_name = section.get('Name')
-                                for member in section:
-                                    name = member.get('Name')
-                                    datatype = member.get('Datatype')
-                                    if not name: continue
-                                    if not section: continue
-                                    if not datatype: continue
-                                    data = {
-                                        "name": section_name,
-                                        "members": [
-                                            {
-                                                "Name": name,
-                                                "Datatype": datatype
-                                            }
-                                        ]
-                                    }
-                                    db_sections.append(data)
-        
-                        return db_sections
-                    return
-                    
-                is_valid_plc_source = config_schema.schema_source_plc.is_valid(block_source)
-
-                logging.info(f"Checking if PLC Block source is a plc: {is_valid_plc_source}")
 
-                if is_valid_plc_source:
-                    # TODO:implement this when needed
-                    return
+def project_file(config: dict[Any, Any]) -> Path | None:
+    # <directory>/<name>/<name>.ap18, .ap19, ... depending on the TIA Portal version
+    return next(iter(sorted((config['directory'] / config['name']).glob(f"{config['name']}.ap*"))), None)
+
+
+def find_device(project: Siemens.Engineering.Project, device_data: dict[str, Any]) -> Siemens.Engineering.HW.Device | None:
+    device = project.Devices.Find(device_data.get('p_deviceName') or device_data['p_name'])
+    if device:
+        return device
+
+    # devices created without a p_deviceName get a name from TIA Portal,
+    # only their head module carries p_name
+    for device in project.Devices:
+        for device_item in device.DeviceItems:
+            if device_item.Name == device_data['p_name']:
+                return device
+
+    return None
 
-            
-            for plc_block in device_data.get('Program blocks', []):
-                plc_block['network_sources'] = [blck for blck in plc_block.get('network_sources', []) if blck]
-                create_instance(plc_block)
-                db = plc_block.get('db')
-                if db.get('type') == DatabaseType.GLOBAL:
-                    logging.info(f"Creating GlobalDB '{db.get('name')}' for PlcSoftware {software_base.Name}...")
 
-                    xml_obj = GlobalDB(
-                        db['type'].value,
-                        db['name'],
-                        db['number']
-                    )
-                    xml = xml_obj.build(db['programming_language'])
+def remove_modules(hw_object: Siemens.Engineering.HW.HardwareObject, device_data: dict[str, Any], modules: list[dict[str, Any]]):
+    positions = {module['PositionNumber'] + device_data['slots_required'] for module in modules}
+    for device_item in hw_object.DeviceItems:
+        if device_item.PositionNumber not in positions: continue
 
-                    logging.debug(f"XML data: {xml}")
+        logging.info(f"Removing {device_item.Name} from [{device_item.PositionNumber}]")
 
-                    filename = uuid.uuid4().hex
-                    path = Path(tempfile.gettempdir()).joinpath(filename)
+        device_item.Delete()
 
-                    with open(path, 'w') as file:
-                        file.write(xml)
-
-                        logging.info(f"Written XML data to: {path}")
-
-                    software_base.BlockGroup.Blocks.Import(FileInfo(path.as_posix()), SE.ImportOptions.Override)
-
-                    logging.info(f"New GlobalDB: {plc_block.get('name')} added to {software_base.Name}")
-
-
-    subnet: Siemens.Engineering.HW.Subnet = None
-    io_system: Siemens.Engineering.HW.IoSystem = None
-    for i, network in enumerate(config.get('networks', [])):
-        for itf in interfaces:
-            if itf.Nodes[0].GetAttribute('Address') != network.get('address'): continue
-            if i == 0:
-
-                logging.info(f"Creating ({network.get('subnet_name')} subnet, {network.get('io_controller')} IO Controller)")
-
-                subnet: Siemens.Engineering.HW.Subnet = itf.Nodes[0].CreateAndConnectToSubnet(network.get('subnet_name'))
-                io_system: Siemens.Engineering.HW.IoSystem = itf.IoControllers[0].CreateIoSystem(network.get('io_controller'))
-
-                logging.info(f"Successfully created ({network.get('subnet_name')} subnet, {network.get('io_controller')} IO Controller)")
-                logging.debug(f"""Subnet: {subnet.Name}
-                NetType: {subnet.NetType}
-                TypeIdentifier: {subnet.TypeIdentifier}
-            IO System: {io_system.Name}
-                Number: {io_system.Number}
-                Subnet: {io_system.Subnet.Name}""")
 
+def update_tag_tables(SE: Siemens.Engineering, software_base: Siemens.Engineering.SW.PlcSoftware, device_diff: incremental.DeviceDiff, pipeline: XmlPipeline, FileInfo):
+    tag_tables = software_base.TagTableGroup.TagTables
+    for name in device_diff.tables_removed:
+        tag_table = tag_tables.Find(name)
+        if not tag_table: continue
+        tag_table.Delete()
+
+        logging.info(f"Deleted Tag Table: {name} ({software_base.Name} Software)")
+
+    for tag_table_data in device_diff.tables_added:
+        create_tag_table(SE, software_base, tag_table_data, pipeline, FileInfo)
+
+    tables = incremental.keyed(device_diff.data.get('PLC tags', []), 'Name')
+    for table_diff in device_diff.tables_changed:
+        # past a few tags one import of the whole table beats a Find,
+        # Delete and Create per tag
+        if len(table_diff.added) + len(table_diff.removed) + len(table_diff.changed) >= TAG_IMPORT_MIN_CHANGES:
+            if import_tag_table(SE, software_base, tables[table_diff.name], pipeline, FileInfo):
                 continue
 
-            logging.info(f"Connecting Subnet {subnet.Name} to IoSystem {io_system.Name}")
+        tag_table = tag_tables.Find(table_diff.name)
+        if not tag_table:
+            logging.warning(f"Tag Table {table_diff.name} is missing from {software_base.Name}, creating it")
 
-            itf.Nodes[0].ConnectToSubnet(subnet)
+            tag_table = tag_tables.Create(table_diff.name)
+            table_diff.added += table_diff.changed
+            table_diff.changed = []
 
-            logging.debug(f"Subnet {subnet.Name} connected to NetworkInterface Subnets")
+        for name in table_diff.removed + [tag_data['Name'] for tag_data in table_diff.changed]:
+            tag = tag_table.Tags.Find(name)
+            if not tag: continue
+            tag.Delete()
+
+            logging.info(f"Deleted Tag: {name} ({tag_table.Name} Table)")
+
+        create_tags(tag_table, table_diff.changed + table_diff.added)
+
+
+def update_hmi_tag_tables(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device, device_diff: incremental.DeviceDiff, pipeline: XmlPipeline, FileInfo, layouts: LayoutCache | None = None):
+    hmi_target = find_software(SE, device, SE.Hmi.HmiTarget, device_diff.data['p_typeIdentifier'], layouts)
+    if not hmi_target:
+        return
+
+    for name in device_diff.hmi_tables_removed:
+        tag_table = hmi_target.TagFolder.TagTables.Find(name)
+        if not tag_table: continue
+        tag_table.Delete()
+
+        logging.info(f"Deleted HMI Tag Table: {name} ({hmi_target.Name})")
+
+    # changed tables are imported again as a whole, replacing the old ones
+    for tag_table_data in device_diff.hmi_tables:
+        import_hmi_tag_table(SE, hmi_target, tag_table_data, pipeline, FileInfo)
+
+
+def delete_blocks(software_base: Siemens.Engineering.SW.PlcSoftware, names: list[str]):
+    blocks = software_base.BlockGroup.Blocks
+    for name in names:
+        block = blocks.Find(name)
+        if not block: continue
+        block.Delete()
+
+        logging.info(f"Deleted PLC Block: {name} from {software_base.Name}")
+
+
+def update_device(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device, device_data: dict[str, Any], device_diff: incremental.DeviceDiff, library_index: LibraryIndex, plan: BlockPlan, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, layouts: LayoutCache | None = None, compiler: CompileScheduler | None = None):
+    logging.info(f"Updating device {device.Name}")
+
+    hw_object: Siemens.Engineering.HW.HardwareObject = device.DeviceItems[0]
+    remove_modules(hw_object, device_data, device_diff.modules_removed)
+    plug_modules(hw_object, device_data, device_diff.modules_added)
+
+    if device_diff.hmi_tables or device_diff.hmi_tables_removed:
+        update_hmi_tag_tables(SE, device, device_diff, pipeline, FileInfo, layouts)
+
+    if not (device_diff.tables_added or device_diff.tables_removed or device_diff.tables_changed or device_diff.blocks or device_diff.blocks_removed):
+        return
+
+    software_base = find_software(SE, device, SE.SW.PlcSoftware, device_data['p_typeIdentifier'], layouts)
+    if not software_base:
+        return
+
+    update_tag_tables(SE, software_base, device_diff, pipeline, FileInfo)
+
+    # blocks created from mastercopies or as instance DBs cannot be
+    # overridden like imported ones, so they are removed first
+    recreated = [step.plc_block['name'] for step in plan.steps if isinstance(step, LibraryBlock)]
+    recreated += [step.plc_block['db']['name'] for step in plan.steps if isinstance(step, ImportBlock) and step.instance_db and step.plc_block.get('db', {}).get('type') == DatabaseType.SINGLE]
+    delete_blocks(software_base, device_diff.blocks_removed + recreated)
+
+    import_program_blocks(SE, library_index, software_base, plan, pipeline, FileInfo, interface_cache, compiler)
+
+
+def apply_config_diff(SE: Siemens.Engineering, project: Siemens.Engineering.Project, config: dict[Any, Any], config_diff: incremental.ConfigDiff, block_plans: list[BlockPlan], library_index: LibraryIndex, pipeline: XmlPipeline, FileInfo, interface_cache: InterfaceCache | None, layouts: LayoutCache | None = None, compiler: CompileScheduler | None = None) -> dict[str, list[Siemens.Engineering.HW.Features.NetworkInterface]]:
+    for device_data in config_diff.removed + list(config_diff.replaced.values()):
+        device = find_device(project, device_data)
+        if not device: continue
+        device.Delete()
+
+        logging.info(f"Deleted device {device_data['p_name']}")
+
+    if config_diff.networks_changed:
+        for name in sorted(config_diff.subnets):
+            subnet = project.Subnets.Find(name)
+            if not subnet: continue
+            subnet.Delete()
+
+            logging.info(f"Deleted subnet {name}")
+
+    interfaces: dict[str, list[Siemens.Engineering.HW.Features.NetworkInterface]] = {}
+    for device_index, device_data in enumerate(config['devices']):
+        device_diff = config_diff.changed.get(device_index)
+        if not device_diff and not config_diff.networks_changed and device_index not in config_diff.added and device_index not in config_diff.replaced:
+            continue
+
+        device = None
+        if device_index not in config_diff.added and device_index not in config_diff.replaced:
+            device = find_device(project, device_data)
+            if not device:
+                logging.warning(f"Device {device_data['p_name']} is missing from the project, creating it")
+
+                block_plans[device_index] = plan_program_blocks(device_data.get('Program blocks', []), pipeline)
+
+        if not device:
+            _, device_interfaces = create_device(SE, project, device_data, library_index, block_plans[device_index], pipeline, FileInfo, interface_cache, layouts, compiler)
+            interfaces.setdefault(device_data['network_address'], []).extend(device_interfaces)
+            continue
+
+        if device_diff:
+            update_device(SE, device, device_data, device_diff, library_index, block_plans[device_index], pipeline, FileInfo, interface_cache, layouts, compiler)
+
+        if config_diff.networks_changed:
+            interfaces.setdefault(device_data['network_address'], []).extend(configure_network_interfaces(SE, device, device_data, bool(device_diff and device_diff.address_changed), layouts))
+
+    return interfaces
+
+
+def execute(SE: Siemens.Engineering, config: dict[Any, Any], settings: dict[str, Any], session: Session | None = None) -> list[CompileResult]:
+    tracer: Tracer | None = None
+    if settings.get('trace'):
+        tracer = Tracer()
+        SE = tracer.wrap(SE, "SE")
+        settings = {
+            **settings,
+            "DirectoryInfo": tracer.wrap(settings['DirectoryInfo'], "DirectoryInfo"),
+            "FileInfo": tracer.wrap(settings['FileInfo'], "FileInfo"),
+        }
+
+    cache: XmlCache | None = None
+    interface_cache: InterfaceCache | None = None
+    layouts = LayoutCache()
+    compiler = CompileScheduler(SE, settings.get('compile', "software"))
+    if settings.get('cache', True):
+        cache_dir = Path(settings.get('cache_dir') or cache_directory())
+        cache = XmlCache(cache_dir / "xml", settings.get('xml_cache_size', 256 * 1024 * 1024))
+        interface_cache = InterfaceCache(cache_dir / "interfaces")
+        layouts = LayoutCache(cache_dir / "layouts.json")
+
+    try:
+        with XmlPipeline(settings.get('workers'), cache) as pipeline:
+            build(SE, config, settings, pipeline, interface_cache, layouts, session, compiler)
+    finally:
+        if cache:
+            logging.info(f"XML cache: {cache.stats()}")
+        if interface_cache:
+            logging.info(f"Interface cache: {interface_cache.stats()}")
+        logging.info(f"Layout cache: {layouts.stats()}")
+        layouts.save()
+        logging.info(f"Compiler: {compiler.summary()}")
+        templates = config.get('templates')
+        if isinstance(templates, Templates) and templates.templates:
+            logging.info(f"Templates: {templates.stats()}")
+        if tracer:
+            tracer.save_collapsed(Path(settings['trace']))
+            logging.info(f"Openness calls, collapsed stacks in {settings['trace']}:\n{tracer.summary()}")
+
+    return compiler.results
+
+
+def build(SE: Siemens.Engineering, config: dict[Any, Any], settings: dict[str, Any], pipeline: XmlPipeline, interface_cache: InterfaceCache | None = None, layouts: LayoutCache | None = None, session: Session | None = None, compiler: CompileScheduler | None = None):
+    logging.debug("config data: %s", config)
+    logging.debug("settings: %s", settings)
+
+    snapshot: dict[str, Any] | None = None
+    config_diff: incremental.ConfigDiff | None = None
+    existing_project_file = project_file(config)
+    if settings.get('incremental'):
+        snapshot = incremental.snapshot(config)
+        previous = incremental.load_manifest(incremental.manifest_path(config)) if existing_project_file else None
+        if previous is not None:
+            config_diff = incremental.diff(previous, snapshot)
+
+            logging.info(f"Incremental update of {existing_project_file}: {config_diff.summary()}")
+
+    # Block XML does not depend on Openness, so generation for every device
+    # starts right away and runs while the hardware is being created.
+    block_plans: list[BlockPlan] = []
+    for device_index, device_data in enumerate(config['devices']):
+        logging.debug("Program blocks data: %s", device_data.get('Program blocks', {}))
+
+        program_blocks = device_data.get('Program blocks', [])
+        if config_diff and device_index not in config_diff.added and device_index not in config_diff.replaced:
+            device_diff = config_diff.changed.get(device_index)
+            program_blocks = [program_blocks[i] for i in device_diff.blocks] if device_diff else []
+
+        block_plans.append(plan_program_blocks(program_blocks, pipeline))
+
+    DirectoryInfo = settings['DirectoryInfo']
+    FileInfo = settings['FileInfo']
+
+    TIA = session.TIA if session else start_portal(SE, settings)
+
+
+
+
+    if snapshot is not None:
+        # a run that fails half way must not leave a manifest behind that
+        # no longer matches the project
+        incremental.manifest_path(config).unlink(missing_ok=True)
+
+    if config_diff is not None:
+        logging.info(f"Opening project {existing_project_file}")
+
+        project: Siemens.Engineering.Project = TIA.Projects.Open(FileInfo(existing_project_file.as_posix()))
+    else:
+        project = create_project(TIA, config, DirectoryInfo)
+
+
+
+    library_index = session.library_index if session else LibraryIndex(TIA)
+    for library_data in config.get('libraries', []):
+        library, opened = open_library(SE, TIA, library_data, FileInfo, session)
+        if opened:
+            library_index.add(library)
+        if interface_cache:
+            interface_cache.register_library(library.Name, library_data.get('path'))
+
+
+    if config_diff is not None:
+        interfaces = apply_config_diff(SE, project, config, config_diff, block_plans, library_index, pipeline, FileInfo, interface_cache, layouts, compiler)
+        if config_diff.networks_changed:
+            create_networks(config.get('networks', []), interfaces)
+    else:
+        aml = settings.get('hardware') == "aml" and import_hardware(SE, project, config['devices'], pipeline, FileInfo)
+
+        interfaces: dict[str, list[Siemens.Engineering.HW.Features.NetworkInterface]] = {}
+        for device_index, device_data in enumerate(config['devices']):
+            device = find_device(project, device_data) if aml else None
+            if device:
+                device_interfaces = configure_network_interfaces(SE, device, device_data, set_address=False, layouts=layouts)
+                configure_software(SE, device, device_data, library_index, block_plans[device_index], pipeline, FileInfo, interface_cache, layouts, compiler)
+            else:
+                if aml:
+                    logging.warning(f"Device {device_data['p_name']} is missing after the AutomationML import, creating it")
+                _, device_interfaces = create_device(SE, project, device_data, library_index, block_plans[device_index], pipeline, FileInfo, interface_cache, layouts, compiler)
+            interfaces.setdefault(device_data['network_address'], []).extend(device_interfaces)
+
+        create_networks(config.get('networks', []), interfaces)
+
+    if snapshot is not None:
+        project.Save()
+        incremental.save_manifest(incremental.manifest_path(config), snapshot)
+
+        logging.info(f"Saved project {config['name']} and its manifest")
 
-            if itf.IoConnectors.Count > 0:
-                itf.IoConnectors[0].ConnectToIoSystem(io_system)
 
-                logging.info(f"IoSystem {io_system.Name} connected to NetworkInterface IoConnectors")
 
+    logging.info(f"Library index: {library_index.stats()}")
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator
+import logging
+import os
+import time
+
+from . import config_schema
+from .openness_xml import read_block, read_tag_table
+from .pipeline import XmlPipeline
+from .portal import find_services, start_portal
+
+# Turns an existing project back into a config. Every block and PLC tag table
+# is exported to XML on the Openness thread and handed to a process pool right
+# away, so the files are parsed while the remaining ones are still exported.
+# A config only describes blocks by their calls: networks keep the calls of
+# instances (single and multi-instance), not the rest of their logic.
+
+SLOTS_REQUIRED: int = 2 # default of slots_required in config_schema
+
+# exported block types kept as program blocks, instance DBs belong to calls
+BLOCK_TYPES: dict[str, str] = {
+    "OB": "OB",
+    "FB": "FB",
+    "FC": "FC",
+    "GlobalDB": "GLOBAL",
+    "GLOBAL": "GLOBAL",
+}
+INSTANCE_DB_TYPES: tuple[str, ...] = ("InstanceDB", "SINGLE")
+
+
+def iter_group(group: Any, composition: str) -> Iterator[Any]:
+    # blocks or tag tables of a system group and of all its user groups
+    yield from getattr(group, composition)
+    for subgroup in group.Groups:
+        yield from iter_group(subgroup, composition)
+
+
+def export_items(SE: Siemens.Engineering, items: Iterator[Any], pipeline: XmlPipeline, FileInfo, pool: ProcessPoolExecutor, read: Callable[[Path], dict[str, Any] | None]) -> list[Future[dict[str, Any] | None]]:
+    futures: list[Future[dict[str, Any] | None]] = []
+    for item in items:
+        path = pipeline.path()
+        try:
+            item.Export(FileInfo(path.absolute().as_posix()), getattr(SE.ExportOptions, "None"))
+        except Exception as e:
+            # e.g. know-how protected or inconsistent blocks
+            logging.warning(f"Could not export {item.Name}: {e}")
+
+            continue
+        futures.append(pool.submit(read, path))
+
+    return futures
+
+
+def collect(futures: list[Future[dict[str, Any] | None]]) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    for future in futures:
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.warning(f"Could not read an exported file: {e}")
+
+            continue
+        if result:
+            results.append(result)
+
+    return results
+
+
+def describe_device(SE: Siemens.Engineering, device: Siemens.Engineering.HW.Device) -> tuple[dict[str, Any], list[dict[str, Any]], Siemens.Engineering.SW.PlcSoftware | None]:
+    # the config of a device without its program, its network entries and
+    # its PlcSoftware
+    device_items: Siemens.Engineering.HW.DeviceItemComposition = device.DeviceItems
+    head: Siemens.Engineering.HW.DeviceItem = device_items[1] if device_items.Count > 1 else device_items[0]
+    device_data: dict[str, Any] = {
+        "p_name": head.Name,
+        "p_typeIdentifier": head.TypeIdentifier,
+    }
+
+    networks: list[dict[str, Any]] = []
+    for network_interface in find_services(SE, head.DeviceItems, SE.HW.Features.NetworkInterface, head.TypeIdentifier, None):
+        node: Siemens.Engineering.HW.Node = network_interface.Nodes[0]
+        address = str(node.GetAttribute("Address"))
+        device_data.setdefault('network_address', address)
+
+        subnet: Siemens.Engineering.HW.Subnet = node.ConnectedSubnet
+        if subnet is None:
+            continue
+        io_system: Siemens.Engineering.HW.IoSystem = None
+        if network_interface.IoControllers.Count > 0:
+            io_system = network_interface.IoControllers[0].IoSystem
+        elif network_interface.IoConnectors.Count > 0:
+            io_system = network_interface.IoConnectors[0].ConnectedToIoSystem
+        networks.append({"address": address, "subnet_name": subnet.Name, "io_controller": io_system.Name if io_system else ""})
+
+    software_base: Siemens.Engineering.SW.PlcSoftware | None = None
+    is_hmi = False
+    for software_container in find_services(SE, device_items, SE.HW.Features.SoftwareContainer, head.TypeIdentifier, None):
+        if isinstance(software_container.Software, SE.SW.PlcSoftware):
+            software_base = software_container.Software
+        elif isinstance(software_container.Software, SE.Hmi.HmiTarget):
+            is_hmi = True
+
+    if is_hmi and software_base is None:
+        return device_data, networks, None
+
+    device_data['p_deviceName'] = device.Name
+
+    modules = [
+        device_item for device_item in device_items[0].DeviceItems
+        if device_item.Name != head.Name and device_item.TypeIdentifier
+    ]
+    slots_required = min([SLOTS_REQUIRED] + [device_item.PositionNumber for device_item in modules])
+    if slots_required != SLOTS_REQUIRED:
+        device_data['slots_required'] = slots_required
+    device_data["Local modules" if software_base else "Modules"] = [
+        {"TypeIdentifier": device_item.TypeIdentifier, "Name": device_item.Name, "PositionNumber": device_item.PositionNumber - slots_required}
+        for device_item in modules
+    ]
+
+    return device_data, networks, software_base
+
+
+def instance_db(call: dict[str, Any], instance_dbs: dict[str, dict[str, Any]]) -> dict[str, Any] | None:
+    if call['scope'] == "GlobalVariable":
+        db: dict[str, Any] = {
+            "type": "SINGLE",
+            "name": call['component'],
+            "programming_language": "DB",
+            "instanceOfName": call['name'],
+        }
+        number = int(instance_dbs.get(call['component'], {}).get('number') or 0)
+        if number:
+            db['number'] = number
+        return db
+
+    if call['scope'] == "LocalVariable":
+        sections: dict[str, list[dict[str, str]]] = {}
+        for name, section, datatype in call['parameters']:
+            sections.setdefault(section, []).append({"Name": name, "Datatype": datatype})
+        return {
+            "type": "MULTI",
+            "component_name": call['component'],
+            "sections": [{"name": name, "members": members} for name, members in sections.items()],
+        }
+
+    return None
+
+
+def program_blocks(blocks: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Blocks called through an instance are nested into the networks of their
+    # callers, the others (OBs, GlobalDBs, blocks nobody calls) are top level.
+    by_name = {block['name']: block for block in blocks if BLOCK_TYPES.get(block['type'])}
+    instance_dbs = {block['name']: block for block in blocks if block['type'] in INSTANCE_DB_TYPES}
+    entries: dict[str, dict[str, Any] | None] = {}
+    called: set[str] = set()
+    used_dbs: set[str] = set()
+    skipped = 0
+
+    def entry(name: str, callers: tuple[str, ...]) -> dict[str, Any] | None:
+        nonlocal skipped
+        if name in entries:
+            return entries[name]
+        block = by_name.get(name)
+        if block is None or name in callers:
+            return None
+
+        block_type = BLOCK_TYPES[block['type']]
+        data: dict[str, Any] = {
+            "name": name,
+            "type": block_type,
+            "programming_language": block['programming_language'] or ("DB" if block_type == "GLOBAL" else "LAD"),
+        }
+        number = int(block['number'] or 0)
+        if number:
+            data['number'] = number
+
+        network_sources: list[list[dict[str, Any]]] = []
+        for network in block['networks']:
+            instances: list[dict[str, Any]] = []
+            for call in network:
+                db = instance_db(call, instance_dbs)
+                callee = entry(call['name'], callers + (name,)) if db else None
+                if callee is None:
+                    # FC calls and system blocks have no place in a config
+                    skipped += 1
+
+                    continue
+                called.add(call['name'])
+                if db['type'] == "SINGLE":
+                    used_dbs.add(db['name'])
+                instances.append({**callee, "db": db})
+            if instances:
+                network_sources.append(instances)
+        if network_sources:
+            data['network_sources'] = network_sources
+
+        entries[name] = data
+        return data
+
+    for name in by_name:
+        entry(name, ())
+
+    top_level = [entries[name] for name, block in by_name.items() if block['type'] in ("OB", "GlobalDB", "GLOBAL") or name not in called]
+
+    unused = [name for name in instance_dbs if name not in used_dbs]
+    if skipped or unused:
+        logging.warning(f"Left out {skipped} calls without an instance or of blocks outside the project and {len(unused)} instance DBs not called from a graphical network")
+
+    return top_level
+
+
+def export_project(SE: Siemens.Engineering, project_path: Path, settings: dict[str, Any]) -> dict[str, Any]:
+    FileInfo = settings['FileInfo']
+
+    start = time.perf_counter()
+    TIA = start_portal(SE, settings)
+
+    logging.info(f"Opening project {project_path}")
+
+    project: Siemens.Engineering.Project = TIA.Projects.Open(FileInfo(project_path.as_posix()))
+
+    devices: list[dict[str, Any]] = []
+    networks: list[dict[str, Any]] = []
+    exports: list[tuple[dict[str, Any], list[Future], list[Future]]] = []
+    opened = time.perf_counter()
+    with XmlPipeline(1) as pipeline, ProcessPoolExecutor(max_workers=settings.get('workers') or os.cpu_count()) as pool:
+        for device in project.Devices:
+            device_data, device_networks, software_base = describe_device(SE, device)
+            devices.append(device_data)
+            networks.extend(device_networks)
+            if software_base is None:
+                continue
+
+            logging.info(f"Exporting blocks and tag tables of {software_base.Name}")
+
+            block_futures = export_items(SE, iter_group(software_base.BlockGroup, "Blocks"), pipeline, FileInfo, pool, read_block)
+            table_futures = export_items(SE, iter_group(software_base.TagTableGroup, "TagTables"), pipeline, FileInfo, pool, read_tag_table)
+            exports.append((device_data, block_futures, table_futures))
+
+        exported = time.perf_counter()
+
+        blocks = tables = 0
+        for device_data, block_futures, table_futures in exports:
+            device_data['PLC tags'] = collect(table_futures)
+            device_data['Program blocks'] = program_blocks(collect(block_futures))
+            blocks += len(block_futures)
+            tables += len(table_futures)
+        parsed = time.perf_counter()
+
+    project.Close()
+
+    logging.info(f"Exported {blocks} blocks and {tables} tag tables of {len(devices)} devices in {exported - opened:.2f} s ({blocks / max(exported - opened, 1e-9):.0f} blocks/s), parsing finished {parsed - exported:.2f} s later, {parsed - start:.2f} s in total")
+
+    config = {
+        "devices": devices,
+        "networks": networks,
+    }
+    # the validated copy holds enums and paths, the config stays plain JSON
+    config_schema.validate_config(config)
+
+    return config
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator, Mapping
+import base64
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+
+# Layout of a resource archive:
+#   MAGIC | uint32 (little endian) index length | JSON index | compressed entries
+# The index maps every entry name to the offset (relative to the end of the
+# index) and length of its zlib stream, its uncompressed size and the sha256
+# of the uncompressed data.
+
+MAGIC: bytes = b"TIARES01"
+HEADER = struct.Struct("<8sI")
+CHUNK_SIZE: int = 256 * 1024
+
+
+def write(path: Path, entries: Mapping[str, bytes], level: int = 9) -> None:
+    blobs: dict[str, bytes] = {name: zlib.compress(data, level) for name, data in entries.items()}
+
+    index: dict[str, dict] = {}
+    offset = 0
+    for name, blob in blobs.items():
+        index[name] = {
+            "offset": offset,
+            "length": len(blob),
+            "size": len(entries[name]),
+            "sha256": hashlib.sha256(entries[name]).hexdigest(),
+        }
+        offset += len(blob)
+
+    raw_index = json.dumps(index).encode('utf-8')
+
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(raw_index)))
+        file.write(raw_index)
+        for blob in blobs.values():
+            file.write(blob)
+    os.replace(tmp_path, path)
+
+
+class ResourceArchive:
+    def __init__(self, path: Path) -> None:
+        self.path: Path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, index_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a resource archive: {path}")
+        self.index: dict[str, dict] = json.loads(self._map[HEADER.size:HEADER.size + index_length])
+        self._data_start: int = HEADER.size + index_length
+
+        self.b64: Mapping[str, str] = B64View(self)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def digest(self, name: str) -> str:
+        return self.index[name]['sha256']
+
+    def size(self, name: str) -> int:
+        return self.index[name]['size']
+
+    def iter_chunks(self, name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        entry = self.index[name]
+        decompressor = zlib.decompressobj()
+        start = self._data_start + entry['offset']
+        end = start + entry['length']
+        for i in range(start, end, chunk_size):
+            chunk = decompressor.decompress(self._map[i:min(i + chunk_size, end)])
+            if chunk:
+                yield chunk
+        chunk = decompressor.flush()
+        if chunk:
+            yield chunk
+
+    def read(self, name: str) -> bytes:
+        entry = self.index[name]
+        start = self._data_start + entry['offset']
+        return zlib.decompress(self._map[start:start + entry['length']])
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class B64View(Mapping):
+    # Read-only dict of base64 strings, kept for callers of the old res/dlls.py
+    # module. Entries are decompressed and encoded on every access.
+    def __init__(self, archive: ResourceArchive) -> None:
+        self._archive = archive
+
+    def __getitem__(self, name: str) -> str:
+        if name not in self._archive:
+            raise KeyError(name)
+        return base64.b64encode(self._archive.read(name)).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._archive)
+
+    def __len__(self) -> int:
+        return len(self._archive)
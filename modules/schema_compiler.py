@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import Any, Callable
+from schema import Schema, And, Or, Use, Optional
+
+# Compiles a tree of `schema` objects into plain Python closures that return
+# the same validated data as Schema.validate. Rejections raise Invalid without
+# building error messages; callers rerun the original schema to report them.
+# Anything the compiler does not understand (Hook, Regex, Literal, non literal
+# dict keys, ...) is delegated to the schema library itself.
+
+Checker = Callable[[Any], Any]
+
+ITERABLES = (list, tuple, set, frozenset)
+
+
+class Invalid(Exception):
+    pass
+
+
+def compile_schema(schema: Any) -> Checker:
+    return Compiler().compile(schema)
+
+
+def fallback(schema: Any, ignore_extra_keys: bool) -> Checker:
+    wrapped = Schema(schema, ignore_extra_keys=ignore_extra_keys)
+
+    def check(data: Any) -> Any:
+        try:
+            return wrapped.validate(data)
+        except Exception:
+            raise Invalid
+
+    return check
+
+
+class Compiler:
+    def __init__(self) -> None:
+        # recursive schemas refer to the same dict object, each one is only
+        # compiled once and later references go through a forwarding cell
+        self._compiled: dict[tuple[int, bool], list[Checker]] = {}
+
+    def compile(self, s: Any, ignore_extra_keys: bool = False) -> Checker:
+        if type(s) is Schema:
+            return self.compile(s.schema, s.ignore_extra_keys)
+        if type(s) in ITERABLES:
+            return self.compile_iterable(s, ignore_extra_keys)
+        if isinstance(s, dict):
+            cache_key = (id(s), ignore_extra_keys)
+            cell = self._compiled.get(cache_key)
+            if cell is None:
+                cell = self._compiled[cache_key] = []
+                cell.append(self.compile_dict(s, ignore_extra_keys))
+            return cell[0] if cell else (lambda data: cell[0](data))
+        if issubclass(type(s), type):
+            return self.compile_type(s)
+        if type(s) is And:
+            return self.compile_and(s)
+        if type(s) is Or:
+            return self.compile_or(s)
+        if type(s) is Use:
+            return self.compile_use(s)
+        if hasattr(s, "validate"):
+            return fallback(s, ignore_extra_keys)
+        if callable(s):
+            return self.compile_callable(s)
+        return self.compile_comparable(s)
+
+    def compile_type(self, s: type) -> Checker:
+        if s == int:
+            def check(data: Any) -> Any:
+                if isinstance(data, int) and not isinstance(data, bool):
+                    return data
+                raise Invalid
+        else:
+            def check(data: Any) -> Any:
+                if isinstance(data, s):
+                    return data
+                raise Invalid
+
+        return check
+
+    def compile_iterable(self, s: Any, ignore_extra_keys: bool) -> Checker:
+        kind = type(s)
+        item = self.compile_alternatives(list(s), ignore_extra_keys)
+
+        def check(data: Any) -> Any:
+            if not isinstance(data, kind):
+                raise Invalid
+            return type(data)(item(d) for d in data)
+
+        return check
+
+    def compile_dict(self, s: dict, ignore_extra_keys: bool) -> Checker:
+        keys: dict[Any, Checker] = {}
+        required: list[Any] = []
+        defaults: list[tuple[Any, Any]] = []
+        for skey, svalue in s.items():
+            key = literal_key(skey)
+            if key is None:
+                return fallback(s, ignore_extra_keys)
+            if type(skey) is Optional:
+                if hasattr(skey, "default"):
+                    defaults.append((key, skey.default))
+            else:
+                required.append(key)
+            keys[key] = self.compile(svalue, ignore_extra_keys)
+
+        def check(data: Any) -> Any:
+            if not isinstance(data, dict):
+                raise Invalid
+            new = type(data)()
+            nested = None
+            # nested dicts are validated last, as Schema does it
+            for key, value in data.items():
+                if isinstance(value, dict):
+                    if nested is None:
+                        nested = []
+                    nested.append((key, value))
+                    continue
+                value_check = keys.get(key)
+                if value_check is not None:
+                    new[key] = value_check(value)
+            if nested:
+                for key, value in nested:
+                    value_check = keys.get(key)
+                    if value_check is not None:
+                        new[key] = value_check(value)
+            for key in required:
+                if key not in new:
+                    raise Invalid
+            if not ignore_extra_keys and len(new) != len(data):
+                raise Invalid
+            for key, default in defaults:
+                if key not in new:
+                    new[key] = default() if callable(default) else default
+            return new
+
+        return check
+
+    def compile_and(self, s: And) -> Checker:
+        steps = [self.compile(arg, s._ignore_extra_keys) for arg in s.args]
+
+        def check(data: Any) -> Any:
+            for step in steps:
+                data = step(data)
+            return data
+
+        return check
+
+    def compile_or(self, s: Or) -> Checker:
+        if s.only_one:
+            return fallback(s, False)
+        return self.compile_alternatives(list(s.args), s._ignore_extra_keys)
+
+    def compile_alternatives(self, alternatives: list[Any], ignore_extra_keys: bool) -> Checker:
+        checks = [self.compile(alternative, ignore_extra_keys) for alternative in alternatives]
+        if len(checks) == 1:
+            return checks[0]
+
+        filters = [dispatch_filter(alternative, ignore_extra_keys) for alternative in alternatives]
+        if not any(filters):
+            def check(data: Any) -> Any:
+                for alternative in checks:
+                    try:
+                        return alternative(data)
+                    except Invalid:
+                        pass
+                raise Invalid
+
+            return check
+
+        def check(data: Any) -> Any:
+            is_dict = isinstance(data, dict)
+            for accepts, alternative in zip(filters, checks):
+                if is_dict and accepts and not accepts(data):
+                    continue
+                try:
+                    return alternative(data)
+                except Invalid:
+                    pass
+            raise Invalid
+
+        return check
+
+    def compile_use(self, s: Use) -> Checker:
+        function = s._callable
+
+        def check(data: Any) -> Any:
+            try:
+                return function(data)
+            except Exception:
+                raise Invalid
+
+        return check
+
+    def compile_callable(self, s: Callable[[Any], Any]) -> Checker:
+        def check(data: Any) -> Any:
+            try:
+                if s(data):
+                    return data
+            except Exception:
+                raise Invalid
+            raise Invalid
+
+        return check
+
+    def compile_comparable(self, s: Any) -> Checker:
+        def check(data: Any) -> Any:
+            if s == data:
+                return data
+            raise Invalid
+
+        return check
+
+
+def literal_key(skey: Any) -> str | None:
+    if type(skey) is Optional:
+        skey = skey.schema
+    return skey if type(skey) is str else None
+
+
+def dict_schema(s: Any, ignore_extra_keys: bool) -> tuple[dict, bool] | None:
+    while type(s) is Schema:
+        ignore_extra_keys = s.ignore_extra_keys
+        s = s.schema
+    if isinstance(s, dict) and all(literal_key(key) is not None for key in s):
+        return s, ignore_extra_keys
+    return None
+
+
+def enum_values(s: Any) -> frozenset[str] | None:
+    # strings accepted by And(str, Use(SomeEnum)) and And(str, Or(Use(A), Use(B)))
+    if type(s) is Schema:
+        return enum_values(s.schema)
+    if type(s) is And:
+        if len(s.args) != 2 or s.args[0] is not str:
+            return None
+        return enum_values(s.args[1])
+    if type(s) is Or:
+        accepted = frozenset()
+        for arg in s.args:
+            values = enum_values(arg)
+            if values is None:
+                return None
+            accepted |= values
+        return accepted
+    if type(s) is Use and isinstance(s._callable, type) and issubclass(s._callable, Enum):
+        return frozenset(member.value for member in s._callable if isinstance(member.value, str))
+    return None
+
+
+def dispatch_filter(alternative: Any, ignore_extra_keys: bool) -> Callable[[dict], bool] | None:
+    # Cheap necessary conditions for a dict alternative to match: its required
+    # keys are present, no unknown keys are present and the "type" value is
+    # one of its enum values. Alternatives are still tried in order, so the
+    # first matching one wins exactly like Or does.
+    found = dict_schema(alternative, ignore_extra_keys)
+    if found is None:
+        return None
+    s, ignore_extra_keys = found
+
+    required = frozenset(key for key in s if type(key) is not Optional)
+    allowed = frozenset(literal_key(key) for key in s)
+    types = None
+    if "type" in required:
+        types = enum_values(s["type"])
+
+    def accepts(data: dict) -> bool:
+        if not required <= data.keys():
+            return False
+        if not ignore_extra_keys and not data.keys() <= allowed:
+            return False
+        if types is not None:
+            value = data["type"]
+            if not isinstance(value, str) or value not in types:
+                return False
+        return True
+
+    return accepts
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any, Iterator
+import bisect
+import re
+
+from schema import Schema, SchemaError
+
+# Templates of devices, networks and program blocks, defined once under
+# "templates" of a config and used in its lists:
+#
+#   "templates": {"io_node": {"kind": "device", "params": {"n": 0, "address": "192.168.0.10"},
+#                             "body": {"p_name": "IO_${n}", "network_address": "${address}", ...}}},
+#   "devices": [{"template": "io_node", "repeat": 100, "params": {"n": "{i}", "address": "192.168.0.{i+10}"}}]
+#
+# "${param}" is replaced in every string of the body, a string that is only
+# "${param}" takes the value with its type. In the params of a use, "{i}",
+# "{i+k}", "{i-k}", "{i*k}" and "{i*k+m}" are replaced by the repeat index.
+# A template is validated once, with the defaults of its params; uses only
+# check that their params match the types of the defaults. Lists holding uses
+# become TemplateLists, which expand an item when it is first accessed and
+# keep it, so validating a config scales with the templates and the uses, not
+# with the instances.
+
+KINDS: tuple[str, ...] = ("device", "network", "program_block")
+
+# lists of an item of a kind which may hold uses, and the kind of their items
+NESTED: dict[str, dict[str, str]] = {
+    "device": {"Program blocks": "program_block"},
+}
+
+PLACEHOLDER = re.compile(r"\$\{(\w+)\}")
+INDEX = re.compile(r"\{i(?:\s*\*\s*(\d+))?(?:\s*([+-])\s*(\d+))?\}")
+
+
+def is_use(item: Any) -> bool:
+    return isinstance(item, dict) and "template" in item
+
+
+def substitute(pattern: str, values: dict[str, Any]) -> Any:
+    match = PLACEHOLDER.fullmatch(pattern)
+    if match:
+        return values[match.group(1)]
+    return PLACEHOLDER.sub(lambda m: str(values[m.group(1)]), pattern)
+
+
+def render_index(value: Any, index: int) -> Any:
+    if not isinstance(value, str):
+        return value
+
+    def evaluate(match: re.Match) -> str:
+        result = index * int(match.group(1) or 1)
+        if match.group(2):
+            result += int(match.group(3)) if match.group(2) == "+" else -int(match.group(3))
+        return str(result)
+
+    return INDEX.sub(evaluate, value)
+
+
+def find_slots(value: Any, path: tuple[Any, ...], slots: list[tuple[tuple[Any, ...], str]]) -> list[tuple[tuple[Any, ...], str]]:
+    # every string of the body holding a placeholder, by its path
+    if isinstance(value, str):
+        if PLACEHOLDER.search(value):
+            slots.append((path, value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(key, str) and PLACEHOLDER.search(key):
+                raise SchemaError(f"Placeholders are not allowed in keys ({key})")
+            find_slots(item, path + (key,), slots)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            find_slots(item, path + (i,), slots)
+    return slots
+
+
+def clone(value: Any) -> Any:
+    # validated bodies hold only dicts, lists and immutable values, copying
+    # them by hand is several times faster than copy.deepcopy
+    if type(value) is dict:
+        return {key: clone(item) if type(item) in (dict, list) else item for key, item in value.items()}
+    if type(value) is list:
+        return [clone(item) if type(item) in (dict, list) else item for item in value]
+    return value
+
+
+def lookup(value: Any, path: tuple[Any, ...]) -> Any:
+    for key in path:
+        value = value[key]
+    return value
+
+
+class Template:
+    def __init__(self, name: str, definition: dict[str, Any], item_schema: Schema) -> None:
+        self.name = name
+        self.kind: str = definition['kind']
+        self.defaults: dict[str, Any] = definition['params']
+        body: dict[str, Any] = definition['body']
+
+        self.slots = find_slots(body, (), [])
+        for _, pattern in self.slots:
+            for param in PLACEHOLDER.findall(pattern):
+                if param not in self.defaults:
+                    raise SchemaError(f"Template {name} uses ${{{param}}} without a default in its params")
+
+        rendered = clone(body)
+        for path, pattern in self.slots:
+            if path:
+                lookup(rendered, path[:-1])[path[-1]] = substitute(pattern, self.defaults)
+        try:
+            self.validated: dict[str, Any] = item_schema.validate(rendered)
+        except SchemaError as e:
+            raise SchemaError(f"Template {name} ({self.kind}) is invalid: {e}")
+
+        # a parameter may only go where the schema keeps the value as it is
+        for path, pattern in self.slots:
+            if lookup(self.validated, path) != lookup(rendered, path):
+                raise SchemaError(f"Template {name}: {'/'.join(map(str, path))} is converted by the schema and cannot take a parameter")
+
+    def params(self, params: dict[str, Any], index: int) -> dict[str, Any]:
+        # the params of the instance at index of a use, typed like the defaults
+        values = dict(self.defaults)
+        for key, value in params.items():
+            if key not in self.defaults:
+                raise SchemaError(f"Template {self.name} has no parameter {key}")
+            value = render_index(value, index)
+            default = self.defaults[key]
+            if isinstance(default, int) and not isinstance(default, bool) and isinstance(value, str):
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise SchemaError(f"Parameter {key} of template {self.name} is not a number: {value}")
+            if type(value) is not type(default):
+                raise SchemaError(f"Parameter {key} of template {self.name} is {type(value).__name__}, its default is {type(default).__name__}")
+            values[key] = value
+        return values
+
+    def expand(self, values: dict[str, Any]) -> dict[str, Any]:
+        item = clone(self.validated)
+        for path, pattern in self.slots:
+            if path:
+                lookup(item, path[:-1])[path[-1]] = substitute(pattern, values)
+        return item
+
+
+class Templates:
+    def __init__(self, definitions: dict[str, dict[str, Any]], schemas: dict[str, Schema]) -> None:
+        self.schemas = schemas
+        self.definitions = definitions
+        self.templates: dict[str, Template] = {
+            name: Template(name, definition, schemas[definition['kind']])
+            for name, definition in definitions.items()
+        }
+        self.instances = 0
+        self.expanded = 0
+
+        for name in self.templates:
+            self.check_cycle(name, ())
+
+    def check_cycle(self, name: str, using: tuple[str, ...]) -> None:
+        if name in using:
+            raise SchemaError(f"Template {name} uses itself ({' > '.join(using + (name,))})")
+        template = self.templates[name]
+        for key in NESTED.get(template.kind, {}):
+            for item in template.validated.get(key, []):
+                if is_use(item) and item['template'] in self.templates:
+                    self.check_cycle(item['template'], using + (name,))
+
+    def get(self, use: dict[str, Any], kind: str) -> Template:
+        template = self.templates.get(use['template'])
+        if template is None:
+            raise SchemaError(f"Unknown template {use['template']}")
+        if template.kind != kind:
+            raise SchemaError(f"Template {use['template']} is a {template.kind}, not a {kind}")
+        return template
+
+    def wrap(self, items: list[Any], kind: str) -> list[Any] | TemplateList:
+        # a TemplateList when items hold uses, otherwise items themselves
+        if any(is_use(entry) for entry in items):
+            return TemplateList(items, self, kind)
+        for entry in items:
+            self.attach(entry, kind)
+        return items
+
+    def attach(self, item: dict[str, Any], kind: str) -> dict[str, Any]:
+        for key, item_kind in NESTED.get(kind, {}).items():
+            if isinstance(item.get(key), list):
+                item[key] = self.wrap(item[key], item_kind)
+        return item
+
+    def stats(self) -> str:
+        return f"{len(self.templates)} templates, {self.expanded} of {self.instances} instances expanded"
+
+    def __repr__(self) -> str:
+        return f"Templates({', '.join(self.templates)})"
+
+
+class TemplateList(Sequence):
+    # A list of items and uses of templates, read like the list of the items
+    # they expand to. Each instance is expanded on first access and kept.
+    def __init__(self, entries: list[Any], templates: Templates, kind: str) -> None:
+        self.entries = entries
+        self.templates = templates
+        self.kind = kind
+        self.expanded: dict[int, Any] = {}
+        self.starts: list[int] = []
+
+        total = 0
+        for entry in entries:
+            self.starts.append(total)
+            if is_use(entry):
+                # the first and the last instance show wrong params right away
+                template = templates.get(entry, kind)
+                for index in ((0, entry['repeat'] - 1) if entry['repeat'] else ()):
+                    template.params(entry['params'], index)
+                total += entry['repeat']
+                templates.instances += entry['repeat']
+            else:
+                templates.attach(entry, kind)
+                total += 1
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.total))]
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+
+        item = self.expanded.get(index)
+        if item is not None:
+            return item
+
+        # entries without instances share their start with the next entry,
+        # bisect_right skips them
+        position = bisect.bisect_right(self.starts, index) - 1
+        entry = self.entries[position]
+        if not is_use(entry):
+            return entry
+
+        template = self.templates.get(entry, self.kind)
+        item = template.expand(template.params(entry['params'], index - self.starts[position]))
+        self.templates.attach(item, self.kind)
+        self.expanded[index] = item
+        self.templates.expanded += 1
+        return item
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self.total):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"TemplateList({self.kind}, {len(self.entries)} entries, {self.total} items)"
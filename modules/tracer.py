@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+from pathlib import Path
+from threading import Lock
+from types import ModuleType, SimpleNamespace
+from typing import Any
+import sys
+import time
+
+# Opt-in profiler of the Openness API. Tracer.wrap puts a proxy around the
+# Siemens.Engineering namespace (or modules/fake_se.py) and every object it
+# hands out, timing each method call and property read together with the
+# portal functions it was made from. Without a tracer nothing is wrapped.
+
+ROOT: str = str(Path(__file__).resolve().parent.parent)
+PLAIN = (str, bytes, int, float, bool, complex, type(None), Path, list, tuple, dict, set)
+
+
+def is_namespace(value: Any) -> bool:
+    # modules, pythonnet namespaces and classes are labelled by their path
+    return isinstance(value, (type, ModuleType, SimpleNamespace)) or type(value).__name__ == "ModuleObject"
+
+
+def unwrap(value: Any) -> Any:
+    return object.__getattribute__(value, "_target") if isinstance(value, Traced) else value
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.apis: dict[str, list[float]] = {} # api -> [calls, total, max]
+        self.stacks: dict[str, float] = {}
+        self._lock = Lock()
+
+    def wrap(self, value: Any, label: str | None = None) -> Any:
+        if isinstance(value, PLAIN) or isinstance(value, Traced):
+            return value
+        return Traced(value, label or type(value).__name__, self)
+
+    def call_site(self) -> list[str]:
+        # functions of this repository between the outermost caller and the
+        # Openness call, outermost first
+        frames: list[str] = []
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(ROOT) and filename != __file__:
+                frames.append(getattr(frame.f_code, "co_qualname", frame.f_code.co_name))
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def record(self, api: str, duration: float) -> None:
+        stack = ";".join(self.call_site() + [api])
+        with self._lock:
+            stats = self.apis.get(api)
+            if stats is None:
+                stats = self.apis[api] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + duration
+
+    def summary(self, limit: int | None = None) -> str:
+        total = sum(stats[1] for stats in self.apis.values()) or 1.0
+        rows = sorted(self.apis.items(), key=lambda item: -item[1][1])
+        lines = [f"{'api':<48} {'calls':>8} {'total s':>10} {'mean ms':>9} {'max ms':>9} {'share':>6}"]
+        for api, (calls, duration, longest) in rows[:limit]:
+            lines.append(f"{api:<48} {int(calls):>8d} {duration:>10.3f} {duration / calls * 1000:>9.3f} {longest * 1000:>9.3f} {duration / total:>6.1%}")
+        if limit is not None and len(rows) > limit:
+            lines.append(f"... {len(rows) - limit} more")
+        lines.append(f"{sum(int(stats[0]) for stats in self.apis.values())} calls, {sum(stats[1] for stats in self.apis.values()):.3f} s in Openness")
+        return "\n".join(lines)
+
+    def save_collapsed(self, path: Path) -> None:
+        # "frame;frame;api microseconds" lines, as read by flamegraph.pl,
+        # inferno and speedscope
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, duration in sorted(self.stacks.items()):
+                file.write(f"{stack} {max(1, round(duration * 1_000_000))}\n")
+
+
+class Traced:
+    __slots__ = ("_target", "_label", "_tracer")
+
+    def __init__(self, target: Any, label: str, tracer: Tracer) -> None:
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_label", label)
+        object.__setattr__(self, "_tracer", tracer)
+
+    def __getattr__(self, name: str) -> Any:
+        target = object.__getattribute__(self, "_target")
+        label = object.__getattribute__(self, "_label")
+        tracer: Tracer = object.__getattribute__(self, "_tracer")
+        api = f"{label}.{name}"
+
+        start = time.perf_counter()
+        value = getattr(target, name)
+        duration = time.perf_counter() - start
+
+        if is_namespace(value) or callable(value):
+            # methods are timed when called, namespaces are free
+            return tracer.wrap(value, api)
+        if not is_namespace(target):
+            tracer.record(api, duration)
+        return tracer.wrap(value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        label = object.__getattribute__(self, "_label")
+        start = time.perf_counter()
+        try:
+            setattr(object.__getattribute__(self, "_target"), name, unwrap(value))
+        finally:
+            object.__getattribute__(self, "_tracer").record(f"{label}.{name}=", time.perf_counter() - start)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        tracer: Tracer = object.__getattribute__(self, "_tracer")
+        args = tuple(unwrap(arg) for arg in args)
+        kwargs = {key: unwrap(value) for key, value in kwargs.items()}
+        start = time.perf_counter()
+        try:
+            result = object.__getattribute__(self, "_target")(*args, **kwargs)
+        finally:
+            tracer.record(object.__getattribute__(self, "_label"), time.perf_counter() - start)
+        return tracer.wrap(result)
+
+    def __getitem__(self, key: Any) -> Any:
+        # generic methods (GetService[T]) and collection indexers
+        tracer: Tracer = object.__getattribute__(self, "_tracer")
+        label = object.__getattribute__(self, "_label")
+        start = time.perf_counter()
+        value = object.__getattribute__(self, "_target")[unwrap(key)]
+        duration = time.perf_counter() - start
+        if callable(value) and not is_namespace(value):
+            return tracer.wrap(value, label)
+        tracer.record(f"{label}[]", duration)
+        return tracer.wrap(value)
+
+    def __iter__(self):
+        tracer: Tracer = object.__getattribute__(self, "_tracer")
+        api = f"{object.__getattribute__(self, '_label')}.__iter__"
+        iterator = iter(object.__getattribute__(self, "_target"))
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                tracer.record(api, time.perf_counter() - start)
+                return
+            tracer.record(api, time.perf_counter() - start)
+            yield tracer.wrap(item)
+
+    def __len__(self) -> int:
+        return len(object.__getattribute__(self, "_target"))
+
+    def __bool__(self) -> bool:
+        return bool(object.__getattribute__(self, "_target"))
+
+    def __contains__(self, item: Any) -> bool:
+        return unwrap(item) in object.__getattribute__(self, "_target")
+
+    def __eq__(self, other: Any) -> bool:
+        return object.__getattribute__(self, "_target") == unwrap(other)
+
+    def __ne__(self, other: Any) -> bool:
+        return object.__getattribute__(self, "_target") != unwrap(other)
+
+    def __hash__(self) -> int:
+        return hash(object.__getattribute__(self, "_target"))
+
+    def __instancecheck__(self, instance: Any) -> bool:
+        return isinstance(unwrap(instance), object.__getattribute__(self, "_target"))
+
+    def __subclasscheck__(self, subclass: Any) -> bool:
+        return issubclass(unwrap(subclass), object.__getattribute__(self, "_target"))
+
+    def __enter__(self) -> Any:
+        return object.__getattribute__(self, "_tracer").wrap(object.__getattribute__(self, "_target").__enter__())
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return object.__getattribute__(self, "_target").__exit__(*exc_info)
+
+    def __str__(self) -> str:
+        return str(object.__getattribute__(self, "_target"))
+
+    def __repr__(self) -> str:
+        return repr(object.__getattribute__(self, "_target"))
+
+    def __format__(self, format_spec: str) -> str:
+        return format(object.__getattribute__(self, "_target"), format_spec)
@@ -1,9 +1,14 @@
 from enum import Enum
-from typing import Any
+from typing import Any, Iterator
+from xml.sax.saxutils import escape
+import itertools
 import xml.etree.ElementTree as ET
 
 from modules.config_schema import PlcType, DatabaseType
 
+# Bump whenever the generated XML changes so cached documents are rebuilt.
+VERSION: int = 1
+
 class XML:
     def __init__(self, block_type: str, name: str, number: int) -> None:
         if block_type in ["OB", "FB", "FC"]:
@@ -251,3 +256,106 @@ class GlobalDB(XML):
         ET.SubElement(self.SWBlock, "ObjectList")
 
         return self.export(self.root)
+
+
+class PlcTagTable:
+    def __init__(self, name: str) -> None:
+        self.root = ET.fromstring("<Document />")
+        self.SWTagTable = ET.SubElement(self.root, "SW.Tags.PlcTagTable", attrib={'ID': str(0)})
+
+        AttributeList = ET.SubElement(self.SWTagTable, "AttributeList")
+        ET.SubElement(AttributeList, "Name").text = name
+
+    def build(self, tags: list[dict[str, Any]]) -> str:
+        ObjectList = ET.SubElement(self.SWTagTable, "ObjectList")
+
+        for i, tag in enumerate(tags):
+            """
+            <SW.Tags.PlcTag ID="1" CompositionName="Tags">
+                <AttributeList>
+                    <DataTypeName>Bool</DataTypeName>
+                    <LogicalAddress>%I0.0</LogicalAddress>
+                    <Name>Start</Name>
+                </AttributeList>
+            </SW.Tags.PlcTag>
+            """
+            PlcTag = ET.SubElement(ObjectList, "SW.Tags.PlcTag", attrib={
+                "ID": format(1 + i, 'X'),
+                "CompositionName": "Tags",
+            })
+            AttributeList = ET.SubElement(PlcTag, "AttributeList")
+            ET.SubElement(AttributeList, "DataTypeName").text = tag['DataTypeName']
+            ET.SubElement(AttributeList, "LogicalAddress").text = tag['LogicalAddress']
+            ET.SubElement(AttributeList, "Name").text = tag['Name']
+
+        return ET.tostring(self.root, encoding='utf-8').decode('utf-8')
+
+
+def hmi_tag_table(name: str, tags: list[dict[str, Any]]) -> Iterator[str]:
+    # Streamed one tag at a time, HMI tables can hold tens of thousands of
+    # tags. Tags are internal tags, their type is linked by name:
+    #   <Hmi.Tag.Tag ID="1" CompositionName="Tags">
+    #       <AttributeList><Name>Start</Name></AttributeList>
+    #       <LinkList><DataType TargetID="@OpenLink"><Name>Bool</Name></DataType></LinkList>
+    #   </Hmi.Tag.Tag>
+    yield f'<Document><Hmi.Tag.TagTable ID="0"><AttributeList><Name>{escape(name)}</Name></AttributeList><ObjectList>'
+    for i, tag in enumerate(tags):
+        yield (f'<Hmi.Tag.Tag ID="{1 + i:X}" CompositionName="Tags">'
+               f'<AttributeList><Name>{escape(tag["Name"])}</Name></AttributeList>'
+               f'<LinkList><DataType TargetID="@OpenLink"><Name>{escape(tag["DataTypeName"])}</Name></DataType></LinkList>'
+               '</Hmi.Tag.Tag>')
+    yield '</ObjectList></Hmi.Tag.TagTable></Document>'
+
+
+AML_ROLES: str = "AutomationProjectConfigurationRoleClassLib"
+
+
+def aml_attribute(name: str, value: Any, data_type: str = "xs:string") -> str:
+    return f'<Attribute Name="{name}" AttributeDataType="{data_type}"><Value>{escape(str(value))}</Value></Attribute>'
+
+
+def aml_element(ids: Iterator[int], name: str, role: str, attributes: list[str], children: list[str]) -> str:
+    return (f'<InternalElement ID="{next(ids)}" Name="{escape(name)}">'
+            + "".join(attributes) + "".join(children)
+            + f'<RoleRequirements RefBaseRoleClassPath="{AML_ROLES}/{role}" /></InternalElement>')
+
+
+def automationml(name: str, devices: list[dict[str, Any]]) -> Iterator[str]:
+    # One CAEX document with every device, streamed device by device:
+    #   Device (p_deviceName)
+    #       Rack
+    #           head module (p_name, p_typeIdentifier)
+    #               PROFINET interface_1 > Node (network_address)
+    #           modules at PositionNumber + slots_required
+    ids = itertools.count(1)
+    yield ('<?xml version="1.0" encoding="utf-8"?>'
+           '<CAEXFile FileName="hardware.aml" SchemaVersion="2.15" '
+           'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:noNamespaceSchemaLocation="CAEX_ClassModel_V2.15.xsd">'
+           '<AdditionalInformation AutomationMLVersion="2.0" />'
+           f'<InstanceHierarchy Name="{escape(name)}">')
+
+    for device_data in devices:
+        node = aml_element(ids, "E1", "Node", [
+            aml_attribute("Type", "Ethernet"),
+            aml_attribute("NetworkAddress", device_data['network_address']),
+        ], [])
+        interface = aml_element(ids, "PROFINET interface_1", "DeviceItem", [
+            aml_attribute("BuiltIn", "true", "xs:boolean"),
+            aml_attribute("PositionNumber", 32768, "xs:int"),
+        ], [node])
+        head = aml_element(ids, device_data['p_name'], "DeviceItem", [
+            aml_attribute("TypeIdentifier", device_data['p_typeIdentifier']),
+        ], [interface])
+
+        modules = [
+            aml_element(ids, module['Name'], "DeviceItem", [
+                aml_attribute("TypeIdentifier", module['TypeIdentifier']),
+                aml_attribute("PositionNumber", module['PositionNumber'] + device_data.get('slots_required', 0), "xs:int"),
+            ], [])
+            for module in device_data.get('Local modules', []) + device_data.get('Modules', [])
+        ]
+        rack = aml_element(ids, "Rack_0", "Rack", [], [head] + modules)
+
+        yield aml_element(ids, device_data.get('p_deviceName') or device_data['p_name'], "Device", [], [rack])
+
+    yield '</InstanceHierarchy></CAEXFile>'
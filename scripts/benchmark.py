@@ -0,0 +1,435 @@
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules import config_schema, fake_se, logger, portal, project_export, xml_builder
+
+
+# Openness APIs grouped into the phases of portal.execute. Wall time between
+# two consecutive calls is attributed to the phase of the later call, so the
+# Python work preparing a call (e.g. building block XML) counts towards it.
+PHASES: dict[str, str] = {
+    "TiaPortal": "portal",
+    "TiaPortal.GetCurrentProcess": "portal",
+    "Projects.Create": "project",
+    "Projects.Open": "project",
+    "Project.Save": "project",
+    "Project.Close": "project",
+    "GlobalLibraries.Open": "libraries",
+    "GlobalLibrary.Close": "libraries",
+    "Devices.CreateWithItem": "hardware",
+    "HardwareObject.CanPlugNew": "hardware",
+    "HardwareObject.PlugNew": "hardware",
+    "DeviceItem.Delete": "hardware",
+    "Device.Delete": "hardware",
+    "DeviceComposition.Find": "hardware",
+    "GetService": "hardware",
+    "CaxProvider.Import": "hardware",
+    "Node.SetAttribute": "hardware",
+    "TagTables.Create": "tags",
+    "Tags.Create": "tags",
+    "TagTables.Import": "tags",
+    "HmiTagTables.Import": "tags",
+    "HmiTagTable.Delete": "tags",
+    "HmiTagTableComposition.Find": "tags",
+    "PlcTag.Delete": "tags",
+    "PlcTagTable.Delete": "tags",
+    "PlcTagComposition.Find": "tags",
+    "PlcTagTableComposition.Find": "tags",
+    "Blocks.Import": "blocks",
+    "Blocks.CreateFrom": "blocks",
+    "Blocks.CreateInstanceDB": "blocks",
+    "PlcBlock.SetAttribute": "blocks",
+    "PlcBlock.Export": "blocks",
+    "PlcTagTable.Export": "tags",
+    "ICompilable.Compile": "blocks",
+    "MasterCopies.Find": "blocks",
+    "PlcBlock.Delete": "blocks",
+    "PlcBlockComposition.Find": "blocks",
+    "Node.GetAttribute": "networks",
+    "Node.CreateAndConnectToSubnet": "networks",
+    "Node.ConnectToSubnet": "networks",
+    "IoController.CreateIoSystem": "networks",
+    "IoConnector.ConnectToIoSystem": "networks",
+    "Subnet.Delete": "networks",
+    "SubnetComposition.Find": "networks",
+}
+
+
+def write_library(path: Path) -> None:
+    library = {
+        "name": "BenchLib",
+        "mastercopies": [
+            {
+                "name": "Motor",
+                "sections": [
+                    {"name": "Input", "members": [{"Name": "Start", "Datatype": "Bool"}, {"Name": "Stop", "Datatype": "Bool"}]},
+                    {"name": "Output", "members": [{"Name": "Running", "Datatype": "Bool"}]},
+                ],
+            },
+            {
+                "name": "Valve",
+                "sections": [
+                    {"name": "Input", "members": [{"Name": "Open", "Datatype": "Bool"}]},
+                    {"name": "Output", "members": [{"Name": "Opened", "Datatype": "Bool"}, {"Name": "Closed", "Datatype": "Bool"}]},
+                ],
+            },
+        ],
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(library, file)
+
+
+def generate_config(plcs: int, io_nodes: int, tags: int, blocks: int, library: Path, hmi_tags: int = 0) -> dict[str, Any]:
+    devices: list[dict[str, Any]] = []
+    networks: list[dict[str, Any]] = []
+    for p in range(plcs):
+        conveyors = []
+        for b in range(blocks):
+            conveyors.append([{
+                "name": f"Conveyor_{b}",
+                "type": "FB",
+                "programming_language": "LAD",
+                "number": b + 1,
+                "db": {
+                    "type": "SINGLE",
+                    "name": f"Conveyor_{b}_DB",
+                    "programming_language": "DB",
+                    "number": b + 1,
+                    "instanceOfName": f"Conveyor_{b}",
+                },
+                "network_sources": [[{
+                    "name": ("Motor", "Valve")[b % 2],
+                    "type": "FB",
+                    "programming_language": "LAD",
+                    "source": {"name": ("Motor", "Valve")[b % 2], "library": "BenchLib"},
+                    "db": {"type": "MULTI", "component_name": f"{('Motor', 'Valve')[b % 2]}_{b}"},
+                }]],
+            }])
+        program_blocks = [
+            {
+                "name": "Main",
+                "type": "OB",
+                "programming_language": "LAD",
+                "number": 1,
+                "network_sources": conveyors,
+            },
+            {
+                "name": "Data",
+                "type": "GLOBAL",
+                "programming_language": "DB",
+                "number": 1000,
+            },
+        ]
+        address = f"192.168.{p}.1"
+        devices.append({
+            "p_name": f"PLC_{p}",
+            "p_typeIdentifier": "OrderNumber:6ES7 510-1DJ01-0AB0/V2.0",
+            "p_deviceName": f"NewPlcDevice_{p}",
+            "network_address": address,
+            "Local modules": [
+                {"TypeIdentifier": "OrderNumber:6ES7 131-6BF01-0BA0/V1.0", "Name": "DI_1", "PositionNumber": 0},
+                {"TypeIdentifier": "OrderNumber:6ES7 132-6BF01-0BA0/V1.0", "Name": "DQ_1", "PositionNumber": 1},
+            ],
+            "PLC tags": [{
+                "Name": "IO",
+                "Tags": [
+                    {"Name": f"Tag_{t}", "DataTypeName": "Bool", "LogicalAddress": f"%I{t // 8}.{t % 8}"}
+                    for t in range(tags)
+                ],
+            }],
+            "Program blocks": program_blocks,
+        })
+        networks.append({"address": address, "subnet_name": f"PN_{p}", "io_controller": f"PNIO_{p}"})
+        for n in range(io_nodes):
+            address = f"192.168.{p}.{n + 10}"
+            devices.append({
+                "p_name": f"IO_{p}_{n}",
+                "p_typeIdentifier": "OrderNumber:6ES7 155-6AU01-0BN0/V4.1",
+                "p_deviceName": f"IoDevice_{p}_{n}",
+                "network_address": address,
+                "Modules": [
+                    {"TypeIdentifier": "OrderNumber:6ES7 131-6BF01-0BA0/V1.0", "Name": f"DI_{m}", "PositionNumber": m}
+                    for m in range(4)
+                ],
+            })
+            networks.append({"address": address, "subnet_name": f"PN_{p}", "io_controller": f"PNIO_{p}"})
+
+    if hmi_tags:
+        devices.append({
+            "p_name": "HMI_1",
+            "p_typeIdentifier": "OrderNumber:6AV2 124-0GC01-0AX0/17.0.0.0",
+            "network_address": "192.168.100.1",
+            "HMI tags": [{
+                "Name": "Default tag table",
+                "Tags": [
+                    {"Name": f"HmiTag_{t}", "DataTypeName": "Int", "LogicalAddress": ""}
+                    for t in range(hmi_tags)
+                ],
+            }],
+        })
+
+    return {
+        "overwrite": True,
+        "libraries": [{"path": library.as_posix(), "read_only": True}],
+        "devices": devices,
+        "networks": networks,
+    }
+
+
+def run(SE, config: dict[str, Any], settings: dict[str, Any]) -> dict[str, Any]:
+    recorder: fake_se.Recorder = SE.recorder
+    recorder.reset()
+
+    start = time.perf_counter()
+    portal.execute(SE, config, settings)
+    end = time.perf_counter()
+
+    phases: defaultdict[str, float] = defaultdict(float)
+    previous = start
+    for api, _, call_end in recorder.timeline:
+        phases[PHASES.get(api, "other")] += call_end - previous
+        previous = call_end
+    phases["finish"] += end - previous
+
+    return {
+        "wall": end - start,
+        "calls": sum(recorder.calls.values()),
+        "openness": sum(recorder.durations.values()),
+        "apis": dict(recorder.calls.most_common()),
+        "phases": dict(phases),
+    }
+
+
+def report_trace(path: Path, limit: int = 15) -> None:
+    # the traced time per Openness API, summed over all call sites
+    apis: defaultdict[str, int] = defaultdict(int)
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            stack, microseconds = line.rsplit(" ", 1)
+            apis[stack.rsplit(";", 1)[-1]] += int(microseconds)
+    print(f"  traced ({path}):")
+    for api, microseconds in sorted(apis.items(), key=lambda item: -item[1])[:limit]:
+        print(f"    {api:<48} {microseconds / 1000:9.1f} ms")
+    print()
+
+
+def edit_config(config: dict[str, Any]) -> dict[str, Any]:
+    # the smallest edit there is: one tag gets another address
+    tags = config['devices'][0]['PLC tags'][0]['Tags']
+    tags[0]['LogicalAddress'] = "%M100.0"
+    return config
+
+
+def report(size: int, config: dict[str, Any], result: dict[str, Any], title: str = "") -> None:
+    print(f"== {size} PLC(s), {len(config['devices'])} devices{title} ==")
+    print(f"  wall time:      {result['wall']:9.3f} s")
+    print(f"  openness calls: {result['calls']:9d} ({result['openness']:.3f} s inside calls)")
+    print("  phases:")
+    for phase, duration in sorted(result['phases'].items(), key=lambda p: -p[1]):
+        print(f"    {phase:<12} {duration:9.3f} s")
+    print("  calls:")
+    for api, count in result['apis'].items():
+        print(f"    {api:<32} {count:7d}")
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark portal.execute against the offline Siemens.Engineering stand-in.")
+    parser.add_argument("--sizes",
+                        type=int,
+                        nargs="+",
+                        default=[1, 2, 4],
+                        help="Number of PLCs per run"
+                        )
+    parser.add_argument("--io-nodes",
+                        type=int,
+                        default=8,
+                        help="IO nodes per PLC"
+                        )
+    parser.add_argument("--tags",
+                        type=int,
+                        default=64,
+                        help="PLC tags per PLC"
+                        )
+    parser.add_argument("--blocks",
+                        type=int,
+                        default=16,
+                        help="Program blocks per PLC"
+                        )
+    parser.add_argument("--latency",
+                        type=float,
+                        default=0.001,
+                        help="Simulated latency of every Openness call in seconds"
+                        )
+    parser.add_argument("--api-latency",
+                        type=str,
+                        nargs="*",
+                        default=[],
+                        help="Per API latency overrides, e.g. Blocks.Import=0.05"
+                        )
+    parser.add_argument("--unsupported",
+                        type=str,
+                        nargs="*",
+                        default=[],
+                        help="APIs that fail like on an older TIA Portal, e.g. TagTables.Import"
+                        )
+    parser.add_argument("--tag-sizes",
+                        type=int,
+                        nargs="*",
+                        default=[],
+                        help="Also time one PLC with a tag table of each size, imported as XML and created tag by tag"
+                        )
+    parser.add_argument("--hmi-tag-sizes",
+                        type=int,
+                        nargs="*",
+                        default=[],
+                        help="Also time one HMI with a tag table of each size"
+                        )
+    parser.add_argument("--export-sizes",
+                        type=int,
+                        nargs="*",
+                        default=[],
+                        help="Also export a project with one PLC of each number of program blocks back to a config"
+                        )
+    parser.add_argument("--hardware",
+                        choices=["objects", "aml"],
+                        default="objects",
+                        help="Create hardware one object at a time or with one AutomationML import"
+                        )
+    parser.add_argument("--compile",
+                        choices=["software", "block"],
+                        default="software",
+                        help="Compile blocks from mastercopies together or one by one"
+                        )
+    parser.add_argument("--no-cache",
+                        action="store_true",
+                        help="Disable the on-disk caches"
+                        )
+    parser.add_argument("--incremental",
+                        action="store_true",
+                        help="Build in incremental mode, then rebuild after changing one tag"
+                        )
+    parser.add_argument("--json",
+                        type=Path,
+                        help="Write results as JSON to this file"
+                        )
+    parser.add_argument("--trace",
+                        type=Path,
+                        help="Trace the Openness calls of every run, collapsed stacks go to <trace>_<size>.folded"
+                        )
+    parser.add_argument("--debug",
+                        action="store_true",
+                        help="Show portal log output"
+                        )
+    args = parser.parse_args()
+
+    logger.setup(None, 10 if args.debug else 30)
+
+    latencies = {api: float(value) for api, value in (entry.split("=", 1) for entry in args.api_latency)}
+    SE = fake_se.create(args.latency, latencies, set(args.unsupported))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        library = directory / "BenchLib.json"
+        write_library(library)
+
+        settings = fake_se.settings()
+        settings['cache'] = not args.no_cache
+        settings['cache_dir'] = directory / "cache"
+        settings['incremental'] = args.incremental
+        settings['hardware'] = args.hardware
+        settings['compile'] = args.compile
+
+        for size in args.sizes:
+            config = config_schema.validate_config(generate_config(size, args.io_nodes, args.tags, args.blocks, library))
+            config['directory'] = directory
+            config['name'] = f"bench_{size}"
+            if args.trace:
+                settings['trace'] = args.trace.with_name(f"{args.trace.stem}_{size}.folded")
+
+            result = run(SE, config, settings)
+            report(size, config, result)
+            if args.trace:
+                report_trace(settings['trace'])
+            results.append({"size": size, "devices": len(config['devices']), **result})
+
+            if args.incremental:
+                # portal.execute wires library interfaces into the config it
+                # is given, so the edit starts from a fresh copy
+                edited = edit_config(config_schema.validate_config(generate_config(size, args.io_nodes, args.tags, args.blocks, library)))
+                edited['directory'] = directory
+                edited['name'] = f"bench_{size}"
+                result = run(SE, edited, settings)
+                report(size, edited, result, ", one tag changed")
+                results.append({"size": size, "devices": len(config['devices']), "edit": "tag", **result})
+
+        settings['incremental'] = False
+        settings.pop('trace', None)
+        for tags in args.tag_sizes:
+            line = f"== {tags} tags in one table =="
+            for mode, unsupported in (("import", set(args.unsupported)), ("per tag", {"TagTables.Import"})):
+                tag_SE = fake_se.create(args.latency, latencies, unsupported)
+                config = config_schema.validate_config(generate_config(1, 0, tags, 0, library))
+                config['directory'] = directory
+                config['name'] = f"tags_{tags}"
+                result = run(tag_SE, config, settings)
+                line += f"\n  {mode:<8} {result['phases'].get('tags', 0.0):9.3f} s in tags, {result['wall']:9.3f} s wall, {result['calls']:7d} calls"
+                results.append({"tags": tags, "mode": mode, **result})
+            print(line)
+            print()
+
+        for tags in args.hmi_tag_sizes:
+            config = config_schema.validate_config(generate_config(1, 0, 0, 0, library, tags))
+            config['directory'] = directory
+            config['name'] = f"hmi_tags_{tags}"
+            result = run(SE, config, settings)
+
+            # peak memory of streaming the table XML to a file
+            tracemalloc.start()
+            with open(directory / "hmi_tags.xml", 'w', encoding='utf-8') as file:
+                file.writelines(xml_builder.hmi_tag_table("Default tag table", config['devices'][-1]['HMI tags'][0]['Tags']))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"== {tags} HMI tags in one table ==")
+            print(f"  {result['phases'].get('tags', 0.0):9.3f} s in tags, {result['wall']:9.3f} s wall, {result['calls']:7d} calls, XML peak {peak / 1024:.0f} KiB")
+            print()
+            results.append({"hmi_tags": tags, "xml_peak": peak, **result})
+
+        for blocks in args.export_sizes:
+            # the project is built and saved first, then exported with one
+            # parser process and with the default pool
+            export_SE = fake_se.create(args.latency, latencies, set(args.unsupported))
+            config = config_schema.validate_config(generate_config(1, 0, args.tags, blocks, library))
+            config['directory'] = directory
+            config['name'] = f"export_{blocks}"
+            run(export_SE, config, {**settings, "incremental": True})
+
+            line = f"== export of {blocks} conveyors =="
+            for workers in (1, None):
+                export_SE.recorder.reset()
+                start = time.perf_counter()
+                project_export.export_project(export_SE, directory / config['name'] / f"{config['name']}.ap18", {**settings, "workers": workers})
+                wall = time.perf_counter() - start
+                exports = [end for api, _, end in export_SE.recorder.timeline if api == "PlcBlock.Export"]
+                count = len(exports)
+                tail = start + wall - exports[-1] if exports else 0.0
+                line += f"\n  {workers or 'default':>7} workers: {count} blocks in {wall:7.3f} s, {count / wall:8.0f} blocks/s, {tail:6.3f} s from the last export to the config"
+                results.append({"export": blocks, "blocks": count, "workers": workers, "wall": wall, "tail": tail})
+            print(line)
+            print()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
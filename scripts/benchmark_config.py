@@ -0,0 +1,279 @@
+import argparse
+import copy
+import json
+import random
+import sys
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules import config_schema
+from modules.schema_compiler import Invalid
+
+
+def program_block(rng: random.Random, name: str, depth: int) -> dict[str, Any]:
+    block: dict[str, Any] = {
+        "name": name,
+        "type": rng.choice(["OB", "FB", "FC"]),
+        "programming_language": rng.choice(["LAD", "lad", "FBD"]),
+    }
+    if rng.random() < 0.8:
+        block["number"] = rng.randint(1, 60000)
+    if rng.random() < 0.5:
+        block["db"] = {
+            "type": "SINGLE",
+            "name": f"{name}_DB",
+            "programming_language": "DB",
+            "instanceOfName": name,
+        }
+        if rng.random() < 0.3:
+            block["db"]["data"] = {"Address": "DB", "BlockNumber": 3}
+    if depth > 0 and rng.random() < 0.7:
+        block["network_sources"] = [
+            [program_block(rng, f"{name}_{n}_{i}", depth - 1) for i in range(rng.randint(0, 2))]
+            for n in range(rng.randint(1, 3))
+        ]
+    if depth == 0 and rng.random() < 0.3:
+        block["type"] = "FB"
+        block["source"] = {"name": "Motor", "library": "Lib"}
+        block["db"] = {
+            "type": "MULTI",
+            "component_name": f"{name}_Motor",
+            "sections": [{"name": "Input", "members": [{"Name": "Start", "Datatype": "Bool"}]}],
+            "wires": [{"name": "w", "from": "a", "to": "b"}],
+        }
+    return block
+
+
+def count_blocks(blocks: list[dict[str, Any]]) -> int:
+    return sum(1 + sum(count_blocks(network) for network in block.get("network_sources", [])) for block in blocks)
+
+
+def generate_config(blocks: int, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    devices: list[dict[str, Any]] = []
+    total = 0
+    while total < blocks:
+        p = len(devices)
+        program_blocks = [{"name": f"Data_{p}", "type": "GLOBAL", "programming_language": "DB"}]
+        while total + count_blocks(program_blocks) < blocks and len(program_blocks) < 500:
+            program_blocks.append(program_block(rng, f"Block_{p}_{len(program_blocks)}", 3))
+        total += count_blocks(program_blocks)
+        devices.append({
+            "p_name": f"PLC_{p}",
+            "p_typeIdentifier": "OrderNumber:6ES7 510-1DJ01-0AB0/V2.0",
+            "p_deviceName": f"NewPlcDevice_{p}",
+            "Program blocks": program_blocks,
+            "PLC tags": [{"Name": "IO", "Tags": [{"Name": "Start", "DataTypeName": "Bool", "LogicalAddress": "%I0.0"}]}],
+            "Local modules": [{"TypeIdentifier": "OrderNumber:6ES7 131-6BF01-0BA0/V1.0", "Name": "DI", "PositionNumber": 0}],
+        })
+        devices.append({
+            "p_name": f"IO_{p}",
+            "p_typeIdentifier": "OrderNumber:6ES7 155-6AU01-0BN0/V4.1",
+            "p_deviceName": f"IoDevice_{p}",
+            "Modules": [{"TypeIdentifier": "OrderNumber:6ES7 131-6BF01-0BA0/V1.0", "Name": "DI", "PositionNumber": 1}],
+        })
+    devices.append({
+        "p_name": "HMI_1",
+        "p_typeIdentifier": "OrderNumber:6AV2 124-0GC01-0AX0/17.0.0.0",
+        "HMI tags": [{"Name": "Default", "Tags": []}],
+    })
+
+    return {
+        "overwrite": True,
+        "name": "ignored",
+        "libraries": [{"path": "C:/Libraries/Lib.al18"}],
+        "devices": devices,
+        "networks": [{"address": "192.168.0.1", "subnet_name": "PN", "io_controller": "PNIO"}],
+    }
+
+
+def same(a: Any, b: Any) -> bool:
+    # == treats True as 1 and ignores container types, compare strictly
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key]) for key in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, Enum):
+        return a is b
+    return a == b
+
+
+def nodes(data: Any, path: tuple = ()) -> list[tuple]:
+    found = [path]
+    if isinstance(data, dict):
+        for key, value in data.items():
+            found += nodes(value, path + (key,))
+    elif isinstance(data, list):
+        for i, value in enumerate(data):
+            found += nodes(value, path + (i,))
+    return found
+
+
+MUTATIONS: list[Callable[[random.Random, Any], Any]] = [
+    lambda rng, value: None,
+    lambda rng, value: True,
+    lambda rng, value: 7,
+    lambda rng, value: "GLOBAL",
+    lambda rng, value: "MULTI",
+    lambda rng, value: "ob",
+    lambda rng, value: [],
+    lambda rng, value: {},
+    lambda rng, value: [value],
+    lambda rng, value: {**value, "extra": 1} if isinstance(value, dict) else value,
+    lambda rng, value: {k: v for k, v in value.items() if k != rng.choice(list(value) or [None])} if isinstance(value, dict) else value,
+    lambda rng, value: {**value, "type": rng.choice(["OB", "FB", "FC", "GLOBAL", "SINGLE", "MULTI", "LOCAL", "XX"])} if isinstance(value, dict) else value,
+    lambda rng, value: {**value, "db": {"type": "MULTI", "component_name": "M"}} if isinstance(value, dict) else value,
+]
+
+
+def mutate(rng: random.Random, data: Any) -> Any:
+    data = copy.deepcopy(data)
+    path = rng.choice(nodes(data)[1:])
+    parent = data
+    for key in path[:-1]:
+        parent = parent[key]
+    parent[path[-1]] = rng.choice(MUTATIONS)(rng, parent[path[-1]])
+    return data
+
+
+def check_equivalence(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    accepted = 0
+    for case in range(cases):
+        data = generate_config(rng.randint(1, 40), seed=case)
+        if case % 4:
+            data = mutate(rng, data)
+
+        try:
+            expected = config_schema.schema.validate(copy.deepcopy(data))
+        except config_schema.SchemaError:
+            expected = Invalid
+        try:
+            result = config_schema.compiled_schema(copy.deepcopy(data))
+        except Invalid:
+            result = Invalid
+
+        if expected is Invalid or result is Invalid:
+            ok = expected is result
+        else:
+            ok = same(expected, result)
+            accepted += 1
+        if not ok:
+            failures += 1
+            print(f"  case {case}: schema {'rejected' if expected is Invalid else 'accepted'}, compiled {'rejected' if result is Invalid else 'accepted'}")
+
+    print(f"equivalence: {cases} configs ({accepted} valid), {failures} mismatches")
+
+    return failures
+
+
+def io_nodes(count: int, templated: bool) -> dict[str, Any]:
+    # one PLC and count IO nodes on its network, written out or as templates
+    io_node = {
+        "p_name": "IO_${n}",
+        "p_typeIdentifier": "OrderNumber:6ES7 155-6AU01-0BN0/V4.1",
+        "p_deviceName": "IoDevice_${n}",
+        "network_address": "${address}",
+        "Modules": [
+            {"TypeIdentifier": "OrderNumber:6ES7 131-6BF01-0BA0/V1.0", "Name": f"DI_{m}", "PositionNumber": m}
+            for m in range(8)
+        ],
+    }
+    network = {"address": "${address}", "subnet_name": "PN", "io_controller": "PNIO"}
+    plc = {"p_name": "PLC_1", "p_typeIdentifier": "OrderNumber:6ES7 510-1DJ01-0AB0/V2.0", "p_deviceName": "Plc", "network_address": "10.0.0.1"}
+    controller = {"address": "10.0.0.1", "subnet_name": "PN", "io_controller": "PNIO"}
+
+    if templated:
+        params = {"n": "{i}", "address": "10.0.0.{i+2}"}
+        return {
+            "templates": {
+                "io_node": {"kind": "device", "params": {"n": 0, "address": "10.0.0.2"}, "body": io_node},
+                "io_network": {"kind": "network", "params": {"n": 0, "address": "10.0.0.2"}, "body": network},
+            },
+            "devices": [plc, {"template": "io_node", "repeat": count, "params": params}],
+            "networks": [controller, {"template": "io_network", "repeat": count, "params": params}],
+        }
+
+    def fill(value: Any, n: int) -> Any:
+        return json.loads(json.dumps(value).replace("${n}", str(n)).replace("${address}", f"10.0.0.{n + 2}"))
+
+    return {
+        "devices": [plc] + [fill(io_node, n) for n in range(count)],
+        "networks": [controller] + [fill(network, n) for n in range(count)],
+    }
+
+
+def measure_templates(count: int, templated: bool) -> str:
+    text = json.dumps(io_nodes(count, templated))
+    start = time.perf_counter()
+    data = json.loads(text)
+    loaded = time.perf_counter()
+    config = config_schema.validate_config(data)
+    validated = time.perf_counter()
+    for device in config['devices']:
+        device['p_name']
+    read = time.perf_counter()
+    return f"  {'templates' if templated else 'written out':<12} {len(text) / 1024:9.0f} KiB, load {loaded - start:7.3f} s, validate {validated - loaded:7.3f} s, first read of every device {read - validated:7.3f} s"
+
+
+def measure(function: Callable[[Any], Any], data: Any) -> float:
+    start = time.perf_counter()
+    function(data)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the compiled config validator against the schema library and time both.")
+    parser.add_argument("--sizes",
+                        type=int,
+                        nargs="+",
+                        default=[1000, 10000, 100000],
+                        help="Program blocks per config"
+                        )
+    parser.add_argument("--cases",
+                        type=int,
+                        default=500,
+                        help="Random configs for the equivalence check"
+                        )
+    parser.add_argument("--seed",
+                        type=int,
+                        default=0,
+                        help="Seed of the random configs"
+                        )
+    parser.add_argument("--template-sizes",
+                        type=int,
+                        nargs="*",
+                        default=[],
+                        help="Also compare configs with this many IO nodes written out and as templates"
+                        )
+    parser.add_argument("--max-schema-blocks",
+                        type=int,
+                        default=100000,
+                        help="Skip the schema library above this many blocks"
+                        )
+    args = parser.parse_args()
+
+    failures = check_equivalence(args.cases, args.seed)
+
+    for size in args.sizes:
+        data = generate_config(size, args.seed)
+        compiled = measure(config_schema.compiled_schema, data)
+        line = f"{size:>7} blocks: compiled {compiled:8.3f} s"
+        if size <= args.max_schema_blocks:
+            interpreted = measure(config_schema.schema.validate, data)
+            line += f", schema {interpreted:8.3f} s ({interpreted / compiled:.0f}x)"
+        print(line)
+
+    for count in args.template_sizes:
+        print(f"{count:>7} IO nodes:")
+        print(measure_templates(count, False))
+        print(measure_templates(count, True))
+
+    sys.exit(1 if failures else 0)
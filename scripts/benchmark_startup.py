@@ -0,0 +1,103 @@
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmark import generate_config, write_library
+
+
+# Times "main.py --config ... --no-ui --fake-openness" from spawning the
+# process to its first Openness call, with the import times of the child as
+# reported by "python -X importtime".
+
+MAIN: Path = Path(__file__).resolve().parent.parent / "main.py"
+HEAVY: tuple[str, ...] = ("wx", "res.dlls", "clr", "modules.gui", "modules.batch")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+FIRST_CALL = re.compile(r"Fake Openness: (\d+) calls, first at ([\d.]+)")
+
+
+def parse_imports(stderr: str) -> dict[str, tuple[int, int, int]]:
+    # module -> (self us, cumulative us, depth)
+    imports: dict[str, tuple[int, int, int]] = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports[match.group(4)] = (int(match.group(1)), int(match.group(2)), (len(match.group(3)) - 1) // 2)
+    return imports
+
+
+def run_once(config: Path, directory: Path) -> tuple[float, dict[str, tuple[int, int, int]]]:
+    command = [sys.executable, "-X", "importtime", str(MAIN), "--config", str(config), "--project-dir", str(directory), "--no-ui", "--fake-openness", "--no-cache"]
+    start = time.time()
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"main.py failed:\n{process.stderr[-2000:]}")
+
+    match = FIRST_CALL.search(process.stderr)
+    if not match:
+        raise RuntimeError("main.py did not report its first Openness call")
+    return float(match.group(2)) - start, parse_imports(process.stderr)
+
+
+def report(first_calls: list[float], imports: dict[str, tuple[int, int, int]], limit: int) -> None:
+    print(f"time to first Openness call: median {statistics.median(first_calls) * 1000:.1f} ms, min {min(first_calls) * 1000:.1f} ms over {len(first_calls)} runs")
+
+    top_level = {name: values for name, values in imports.items() if values[2] == 0}
+    print(f"imports: {len(imports)} modules, {sum(values[1] for values in top_level.values()) / 1000:.1f} ms")
+    print(f"  {'module':<40} {'self ms':>9} {'cumul ms':>9}")
+    for name, (own, cumulative, _) in sorted(top_level.items(), key=lambda item: -item[1][1])[:limit]:
+        print(f"  {name:<40} {own / 1000:>9.1f} {cumulative / 1000:>9.1f}")
+
+    loaded = [name for name in HEAVY if name in imports]
+    print(f"heavy modules imported: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the start of a command line build up to its first Openness call.")
+    parser.add_argument("--runs",
+                        type=int,
+                        default=5,
+                        help="Number of processes started"
+                        )
+    parser.add_argument("--plcs",
+                        type=int,
+                        default=1,
+                        help="PLCs in the generated config"
+                        )
+    parser.add_argument("--top",
+                        type=int,
+                        default=15,
+                        help="Number of top level imports listed"
+                        )
+    parser.add_argument("--json",
+                        type=Path,
+                        help="Write results as JSON to this file"
+                        )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        library = directory / "BenchLib.json"
+        write_library(library)
+        config = directory / "startup.json"
+        with open(config, 'w', encoding='utf-8') as file:
+            json.dump(generate_config(args.plcs, 2, 8, 4, library), file, default=str)
+
+        first_calls: list[float] = []
+        imports: dict[str, tuple[int, int, int]] = {}
+        for run in range(args.runs):
+            first_call, imports = run_once(config, directory / f"run_{run}")
+            first_calls.append(first_call)
+
+    report(first_calls, imports, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({"first_calls": first_calls, "imports": imports}, file, indent=4)
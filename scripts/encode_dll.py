@@ -1,8 +1,11 @@
-import base64
-import json
 import argparse
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules import resource_archive
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="A simple tool for automating TIA Portal projects.")
@@ -15,7 +18,7 @@ if __name__ == "__main__":
 
     res_dir: Path = args.res
 
-    b64_dlls: dict[str, str] = {}
+    dlls: dict[str, bytes] = {}
 
     count = 0
     for child in res_dir.iterdir():
@@ -25,12 +28,10 @@ if __name__ == "__main__":
             if child.suffix.lower() != '.dll':
                 continue
             print(f"Opening {child}...")
-            encoded_dll = base64.b64encode(dll.read()).decode('utf-8')
-            b64_dlls[child.stem] = encoded_dll
+            dlls[child.stem] = dll.read()
             count += 1
 
-    b64_output_script: Path = res_dir / "dlls.py"
+    archive_path: Path = res_dir / "dlls.bin"
 
-    with open(b64_output_script, 'w', encoding='utf-8') as file:
-        file.write(f"b64_dlls = {json.dumps(b64_dlls, indent=4)}\n")
-        print(f"Written {count} DLLs to {b64_output_script}.")
+    resource_archive.write(archive_path, dlls)
+    print(f"Written {count} DLLs to {archive_path}.")